@@ -1,9 +1,12 @@
 import random
 from database import Database
+from world import WorldMap
 
 class Advisor:
-    def __init__(self):
-        self.db = Database()
+    def __init__(self, db=None):
+        # هر پیاده‌سازی Storage (Database یا MemoryStorage)؛ در غیر این صورت اتصال جدید ساخته می‌شود
+        self.db = db or Database()
+        self.world = WorldMap(self.db)
         self.advice_types = [
             "RESOURCE",
             "ARMY",
@@ -58,16 +61,7 @@ class Advisor:
     
     def _diplomacy_advice(self, country_id):
         """مشاوره دیپلماسی"""
-        cursor = self.db.conn.cursor()
-        cursor.execute('''
-        SELECT COUNT(*) as alliance_count 
-        FROM alliances 
-        WHERE (country1_id = ? OR country2_id = ?) 
-          AND relation_type = 'ALLIANCE'
-        ''', (country_id, country_id))
-        
-        result = cursor.fetchone()
-        alliance_count = result['alliance_count'] if result else 0
+        alliance_count = self.db.count_alliances(country_id)
         
         if alliance_count == 0:
             return f"🤝 **وزیر**: {self._get_country_name(country_id)} هیچ متحدی ندارد! اتحاد تشکیل بده."
@@ -78,38 +72,14 @@ class Advisor:
     
     def _warning_advice(self, country_id):
         """هشدارهای استراتژیک"""
-        cursor = self.db.conn.cursor()
-        
         # پیدا کردن دشمنان قوی
-        cursor.execute('''
-        SELECT c.name, a.power 
-        FROM alliances al
-        JOIN countries c ON 
-            (c.id = al.country2_id AND al.country1_id = ?) OR
-            (c.id = al.country1_id AND al.country2_id = ?)
-        JOIN army a ON a.country_id = c.id
-        WHERE al.relation_type = 'WAR'
-        ORDER BY a.power DESC
-        LIMIT 1
-        ''', (country_id, country_id))
-        
-        strong_enemy = cursor.fetchone()
+        strong_enemy = self.db.get_strongest_enemy(country_id)
         
         if strong_enemy:
             return f"⚠️ **وزیر**: هشدار! {strong_enemy['name']} با قدرت {strong_enemy['power']} تهدید می‌کند."
         
-        # پیدا کردن کشورهای ضعیف برای حمله
-        cursor.execute('''
-        SELECT c.name, a.power 
-        FROM countries c
-        JOIN army a ON a.country_id = c.id
-        WHERE c.controller = 'HUMAN' 
-          AND c.id != ?
-          AND a.power < (SELECT power FROM army WHERE country_id = ?) * 0.7
-        LIMIT 1
-        ''', (country_id, country_id))
-        
-        weak_target = cursor.fetchone()
+        # پیدا کردن کشورهای ضعیف در دسترس برای حمله
+        weak_target = self.db.get_weak_target(country_id, self.world.reach, 0.7)
         
         if weak_target:
             return f"🎯 **وزیر**: فرصت! {weak_target['name']} با قدرت {weak_target['power']} هدف خوبی است."
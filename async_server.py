@@ -0,0 +1,162 @@
+"""سرویس‌دهی asyncio برای SERVE_MODE=async
+
+هندلرها sync هستند و کار دیتابیسی خودشان (Database روی اتصال مشترک با db.lock) را در همان
+threadهای handler_executor (ASYNC_HANDLER_WORKERS) انجام می‌دهند؛ executor دیتابیس فقط
+کارهای دوره‌ای (تمدید lease رهبر و تیک AI) را به ترتیب اجرا می‌کند. پس حداکثر
+ASYNC_HANDLER_WORKERS هندلر هم‌زمان روی دیتابیس هستند و event loop هیچ‌گاه منتظر SQLite نمی‌ماند.
+"""
+import json
+import signal
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 1024 * 1024
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 413: 'Payload Too Large', 503: 'Service Unavailable'}
+
+class AsyncBotServer:
+    """سرویس‌دهی asyncio: دریافت webhook، dispatch، و کارهای دوره‌ای روی یک event loop
+
+    هندلرهای همزمان (sync) موجود، همراه کار دیتابیسی‌شان، از طریق adapter در handler_executor
+    اجرا می‌شوند و کارهای دیتابیسی زمان‌بند در یک executor تک‌threadی جدا.
+    """
+
+    def __init__(self, process_update, status, home_text, host, port,
+                 handler_workers=16, max_in_flight=1000):
+        self.process_update = process_update  # تابع sync که dict آپدیت را پردازش می‌کند
+        self.status = status
+        self.home_text = home_text
+        self.host = host
+        self.port = port
+        self.handler_executor = ThreadPoolExecutor(max_workers=handler_workers, thread_name_prefix='async-handler')
+        self.db_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='async-db')
+        # کارهای طولانی با اتصال جداگانه (مثل پشتیبان) تا تیک AI پشت آن‌ها نماند
+        self.background_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='async-bg')
+        self.max_in_flight = max_in_flight
+        self._in_flight = None
+        self._tasks = set()
+        self._periodic = []
+        self.accepted = 0
+        self.processed = 0
+
+    def add_periodic(self, interval_seconds, func, background=False):
+        """کار دوره‌ای sync که در executor دیتابیس (یا با background در executor جدا) اجرا می‌شود"""
+        self._periodic.append((interval_seconds, func, background))
+
+    async def _dispatch(self, data):
+        try:
+            await asyncio.get_running_loop().run_in_executor(self.handler_executor, self.process_update, data)
+            self.processed += 1
+        except Exception as e:
+            logger.error(f"Async dispatch failed: {e}")
+        finally:
+            self._in_flight.release()
+
+    async def _run_periodic(self, interval_seconds, func, background):
+        executor = self.background_executor if background else self.db_executor
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                await asyncio.get_running_loop().run_in_executor(executor, func)
+            except Exception as e:
+                logger.error(f"Periodic job {getattr(func, '__name__', func)} failed: {e}")
+
+    async def _route(self, method, path, body):
+        path = path.split('?', 1)[0]
+        if path == '/' and method == 'GET':
+            return 200, 'text/plain; charset=utf-8', self.home_text.encode()
+        if path == '/ready' and method == 'GET':
+            status = self.status()
+            return (200 if status['ready'] else 503), 'application/json', json.dumps(status).encode()
+        if path == '/webhook' and method == 'POST':
+            try:
+                data = json.loads(body)
+            except ValueError:
+                return 400, 'text/plain', b'Bad Request'
+            # فشار معکوس: بیش از max_in_flight آپدیت هم‌زمان پذیرفته نمی‌شود
+            await self._in_flight.acquire()
+            self.accepted += 1
+            task = asyncio.create_task(self._dispatch(data))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            return 200, 'text/plain', b'OK'
+        return 404, 'text/plain', b'Not Found'
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+
+                lines = head.decode('latin-1').split('\r\n')
+                try:
+                    method, path, version = lines[0].split(' ', 2)
+                except ValueError:
+                    break
+                headers = {}
+                for line in lines[1:]:
+                    if ':' in line:
+                        name, value = line.split(':', 1)
+                        headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get('content-length') or 0)
+                if length > MAX_BODY_BYTES:
+                    status, content_type, payload = 413, 'text/plain', b'Payload Too Large'
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length) if length else b''
+                    status, content_type, payload = await self._route(method, path, body)
+                    keep_alive = (headers.get('connection', '').lower() != 'close'
+                                  and version == 'HTTP/1.1')
+
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS.get(status, 'OK')}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Length: {len(payload)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + payload
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except Exception as e:
+            logger.error(f"Async connection error: {e}")
+        finally:
+            writer.close()
+
+    async def run(self):
+        self._in_flight = asyncio.Semaphore(self.max_in_flight)
+        server = await asyncio.start_server(
+            self._handle_connection, self.host, self.port, limit=MAX_HEADER_BYTES
+        )
+        periodic = [asyncio.create_task(self._run_periodic(*job)) for job in self._periodic]
+
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except (NotImplementedError, RuntimeError):
+                pass
+
+        logger.info(f"Async server listening on {self.host}:{self.port}")
+        async with server:
+            await stop.wait()
+
+        # توقف: کارهای دوره‌ای لغو و آپدیت‌های در جریان تخلیه می‌شوند
+        for task in periodic:
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self.handler_executor.shutdown(wait=True)
+        self.db_executor.shutdown(wait=True)
+        self.background_executor.shutdown(wait=True)
+        logger.info(f"Async server stopped (accepted {self.accepted}, processed {self.processed})")
+
+    def serve(self):
+        asyncio.run(self.run())
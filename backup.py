@@ -0,0 +1,201 @@
+"""پشتیبان‌گیری آنلاین دیتابیس بازی با backup API در دسته‌های کوچک صفحه
+
+گرفتن یک پشتیبان:
+    python backup.py
+فهرست پشتیبان‌ها و هزینه آخرین اجراها:
+    python backup.py --list
+بازگردانی (بهتر است ربات متوقف باشد):
+    python backup.py --restore backups/ancient_war_20240101_120000.db.gz
+"""
+import os
+import gzip
+import time
+import shutil
+import sqlite3
+import logging
+import argparse
+from datetime import datetime
+from config import DB_NAME, BACKUP_DIR, BACKUP_KEEP, BACKUP_PAGES_PER_STEP, BACKUP_STEP_SLEEP_SECONDS
+from migrations import migrate, get_version
+
+logger = logging.getLogger(__name__)
+
+class _Restarted(Exception):
+    """کپی گام‌به‌گام بیش از حد مجاز از اول شروع شد"""
+
+def verify(path):
+    """باز کردن فایل دیتابیس و بررسی سلامت؛ نسخه مهاجرت آن برگردانده می‌شود"""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        # integrity_check به جای quick_check: quick_check در SQLite 3.40 برای جدول‌های WITHOUT ROWID
+        # با ترتیب کلید متفاوت (region_distance) خطای NOT NULL کاذب می‌دهد
+        result = conn.execute('PRAGMA integrity_check').fetchone()[0]
+        if result != 'ok':
+            raise sqlite3.DatabaseError(f"{path}: integrity_check failed: {result}")
+        return get_version(conn)
+    finally:
+        conn.close()
+
+class BackupManager:
+    """پشتیبان فشرده و چرخشی از دیتابیس زنده بدون قفل طولانی روی نویسنده‌ها
+
+    کپی با اتصال جداگانه و در گام‌های pages صفحه‌ای انجام می‌شود و بین گام‌ها sleep ثانیه
+    مکث می‌کند تا نویسنده‌ها (هندلرها و تیک AI) بین گام‌ها قفل را بگیرند. نوشتن اتصال دیگری
+    بین گام‌ها کپی را از اول شروع می‌کند؛ بعد از max_restarts بار، کپی در یک گام انجام می‌شود
+    که در حالت WAL فقط یک تراکنش خواندن است و نویسنده‌ها را متوقف نمی‌کند. هزینه هر اجرا
+    در جدول backup_log ثبت می‌شود.
+    """
+
+    def __init__(self, path=DB_NAME, backup_dir=BACKUP_DIR, keep=BACKUP_KEEP,
+                 pages=BACKUP_PAGES_PER_STEP, sleep=BACKUP_STEP_SLEEP_SECONDS, max_restarts=3):
+        self.path = path
+        self.backup_dir = backup_dir
+        self.keep = keep
+        self.pages = pages
+        self.sleep = sleep
+        self.max_restarts = max_restarts
+
+    def _archive_name(self):
+        base = os.path.splitext(os.path.basename(self.path))[0]
+        return os.path.join(self.backup_dir, f"{base}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db.gz")
+
+    def archives(self):
+        """فایل‌های پشتیبان، جدیدترین اول"""
+        if not os.path.isdir(self.backup_dir):
+            return []
+        base = os.path.splitext(os.path.basename(self.path))[0]
+        names = [n for n in os.listdir(self.backup_dir) if n.startswith(f"{base}_") and n.endswith('.db.gz')]
+        return [os.path.join(self.backup_dir, n) for n in sorted(names, reverse=True)]
+
+    def run(self):
+        """یک پشتیبان کامل: کپی گام‌به‌گام، فشرده‌سازی، بررسی، چرخش و ثبت هزینه"""
+        os.makedirs(self.backup_dir, exist_ok=True)
+        archive = self._archive_name()
+        tmp_path = f"{archive[:-3]}.tmp"
+        started_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        started = time.perf_counter()
+        steps = []
+        restarts = 0
+
+        def progress(status, remaining, total):
+            nonlocal restarts
+            # بیشتر شدن صفحات باقی‌مانده یعنی کپی از اول شروع شده
+            if steps and remaining > steps[-1][0]:
+                restarts += 1
+                if restarts > self.max_restarts:
+                    raise _Restarted()
+            steps.append((remaining, total))
+
+        source = sqlite3.connect(self.path)
+        try:
+            target = sqlite3.connect(tmp_path)
+            try:
+                try:
+                    source.backup(target, pages=self.pages, progress=progress, sleep=self.sleep)
+                except _Restarted:
+                    source.backup(target, pages=-1, progress=progress)
+            finally:
+                target.close()
+            copied = time.perf_counter()
+
+            version = verify(tmp_path)
+            size = os.path.getsize(tmp_path)
+            with open(tmp_path, 'rb') as src, gzip.open(f"{archive}.tmp", 'wb', compresslevel=6) as dst:
+                shutil.copyfileobj(src, dst)
+            os.replace(f"{archive}.tmp", archive)
+            os.remove(tmp_path)
+            finished = time.perf_counter()
+
+            record = {
+                'path': archive,
+                'started_at': started_at,
+                'pages': steps[-1][1] if steps else 0,
+                'steps': len(steps),
+                'restarts': restarts,
+                'copy_ms': round((copied - started) * 1000, 1),
+                'total_ms': round((finished - started) * 1000, 1),
+                'size_bytes': size,
+                'compressed_bytes': os.path.getsize(archive),
+                'schema_version': version,
+            }
+            source.execute('''
+            INSERT INTO backup_log
+                (path, started_at, pages, steps, restarts, copy_ms, total_ms,
+                 size_bytes, compressed_bytes, schema_version)
+            VALUES
+                (:path, :started_at, :pages, :steps, :restarts, :copy_ms, :total_ms,
+                 :size_bytes, :compressed_bytes, :schema_version)
+            ''', record)
+            source.commit()
+        finally:
+            source.close()
+            for leftover in (tmp_path, f"{archive}.tmp"):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+
+        removed = self.rotate()
+        logger.info(
+            f"Backup {archive}: {record['pages']} pages in {record['steps']} steps "
+            f"({record['restarts']} restarts), "
+            f"copy {record['copy_ms']} ms, total {record['total_ms']} ms, "
+            f"{record['size_bytes']} -> {record['compressed_bytes']} bytes, rotated {removed}"
+        )
+        return record
+
+    def rotate(self):
+        """حذف پشتیبان‌های قدیمی‌تر از keep عدد آخر"""
+        removed = 0
+        for path in self.archives()[self.keep:]:
+            os.remove(path)
+            removed += 1
+        return removed
+
+    def last(self, limit=1):
+        """آخرین رکوردهای هزینه پشتیبان از جدول backup_log"""
+        conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        conn.row_factory = sqlite3.Row
+        try:
+            rows = conn.execute('SELECT * FROM backup_log ORDER BY id DESC LIMIT ?', (limit,)).fetchall()
+            return [dict(row) for row in rows]
+        finally:
+            conn.close()
+
+    def restore(self, archive):
+        """بازگردانی یک پشتیبان روی دیتابیس با backup API (سازگار با فایل‌های WAL)"""
+        tmp_path = f"{self.path}.restore"
+        with gzip.open(archive, 'rb') as src, open(tmp_path, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        try:
+            version = verify(tmp_path)
+            source = sqlite3.connect(tmp_path)
+            target = sqlite3.connect(self.path)
+            try:
+                source.backup(target)
+                # پشتیبان قدیمی‌تر از کد فعلی تا نسخه جاری مهاجرت داده می‌شود
+                migrate(target)
+            finally:
+                target.close()
+                source.close()
+        finally:
+            os.remove(tmp_path)
+        logger.info(f"Restored {archive} (schema version {version}) into {self.path}")
+        return version
+
+if __name__ == '__main__':
+    import json
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Online backups of the game database')
+    parser.add_argument('--db', default=DB_NAME)
+    parser.add_argument('--dir', default=BACKUP_DIR)
+    parser.add_argument('--list', action='store_true', help='list archives and recent backup costs')
+    parser.add_argument('--restore', metavar='ARCHIVE', help='restore ARCHIVE into --db')
+    args = parser.parse_args()
+
+    manager = BackupManager(args.db, args.dir)
+    if args.restore:
+        manager.restore(args.restore)
+    elif args.list:
+        print(json.dumps({'archives': manager.archives(), 'recent': manager.last(10)}, indent=2))
+    else:
+        print(json.dumps(manager.run(), indent=2))
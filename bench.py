@@ -0,0 +1,173 @@
+"""بنچمارک موتورهای ذخیره‌سازی و مدل‌های ردیف
+
+تیک‌های AI با GameLogic روی MemoryStorage و Database (کپی موقت همان فایل):
+    python worldgen.py --countries 100000 --db ancient_war.db
+    python bench.py storage --seconds 2 --humans 200
+
+حافظه و زمان ساخت ردیف‌ها با sqlite3.Row در برابر مدل‌های slotted (models.py):
+    python bench.py models --countries 50000
+"""
+import os
+import sys
+import time
+import operator
+import random
+import sqlite3
+import logging
+import argparse
+import tempfile
+import tracemalloc
+from config import DB_NAME
+
+logger = logging.getLogger(__name__)
+
+def _per_call_ms(func, items):
+    started = time.perf_counter()
+    for item in items:
+        func(item)
+    return (time.perf_counter() - started) / len(items) * 1000
+
+def _run_ticks(storage, seconds, budget, humans, seed):
+    """کشورهای انسانی نمونه، سپس تیک‌های AI تا پایان زمان؛ بازدهی و هزینه جستجوی هدف"""
+    from game_logic import GameLogic
+
+    rng = random.Random(seed)
+    country_ids = sorted(c.id for c in storage.get_ai_countries())
+    for user_id, country_id in enumerate(rng.sample(country_ids, min(humans, len(country_ids))), start=1):
+        storage.assign_country_to_player(country_id, user_id, f"bench{user_id}", f"Bench {user_id}")
+
+    logic = GameLogic(storage, tick_budget_seconds=budget)
+    probes = rng.sample(country_ids, min(200, len(country_ids)))
+    attack_ms = _per_call_ms(lambda c: storage.get_attack_targets(c, 10 ** 9, logic.world.reach), probes)
+
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        logic.process_all_ai_decisions()
+    elapsed = time.perf_counter() - started
+    return {
+        'ticks': logic.totals['ticks'],
+        'processed': logic.totals['processed'],
+        'countries_per_second': round(logic.totals['processed'] / elapsed, 1),
+        'attack_targets_ms': round(attack_ms, 3),
+        'last_tick': logic.tick_stats,
+    }
+
+def bench_storage(path=DB_NAME, seconds=2.0, budget=0.5, humans=200, seed=7):
+    """GameLogic روی MemoryStorage در برابر Database؛ فایل اصلی تغییر نمی‌کند"""
+    from storage import MemoryStorage
+
+    started = time.perf_counter()
+    memory = MemoryStorage()
+    memory.load(path)
+    report = {
+        'countries': len(memory.countries),
+        'memory_load_ms': round((time.perf_counter() - started) * 1000, 1),
+        'memory': _run_ticks(memory, seconds, budget, humans, seed),
+    }
+
+    # Database همیشه DB_NAME پوشه جاری را باز می‌کند؛ کپی در پوشه موقت
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        source = sqlite3.connect(path)
+        target = sqlite3.connect(os.path.join(tmp, DB_NAME))
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
+        os.chdir(tmp)
+        try:
+            from database import Database
+            db = Database()
+            try:
+                report['sqlite'] = _run_ticks(db, seconds, budget, humans, seed)
+            finally:
+                db.conn.close()
+        finally:
+            os.chdir(cwd)
+    return report
+
+# اتحادها با نام دو کشور خوانده می‌شوند (همان کوئری get_allies و صفحه اتحادها)
+MODEL_SOURCES = {
+    'alliances': 'alliances a JOIN countries c1 ON c1.id = a.country1_id JOIN countries c2 ON c2.id = a.country2_id',
+}
+
+def _fetch(conn, table, model, factory):
+    cursor = conn.cursor()
+    cursor.row_factory = factory
+    cursor.execute(f"SELECT {model.select_columns()} FROM {MODEL_SOURCES.get(table, table)}")
+    return cursor.fetchall()
+
+def _timed(func):
+    started = time.perf_counter()
+    result = func()
+    return time.perf_counter() - started, result
+
+def bench_models(countries=50000):
+    """مقایسه حافظه و زمان ساخت ردیف‌ها: sqlite3.Row در برابر اشیاء slotted"""
+    from migrations import migrate
+    from models import Country, Resources, Army, Alliance
+
+    conn = sqlite3.connect(':memory:')
+    migrate(conn)
+    conn.execute('DELETE FROM countries')
+    conn.executemany(
+        'INSERT INTO countries (id, name, specialty, color, region) VALUES (?, ?, ?, ?, ?)',
+        [(i, f"country-{i}", 'specialty', '🟡', f"region-{i % 50}") for i in range(1, countries + 1)]
+    )
+    conn.execute('INSERT INTO resources (country_id) SELECT id FROM countries')
+    conn.execute('INSERT INTO army (country_id) SELECT id FROM countries')
+    conn.execute('''
+    INSERT INTO alliances (country1_id, country2_id, relation_type)
+    SELECT id, id + 1, 'ALLIANCE' FROM countries WHERE id < ?
+    ''', (countries,))
+    conn.commit()
+
+    report = {'countries': countries, 'python': sys.version.split()[0], 'tables': {}}
+    for table, model in (('countries', Country), ('resources', Resources), ('army', Army), ('alliances', Alliance)):
+        result = {}
+        for label, factory in (('sqlite3.Row', sqlite3.Row), ('slots', model.row_factory)):
+            # زمان ساخت بدون tracemalloc (بهترین از سه اجرا)
+            build = min(_timed(lambda: _fetch(conn, table, model, factory))[0] for _ in range(3))
+
+            tracemalloc.start()
+            rows = _fetch(conn, table, model, factory)
+            memory = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+
+            # دسترسی با کلید رشته‌ای، همان الگوی هندلرها
+            key_access = _timed(lambda: [row[column] for row in rows for column in model.COLUMNS])[0]
+            result[label] = {
+                'rows': len(rows),
+                'build_ms': round(build * 1000, 1),
+                'bytes_per_row': round(memory / len(rows), 1),
+                'key_access_ns': round(key_access / (len(rows) * len(model.COLUMNS)) * 1e9, 1),
+            }
+            if factory is not sqlite3.Row:
+                getters = [operator.attrgetter(column) for column in model.COLUMNS]
+                attr_access = _timed(lambda: [get(row) for row in rows for get in getters])[0]
+                result[label]['attr_access_ns'] = round(attr_access / (len(rows) * len(model.COLUMNS)) * 1e9, 1)
+            del rows
+        report['tables'][table] = result
+    conn.close()
+    return report
+
+if __name__ == '__main__':
+    import json
+
+    parser = argparse.ArgumentParser(description='Storage and model benchmarks')
+    commands = parser.add_subparsers(dest='command', required=True)
+    storage_parser = commands.add_parser('storage', help='AI ticks on MemoryStorage and Database')
+    storage_parser.add_argument('--db', default=DB_NAME)
+    storage_parser.add_argument('--seconds', type=float, default=2.0)
+    storage_parser.add_argument('--budget', type=float, default=0.5, help='AI tick budget in seconds')
+    storage_parser.add_argument('--humans', type=int, default=200, help='countries assigned to fake players')
+    storage_parser.add_argument('--seed', type=int, default=7)
+    models_parser = commands.add_parser('models', help='slotted models against sqlite3.Row')
+    models_parser.add_argument('--countries', type=int, default=50000)
+    args = parser.parse_args()
+
+    if args.command == 'storage':
+        print(json.dumps(bench_storage(args.db, args.seconds, args.budget, args.humans, args.seed), indent=2))
+    else:
+        print(json.dumps(bench_models(args.countries), indent=2, ensure_ascii=False))
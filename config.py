@@ -11,22 +11,129 @@ WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
 PORT = int(os.getenv("PORT", 8443))
 LISTEN = "0.0.0.0"
 
+# تعداد threadهای هر worker در gunicorn (باید با Procfile یکی باشد)
+WEB_THREADS = int(os.getenv("WEB_THREADS", 4))
+
+# تعداد workerهای داخلی dispatcher تلگرام
+PTB_WORKERS = int(os.getenv("PTB_WORKERS", 4))
+
+# تنظیمات اتصال خروجی به Bot API
+TELEGRAM_API_BASE_URL = os.getenv("TELEGRAM_API_BASE_URL", "")  # خالی = api.telegram.org
+TELEGRAM_POOL_SIZE = int(os.getenv("TELEGRAM_POOL_SIZE", 0))  # 0 = محاسبه خودکار از تعداد threadها
+TELEGRAM_CONNECT_TIMEOUT = 5.0
+TELEGRAM_READ_TIMEOUT = 10.0
+TELEGRAM_ENDPOINT_TIMEOUTS = {
+    "answerCallbackQuery": 3.0,
+    "sendMessage": 10.0,
+    "editMessageText": 10.0,
+    "setWebhook": 30.0,
+}
+
+# حالت سرویس‌دهی: flask (gunicorn/Flask) یا async (event loop واحد asyncio)
+SERVE_MODE = os.getenv("SERVE_MODE", "flask")
+ASYNC_HANDLER_WORKERS = int(os.getenv("ASYNC_HANDLER_WORKERS", 16))  # threadهای adapter هندلرهای sync
+ASYNC_MAX_IN_FLIGHT = int(os.getenv("ASYNC_MAX_IN_FLIGHT", 1000))  # حداکثر آپدیت هم‌زمان در جریان
+
+# فاصله اجرای تصمیم‌گیری AI (دقیقه)
+AI_TICK_MINUTES = 5
+# سقف زمان هر تیک AI؛ کشورهای باقی‌مانده به ترتیب فوریت به تیک بعد می‌روند (0 = بدون سقف)
+AI_TICK_BUDGET_SECONDS = float(os.getenv("AI_TICK_BUDGET_SECONDS", 60))
+AI_TICK_MIN_COUNTRIES = int(os.getenv("AI_TICK_MIN_COUNTRIES", 20))  # حتی با اتمام بودجه در هر تیک پردازش می‌شوند
+
+# حالت راه‌اندازی: eager (هنگام import)، background (در thread پس‌زمینه) یا lazy (در اولین درخواست)
+STARTUP_MODE = os.getenv("STARTUP_MODE", "eager")
+
+# تعداد threadهای اجرای پس‌زمینه callbackهای سنگین
+DEFERRED_WORKERS = int(os.getenv("DEFERRED_WORKERS", 4))
+
+# محدودیت نرخ دکمه‌ها: مسیر -> (ظرفیت سطل، توکن در ثانیه)
+RATE_LIMITS = {
+    "collect_resources": (3, 0.1),
+    "upgrade_army": (3, 0.1),
+    "refresh_dashboard": (5, 0.5),
+    "default": (10, 1.0),
+}
+
+# فشارهای یکسان یک کاربر در این بازه (ثانیه) یکی حساب می‌شوند
+DEBOUNCE_SECONDS = float(os.getenv("DEBOUNCE_SECONDS", 1.0))
+
+# حذف آپدیت‌های تکراری (ارسال مجدد تلگرام)
+UPDATE_DEDUP_CAPACITY = 10000  # اندازه LRU در حافظه هر worker
+UPDATE_DEDUP_WINDOW_SECONDS = 3600  # مدت نگهداری update_id در جدول مشترک
+UPDATE_DEDUP_SHARED = os.getenv("UPDATE_DEDUP_SHARED", "1") == "1"  # بررسی مشترک بین workerها در SQLite
+
+# اعلان خلاصه حمله‌ها و خیانت‌های AI به بازیکنان
+NOTIFY_RATE_PER_SECOND = float(os.getenv("NOTIFY_RATE_PER_SECOND", 20))  # زیر سقف حدود 30 پیام در ثانیه تلگرام
+NOTIFY_BURST = 20
+NOTIFY_DIGEST_MAX_LINES = 10  # رویدادهای بیشتر در یک خط خلاصه می‌شوند
+
+# مسیر خواندن نماهای فقط‌خواندنی: ro (اتصال mode=ro روی WAL)، snapshot (کپی درون‌حافظه) یا primary
+READ_MODE = os.getenv("READ_MODE", "ro")
+READ_SNAPSHOT_MAX_AGE_SECONDS = float(os.getenv("READ_SNAPSHOT_MAX_AGE_SECONDS", 30))  # حداکثر کهنگی snapshot
+
+# ضبط آپدیت‌های webhook برای پخش دوباره با traffic.py؛ دایرکتوری خالی = غیرفعال
+TRAFFIC_RECORD_DIR = os.getenv("TRAFFIC_RECORD_DIR", "")
+TRAFFIC_RECORD_MAX_BYTES = 50 * 1024 * 1024  # اندازه (فشرده‌نشده) هر فایل قبل از چرخش
+TRAFFIC_RECORD_SALT = os.getenv("TRAFFIC_RECORD_SALT", BOT_TOKEN)  # نمک ناشناس‌سازی شناسه کاربران
+
+# پروفایل حافظه هر worker (memprofile.py)؛ tracemalloc فقط با دکمه «حافظه» پنل مدیریت روشن می‌شود
+MEMORY_TRACE_FRAMES = int(os.getenv("MEMORY_TRACE_FRAMES", 1))  # عمق traceback هر تخصیص
+MEMORY_TRACE_ON_START = os.getenv("MEMORY_TRACE_ON_START", "0") == "1"  # ردیابی از شروع worker
+MEMORY_SAMPLE_MINUTES = int(os.getenv("MEMORY_SAMPLE_MINUTES", 10))  # لاگ RSS و کش‌ها؛ 0 = غیرفعال
+MEMORY_REPORT_TOP = 8  # تعداد محل‌های تخصیص در گزارش
+
+# حداکثر کهنگی آینه شمارنده‌های آمار در هر worker (ثانیه)
+COUNTERS_MAX_AGE_SECONDS = 10
+
+# تعداد ردیف در هر صفحه از فهرست‌ها (رده‌بندی، اتحادها، کشورهای AI)
+PAGE_SIZE = 10
+
 # تنظیمات دیتابیس
 DB_NAME = "ancient_war.db"
+TEMPLATE_DB_NAME = "ancient_war_template.db"  # جهان تازه برای شروع فصل و ریست
+ARCHIVE_DIR = "archives"  # بایگانی فصل‌های تمام‌شده
+
+# پشتیبان آنلاین دوره‌ای (backup.py) که فقط worker رهبر اجرا می‌کند
+BACKUP_DIR = os.getenv("BACKUP_DIR", "backups")
+BACKUP_INTERVAL_MINUTES = int(os.getenv("BACKUP_INTERVAL_MINUTES", 60))  # 0 = غیرفعال
+BACKUP_KEEP = int(os.getenv("BACKUP_KEEP", 24))  # تعداد پشتیبان‌های نگه‌داشته‌شده
+BACKUP_PAGES_PER_STEP = 256  # صفحه در هر گام کپی
+BACKUP_STEP_SLEEP_SECONDS = 0.01  # مکث بین گام‌ها تا نویسنده‌ها قفل را بگیرند
+
+# نگهداری تاریخچه: نمونه‌های خام، سپس میانگین ساعتی، سپس روزانه
+HISTORY_RAW_RETENTION_HOURS = 24
+HISTORY_HOURLY_RETENTION_DAYS = 30
+HISTORY_DAILY_RETENTION_DAYS = 365
+
+# تنظیمات انتخاب رهبر (فقط یک worker زمان‌بند AI را اجرا می‌کند)
+LEADER_LEASE_SECONDS = int(os.getenv("LEADER_LEASE_SECONDS", 90))  # مدت اعتبار اجاره رهبری
 
 # لیست کشورهای باستانی
 ANCIENT_COUNTRIES = [
-    {"id": 1, "name": "پارس", "specialty": "اسب‌سوار سریع", "color": "🟡"},
-    {"id": 2, "name": "روم", "specialty": "دفاع قلعه", "color": "🟥"},
-    {"id": 3, "name": "مصر", "specialty": "تیرانداز ماهر", "color": "🟦"},
-    {"id": 4, "name": "چین", "specialty": "نیروی انبوه", "color": "🟢"},
-    {"id": 5, "name": "یونان", "specialty": "فالانژ قدرتمند", "color": "🟣"},
-    {"id": 6, "name": "بابل", "specialty": "دیوار مستحکم", "color": "🟠"},
-    {"id": 7, "name": "آشور", "specialty": "ارابه جنگی", "color": "🟤"},
-    {"id": 8, "name": "کارتاژ", "specialty": "ناوبری دریایی", "color": "🔵"},
-    {"id": 9, "name": "هند", "specialty": "فیل جنگی", "color": "🟣"},
-    {"id": 10, "name": "مقدونیه", "specialty": "سواره‌نظام", "color": "🔴"}
+    {"id": 1, "name": "پارس", "specialty": "اسب‌سوار سریع", "color": "🟡", "region": "ایران"},
+    {"id": 2, "name": "روم", "specialty": "دفاع قلعه", "color": "🟥", "region": "ایتالیا"},
+    {"id": 3, "name": "مصر", "specialty": "تیرانداز ماهر", "color": "🟦", "region": "نیل"},
+    {"id": 4, "name": "چین", "specialty": "نیروی انبوه", "color": "🟢", "region": "شرق دور"},
+    {"id": 5, "name": "یونان", "specialty": "فالانژ قدرتمند", "color": "🟣", "region": "بالکان"},
+    {"id": 6, "name": "بابل", "specialty": "دیوار مستحکم", "color": "🟠", "region": "میان‌رودان"},
+    {"id": 7, "name": "آشور", "specialty": "ارابه جنگی", "color": "🟤", "region": "میان‌رودان"},
+    {"id": 8, "name": "کارتاژ", "specialty": "ناوبری دریایی", "color": "🔵", "region": "شمال آفریقا"},
+    {"id": 9, "name": "هند", "specialty": "فیل جنگی", "color": "🟣", "region": "هند"},
+    {"id": 10, "name": "مقدونیه", "specialty": "سواره‌نظام", "color": "🔴", "region": "بالکان"}
+]
+
+# نقشه جهان: مرز بین مناطق (region هر کشور در بالا)؛ فاصله = تعداد مرز بین دو منطقه
+REGION_ADJACENCY = [
+    ("ایران", "میان‌رودان"),
+    ("ایران", "هند"),
+    ("هند", "شرق دور"),
+    ("میان‌رودان", "نیل"),
+    ("میان‌رودان", "بالکان"),
+    ("نیل", "شمال آفریقا"),
+    ("شمال آفریقا", "ایتالیا"),
+    ("ایتالیا", "بالکان"),
 ]
+ATTACK_REACH = 2  # حداکثر فاصله منطقه‌ای برای حمله و هدف‌یابی
 
 # منابع اولیه
 INITIAL_RESOURCES = {
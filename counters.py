@@ -0,0 +1,106 @@
+import time
+import threading
+from collections import deque
+
+# مقدار هر شمارنده از صفر محاسبه می‌شود (هنگام مهاجرت و بازسازی جهان در شروع فصل)
+COUNTER_QUERIES = {
+    'players_active': 'SELECT COUNT(*) FROM players WHERE is_active = 1',
+    'countries_active': 'SELECT COUNT(*) FROM countries WHERE is_active = 1',
+    'countries_ai': "SELECT COUNT(*) FROM countries WHERE controller = 'AI' AND is_active = 1",
+    'countries_human': "SELECT COUNT(*) FROM countries WHERE controller = 'HUMAN' AND is_active = 1",
+    'active_season': 'SELECT COALESCE(MAX(season_number), 0) FROM seasons WHERE is_active = 1',
+}
+
+def bump(cursor, deltas):
+    """افزایش/کاهش شمارنده‌ها داخل تراکنش فراخواننده"""
+    cursor.executemany('''
+    INSERT INTO counters (name, value) VALUES (?, ?)
+    ON CONFLICT(name) DO UPDATE SET value = value + excluded.value
+    ''', [(name, delta) for name, delta in deltas.items() if delta])
+
+def set_counter(cursor, name, value):
+    cursor.execute('INSERT OR REPLACE INTO counters (name, value) VALUES (?, ?)', (name, value))
+
+def recount(cursor, names=None):
+    """محاسبه دوباره شمارنده‌ها (پیش‌فرض همه) از جداول اصلی؛ مقادیر جدید برگردانده می‌شوند"""
+    values = {}
+    for name in names or COUNTER_QUERIES:
+        values[name] = cursor.execute(COUNTER_QUERIES[name]).fetchone()[0]
+        set_counter(cursor, name, values[name])
+    return values
+
+class Counters:
+    """آینه درون‌حافظه جدول counters
+
+    تغییرات همین پروسه بعد از commit مستقیماً اعمال می‌شوند؛ تغییرات workerهای دیگر
+    حداکثر بعد از max_age_seconds با یک خواندن جدول کوچک counters دیده می‌شوند.
+    """
+
+    def __init__(self, db, max_age_seconds=10):
+        self.db = db
+        self.max_age_seconds = max_age_seconds
+        self._values = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        rows = self.db.conn.execute('SELECT name, value FROM counters').fetchall()
+        with self._lock:
+            self._values = {row[0]: row[1] for row in rows}
+            self._loaded_at = time.monotonic()
+
+    def apply(self, deltas=None, values=None):
+        """اعمال تغییرات commitشده روی آینه"""
+        with self._lock:
+            for name, delta in (deltas or {}).items():
+                self._values[name] = self._values.get(name, 0) + delta
+            self._values.update(values or {})
+
+    def snapshot(self):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.max_age_seconds:
+            self.refresh()
+        with self._lock:
+            return dict(self._values)
+
+    def __len__(self):
+        return len(self._values)
+
+class ThroughputMeter:
+    """شمارش رویدادها در بازه‌های یک‌دقیقه‌ای برای نرخ در دقیقه"""
+
+    def __init__(self, window_minutes=5):
+        self.window_minutes = window_minutes
+        self.started = time.time()
+        self._buckets = {}  # نام -> deque از [دقیقه، تعداد]
+        self._totals = {}
+        self._lock = threading.Lock()
+
+    def hit(self, name, count=1):
+        minute = int(time.time() // 60)
+        with self._lock:
+            buckets = self._buckets.get(name)
+            if buckets is None:
+                buckets = self._buckets[name] = deque()
+            if buckets and buckets[-1][0] == minute:
+                buckets[-1][1] += count
+            else:
+                buckets.append([minute, count])
+                while buckets and buckets[0][0] <= minute - self.window_minutes:
+                    buckets.popleft()
+            self._totals[name] = self._totals.get(name, 0) + count
+
+    def per_minute(self, name):
+        """میانگین در دقیقه در پنجره اخیر (یا از شروع پروسه اگر کوتاه‌تر باشد)"""
+        now = time.time()
+        oldest = int(now // 60) - self.window_minutes + 1
+        with self._lock:
+            total = sum(count for minute, count in self._buckets.get(name, ()) if minute >= oldest)
+        minutes = min(self.window_minutes, max((now - self.started) / 60, 1))
+        return total / minutes
+
+    def total(self, name):
+        with self._lock:
+            return self._totals.get(name, 0)
+
+    def __len__(self):
+        return len(self._buckets)
@@ -1,182 +1,105 @@
 import sqlite3
 import logging
-from config import DB_NAME
+import time
+import threading
+from config import DB_NAME, COUNTERS_MAX_AGE_SECONDS
+from migrations import migrate
+from counters import Counters, bump, recount
+from storage import Storage, RESOURCE_COLUMNS, ARMY_COLUMNS
+from world import write_map
+from models import Country, Resources, Army, Alliance
 
 logger = logging.getLogger(__name__)
 
-class Database:
+class Database(Storage):
     def __init__(self):
         self.conn = sqlite3.connect(DB_NAME, check_same_thread=False)
         self.conn.row_factory = sqlite3.Row
-        self.create_tables()
+        # همه نوشتن‌ها روی اتصال مشترک (اینجا، history و dedup) این قفل را می‌گیرند تا commit یا
+        # rollback یک thread تغییرات نیمه‌کاره thread دیگر را نبندد یا دور نریزد
+        self.lock = threading.RLock()
+        # WAL: اتصال‌های فقط‌خواندنی (readers.py) نوشتن را متوقف نمی‌کنند
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        # در حالت به‌روز فقط یک PRAGMA user_version خوانده می‌شود
+        migrate(self.conn)
+        # شمارنده‌های آمار مدیریت (جدول counters و آینه درون‌حافظه)
+        self.counters = Counters(self, COUNTERS_MAX_AGE_SECONDS)
+        # مسیر خواندن جدا (readers.ReadReplica) برای کوئری‌های سنگین؛ در main تنظیم می‌شود
+        self.reader = None
     
-    def create_tables(self):
+    def _cursor(self, model):
+        """cursor که ردیف‌ها را مستقیماً به شیء slotted مدل تبدیل می‌کند"""
         cursor = self.conn.cursor()
-        
-        # جدول بازیکنان
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS players (
-            user_id INTEGER PRIMARY KEY,
-            username TEXT,
-            full_name TEXT,
-            country_id INTEGER,
-            joined_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            is_active BOOLEAN DEFAULT 1
-        )
-        ''')
-        
-        # جدول کشورها
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS countries (
-            id INTEGER PRIMARY KEY,
-            name TEXT UNIQUE,
-            controller TEXT DEFAULT 'AI', -- 'HUMAN' یا 'AI'
-            player_id INTEGER,
-            specialty TEXT,
-            color TEXT,
-            is_active BOOLEAN DEFAULT 1
-        )
-        ''')
-        
-        # جدول منابع
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS resources (
-            country_id INTEGER PRIMARY KEY,
-            gold INTEGER DEFAULT 1000,
-            iron INTEGER DEFAULT 500,
-            stone INTEGER DEFAULT 800,
-            food INTEGER DEFAULT 1200,
-            last_update TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        ''')
-        
-        # جدول ارتش
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS army (
-            country_id INTEGER PRIMARY KEY,
-            level INTEGER DEFAULT 1,
-            infantry INTEGER DEFAULT 100,
-            cavalry INTEGER DEFAULT 20,
-            archers INTEGER DEFAULT 30,
-            defense INTEGER DEFAULT 50,
-            power INTEGER DEFAULT 150,
-            last_training TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        ''')
-        
-        # جدول اتحادها
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS alliances (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            country1_id INTEGER,
-            country2_id INTEGER,
-            relation_type TEXT, -- 'ALLIANCE', 'WAR', 'NEUTRAL'
-            strength INTEGER DEFAULT 50,
-            created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            UNIQUE(country1_id, country2_id)
-        )
-        ''')
-        
-        # جدول فصل
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS seasons (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            season_number INTEGER,
-            start_date TIMESTAMP,
-            end_date TIMESTAMP,
-            winner_country_id INTEGER,
-            winner_player_id INTEGER,
-            is_active BOOLEAN DEFAULT 0
-        )
-        ''')
-        
-        # جدول رویدادها
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS events (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            event_type TEXT,
-            country_id INTEGER,
-            target_country_id INTEGER,
-            description TEXT,
-            resources_change TEXT, -- JSON
-            army_change TEXT, -- JSON
-            event_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        ''')
-        
-        self.conn.commit()
-        self.initialize_countries()
-    
-    def initialize_countries(self):
-        """مقداردهی اولیه کشورها"""
-        from config import ANCIENT_COUNTRIES
-        
-        cursor = self.conn.cursor()
-        
-        for country in ANCIENT_COUNTRIES:
-            cursor.execute('''
-            INSERT OR IGNORE INTO countries (id, name, specialty, color) 
-            VALUES (?, ?, ?, ?)
-            ''', (country['id'], country['name'], country['specialty'], country['color']))
-        
-        self.conn.commit()
-    
+        cursor.row_factory = model.row_factory
+        return cursor
+
     def get_country_by_id(self, country_id):
-        cursor = self.conn.cursor()
-        cursor.execute('SELECT * FROM countries WHERE id = ?', (country_id,))
+        cursor = self._cursor(Country)
+        cursor.execute(f'SELECT {Country.select_columns()} FROM countries WHERE id = ?', (country_id,))
         return cursor.fetchone()
     
     def get_player_country(self, user_id):
-        cursor = self.conn.cursor()
-        cursor.execute('''
-        SELECT c.* FROM players p
+        cursor = self._cursor(Country)
+        cursor.execute(f'''
+        SELECT {Country.select_columns('c')} FROM players p
         JOIN countries c ON p.country_id = c.id
         WHERE p.user_id = ? AND p.is_active = 1
         ''', (user_id,))
         return cursor.fetchone()
     
     def assign_country_to_player(self, country_id, user_id, username, full_name):
-        cursor = self.conn.cursor()
-        
-        # بررسی اینکه کشور قبلاً اختصاص داده نشده باشد
-        cursor.execute('SELECT controller FROM countries WHERE id = ?', (country_id,))
-        country = cursor.fetchone()
-        
-        if country and country['controller'] == 'AI':
-            # ثبت بازیکن
-            cursor.execute('''
-            INSERT OR REPLACE INTO players (user_id, username, full_name, country_id, is_active)
-            VALUES (?, ?, ?, ?, 1)
-            ''', (user_id, username, full_name, country_id))
+        with self.lock:
+            cursor = self.conn.cursor()
             
-            # به‌روزرسانی کشور
-            cursor.execute('''
-            UPDATE countries 
-            SET controller = 'HUMAN', player_id = ?
-            WHERE id = ?
-            ''', (user_id, country_id))
-            
-            # ایجاد منابع اولیه
-            cursor.execute('''
-            INSERT OR REPLACE INTO resources (country_id) 
-            VALUES (?)
-            ''', (country_id,))
+            # بررسی اینکه کشور قبلاً اختصاص داده نشده باشد
+            cursor.execute('SELECT controller FROM countries WHERE id = ?', (country_id,))
+            country = cursor.fetchone()
             
-            # ایجاد ارتش اولیه
-            cursor.execute('''
-            INSERT OR REPLACE INTO army (country_id) 
-            VALUES (?)
-            ''', (country_id,))
+            if country and country['controller'] == 'AI':
+                cursor.execute('SELECT is_active FROM players WHERE user_id = ?', (user_id,))
+                existing = cursor.fetchone()
+                deltas = {
+                    'players_active': 0 if existing and existing['is_active'] else 1,
+                    'countries_ai': -1,
+                    'countries_human': 1,
+                }
+                
+                # ثبت بازیکن
+                cursor.execute('''
+                INSERT OR REPLACE INTO players (user_id, username, full_name, country_id, is_active)
+                VALUES (?, ?, ?, ?, 1)
+                ''', (user_id, username, full_name, country_id))
+                
+                # به‌روزرسانی کشور
+                cursor.execute('''
+                UPDATE countries 
+                SET controller = 'HUMAN', player_id = ?
+                WHERE id = ?
+                ''', (user_id, country_id))
+                
+                # ایجاد منابع اولیه
+                cursor.execute('''
+                INSERT OR REPLACE INTO resources (country_id) 
+                VALUES (?)
+                ''', (country_id,))
+                
+                # ایجاد ارتش اولیه
+                cursor.execute('''
+                INSERT OR REPLACE INTO army (country_id) 
+                VALUES (?)
+                ''', (country_id,))
+                
+                bump(cursor, deltas)
+                self.conn.commit()
+                self.counters.apply(deltas)
+                return True
             
-            self.conn.commit()
-            return True
-        
-        return False
+            return False
     
     def get_ai_countries(self):
-        cursor = self.conn.cursor()
-        cursor.execute('''
-        SELECT * FROM countries 
+        cursor = self._cursor(Country)
+        cursor.execute(f'''
+        SELECT {Country.select_columns()} FROM countries
         WHERE controller = 'AI' AND is_active = 1
         ORDER BY id
         ''')
@@ -188,15 +111,33 @@ class Database:
         return cursor.fetchone()
     
     def start_new_season(self, season_number):
-        cursor = self.conn.cursor()
-        cursor.execute('''
-        UPDATE seasons SET is_active = 0
-        ''')
-        cursor.execute('''
-        INSERT INTO seasons (season_number, start_date, is_active)
-        VALUES (?, CURRENT_TIMESTAMP, 1)
-        ''', (season_number,))
-        self.conn.commit()
+        with self.lock:
+            cursor = self.conn.cursor()
+            cursor.execute('''
+            UPDATE seasons SET is_active = 0
+            ''')
+            cursor.execute('''
+            INSERT INTO seasons (season_number, start_date, is_active)
+            VALUES (?, CURRENT_TIMESTAMP, 1)
+            ''', (season_number,))
+            values = recount(cursor, ['active_season'])
+            self.conn.commit()
+            self.counters.apply(values=values)
+    
+    def end_season(self, season_id, winner_country_id, winner_player_id):
+        with self.lock:
+            cursor = self.conn.cursor()
+            cursor.execute('''
+            UPDATE seasons
+            SET end_date = CURRENT_TIMESTAMP,
+                winner_country_id = ?,
+                winner_player_id = ?,
+                is_active = 0
+            WHERE id = ?
+            ''', (winner_country_id, winner_player_id, season_id))
+            values = recount(cursor, ['active_season'])
+            self.conn.commit()
+            self.counters.apply(values=values)
     
     def get_all_players(self):
         cursor = self.conn.cursor()
@@ -209,54 +150,299 @@ class Database:
         return cursor.fetchall()
     
     def update_resources(self, country_id, resources_dict):
-        cursor = self.conn.cursor()
-        set_clause = ', '.join([f"{key} = {key} + ?" for key in resources_dict.keys()])
-        values = list(resources_dict.values())
-        values.append(country_id)
-        
-        query = f'''
-        UPDATE resources 
-        SET {set_clause}, last_update = CURRENT_TIMESTAMP
-        WHERE country_id = ?
-        '''
-        cursor.execute(query, values)
-        self.conn.commit()
+        with self.lock:
+            cursor = self.conn.cursor()
+            set_clause = ', '.join([f"{key} = {key} + ?" for key in resources_dict.keys()])
+            values = list(resources_dict.values())
+            values.append(country_id)
+            
+            query = f'''
+            UPDATE resources 
+            SET {set_clause}, last_update = CURRENT_TIMESTAMP
+            WHERE country_id = ?
+            '''
+            cursor.execute(query, values)
+            self.conn.commit()
     
     def get_country_resources(self, country_id):
-        cursor = self.conn.cursor()
-        cursor.execute('SELECT * FROM resources WHERE country_id = ?', (country_id,))
+        cursor = self._cursor(Resources)
+        cursor.execute(f'SELECT {Resources.select_columns()} FROM resources WHERE country_id = ?', (country_id,))
         return cursor.fetchone()
     
     def get_country_army(self, country_id):
-        cursor = self.conn.cursor()
-        cursor.execute('SELECT * FROM army WHERE country_id = ?', (country_id,))
+        cursor = self._cursor(Army)
+        cursor.execute(f'SELECT {Army.select_columns()} FROM army WHERE country_id = ?', (country_id,))
         return cursor.fetchone()
     
-    def upgrade_army_level(self, country_id, cost):
-        """ارتقای سطح ارتش"""
-        cursor = self.conn.cursor()
+    def spend(self, country_id, cost, army_effect=None, army_guard=None):
+        """کسر شرطی منابع و اعمال اثر ارتش در یک تراکنش
         
-        # افزایش سطح و قدرت
-        cursor.execute('''
-        UPDATE army 
-        SET level = level + 1, 
-            power = power + 50,
-            defense = defense + 20,
-            last_training = CURRENT_TIMESTAMP
-        WHERE country_id = ?
-        ''', (country_id,))
+        منابع فقط اگر کافی باشند با یک UPDATE محافظت‌شده کم می‌شوند؛
+        army_guard (مثل {'level': 2}) شرط وضعیت فعلی ارتش است.
+        خروجی True یعنی هزینه پرداخت و اثر اعمال شد.
+        """
+        cost = {key: value for key, value in cost.items() if value}
+        army_effect = army_effect or {}
+        army_guard = army_guard or {}
+        for key in list(cost) + list(army_effect) + list(army_guard):
+            if key not in RESOURCE_COLUMNS and key not in ARMY_COLUMNS:
+                raise ValueError(f"Unknown column: {key}")
         
-        # کم کردن منابع
+        with self.lock:
+            cursor = self.conn.cursor()
+            try:
+                if cost:
+                    set_clause = ', '.join(f"{key} = {key} - ?" for key in cost)
+                    guard_clause = ' AND '.join(f"{key} >= ?" for key in cost)
+                    cursor.execute(f'''
+                    UPDATE resources
+                    SET {set_clause}, last_update = CURRENT_TIMESTAMP
+                    WHERE country_id = ? AND {guard_clause}
+                    ''', [*cost.values(), country_id, *cost.values()])
+                    if cursor.rowcount != 1:
+                        # چیزی تغییر نکرده؛ فقط تراکنش خالی بسته می‌شود
+                        self.conn.commit()
+                        return False
+                
+                if army_effect or army_guard:
+                    set_clause = ', '.join(
+                        [f"{key} = {key} + ?" for key in army_effect] + ['last_training = CURRENT_TIMESTAMP']
+                    )
+                    guard_clause = ''.join(f" AND {key} = ?" for key in army_guard)
+                    cursor.execute(f'''
+                    UPDATE army
+                    SET {set_clause}
+                    WHERE country_id = ?{guard_clause}
+                    ''', [*army_effect.values(), country_id, *army_guard.values()])
+                    if cursor.rowcount != 1:
+                        self.conn.rollback()
+                        return False
+                
+                self.conn.commit()
+                return True
+            except Exception:
+                self.conn.rollback()
+                raise
+    
+    # ---------- عملیات AI و مشاور ----------
+    
+    def _read_conn(self):
+        """اتصال خواندن نماهای سنگین؛ اگر ReadReplica تنظیم نشده باشد اتصال اصلی"""
+        return self.reader.conn() if self.reader is not None else self.conn
+    
+    def get_attack_targets(self, country_id, max_power, reach, limit=3):
+        """کشورهای انسانی ضعیف‌تر از max_power در فاصله reach"""
+        cursor = self.conn.cursor()
         cursor.execute('''
-        UPDATE resources 
-        SET gold = gold - ?,
-            iron = iron - ?,
-            food = food - ?,
-            last_update = CURRENT_TIMESTAMP
-        WHERE country_id = ?
-        ''', (cost.get('gold', 0), cost.get('iron', 0), cost.get('food', 0), country_id))
-        
-        self.conn.commit()
+        SELECT a.country_id, a.power, c.name
+        FROM countries src
+        JOIN region_distance d ON d.from_region = src.region AND d.distance <= ?
+        JOIN countries c ON c.region = d.to_region AND c.controller = 'HUMAN'
+        JOIN army a ON a.country_id = c.id
+        WHERE src.id = ?
+          AND a.power < ?
+          AND c.id != src.id
+        ORDER BY a.power ASC
+        LIMIT ?
+        ''', (reach, country_id, max_power, limit))
+        return cursor.fetchall()
+    
+    def add_event(self, event_type, country_id, target_country_id, description):
+        with self.lock:
+            cursor = self.conn.cursor()
+            cursor.execute('''
+            INSERT INTO events (event_type, country_id, target_country_id, description)
+            VALUES (?, ?, ?, ?)
+            ''', (event_type, country_id, target_country_id, description))
+            self.conn.commit()
+            return cursor.lastrowid
+    
+    def get_alliance_candidates(self, country_id, limit=2):
+        """کشورهای AI که هنوز رابطه‌ای با این کشور ندارند"""
+        cursor = self._cursor(Country)
+        cursor.execute(f'''
+        SELECT {Country.select_columns('c')}
+        FROM countries c
+        LEFT JOIN alliances a ON
+            (a.country1_id = ? AND a.country2_id = c.id) OR
+            (a.country2_id = ? AND a.country1_id = c.id)
+        WHERE c.controller = 'AI'
+          AND c.id != ?
+          AND a.id IS NULL
+        LIMIT ?
+        ''', (country_id, country_id, country_id, limit))
+        return cursor.fetchall()
+    
+    def create_alliance(self, country1_id, country2_id, relation_type='ALLIANCE'):
+        with self.lock:
+            cursor = self.conn.cursor()
+            cursor.execute('''
+            INSERT INTO alliances (country1_id, country2_id, relation_type)
+            VALUES (?, ?, ?)
+            ''', (min(country1_id, country2_id), max(country1_id, country2_id), relation_type))
+            self.conn.commit()
+    
+    def get_allies(self, country_id):
+        """اتحادهای این کشور؛ طرف مقابل با Alliance.partner"""
+        cursor = self._cursor(Alliance)
+        cursor.execute(f'''
+        SELECT {Alliance.select_columns()}
+        FROM alliances a
+        JOIN countries c1 ON c1.id = a.country1_id
+        JOIN countries c2 ON c2.id = a.country2_id
+        WHERE (a.country1_id = ? OR a.country2_id = ?)
+          AND a.relation_type = 'ALLIANCE'
+        ''', (country_id, country_id))
+        return cursor.fetchall()
+    
+    def betray_alliance(self, country_id, ally_id, description):
+        """تبدیل اتحاد به جنگ و ثبت رویداد خیانت در یک تراکنش"""
+        with self.lock:
+            cursor = self.conn.cursor()
+            cursor.execute('''
+            UPDATE alliances
+            SET relation_type = 'WAR'
+            WHERE (country1_id = ? AND country2_id = ?)
+               OR (country1_id = ? AND country2_id = ?)
+            ''', (country_id, ally_id, ally_id, country_id))
+            cursor.execute('''
+            INSERT INTO events (event_type, country_id, target_country_id, description)
+            VALUES (?, ?, ?, ?)
+            ''', ('BETRAYAL', country_id, ally_id, description))
+            self.conn.commit()
+    
+    def count_alliances(self, country_id):
+        cursor = self.conn.cursor()
+        cursor.execute('''
+        SELECT COUNT(*) as alliance_count
+        FROM alliances
+        WHERE (country1_id = ? OR country2_id = ?)
+          AND relation_type = 'ALLIANCE'
+        ''', (country_id, country_id))
+        return cursor.fetchone()['alliance_count']
+    
+    def get_strongest_enemy(self, country_id):
+        cursor = self._read_conn().cursor()
+        cursor.execute('''
+        SELECT c.name, a.power
+        FROM alliances al
+        JOIN countries c ON
+            (c.id = al.country2_id AND al.country1_id = ?) OR
+            (c.id = al.country1_id AND al.country2_id = ?)
+        JOIN army a ON a.country_id = c.id
+        WHERE al.relation_type = 'WAR'
+        ORDER BY a.power DESC
+        LIMIT 1
+        ''', (country_id, country_id))
+        return cursor.fetchone()
+    
+    def get_ai_priorities(self, reach):
+        """ورودی‌های اولویت همه کشورهای AI در یک کوئری: غذا، طلا، قدرت، تعداد جنگ‌ها
+        و قدرت قوی‌ترین کشور انسانی در دسترس
+        """
+        cursor = self._read_conn().cursor()
+        cursor.execute('''
+        WITH war_sides AS (
+            SELECT country1_id AS id FROM alliances WHERE relation_type = 'WAR'
+            UNION ALL
+            SELECT country2_id FROM alliances WHERE relation_type = 'WAR'
+        ),
+        wars AS (
+            SELECT id, COUNT(*) AS wars FROM war_sides GROUP BY id
+        ),
+        rivals AS (
+            SELECT d.to_region AS region, MAX(ha.power) AS rival_power
+            FROM countries h
+            JOIN army ha ON ha.country_id = h.id
+            JOIN region_distance d ON d.from_region = h.region AND d.distance <= ?
+            WHERE h.controller = 'HUMAN'
+            GROUP BY d.to_region
+        )
+        SELECT c.id, r.food, r.gold, a.power, COALESCE(w.wars, 0) AS wars, rv.rival_power
+        FROM countries c
+        LEFT JOIN resources r ON r.country_id = c.id
+        LEFT JOIN army a ON a.country_id = c.id
+        LEFT JOIN wars w ON w.id = c.id
+        LEFT JOIN rivals rv ON rv.region = c.region
+        WHERE c.controller = 'AI' AND c.is_active = 1
+        ORDER BY c.id
+        ''', (reach,))
+        return cursor.fetchall()
+    
+    def get_weak_target(self, country_id, reach, ratio):
+        """یک کشور انسانی در دسترس با قدرت کمتر از ratio برابر قدرت این کشور"""
+        cursor = self._read_conn().cursor()
+        cursor.execute('''
+        SELECT c.name, a.power
+        FROM countries src
+        JOIN region_distance d ON d.from_region = src.region AND d.distance <= ?
+        JOIN countries c ON c.region = d.to_region AND c.controller = 'HUMAN'
+        JOIN army a ON a.country_id = c.id
+        WHERE src.id = ?
+          AND c.id != src.id
+          AND a.power < (SELECT power FROM army WHERE country_id = ?) * ?
+        LIMIT 1
+        ''', (reach, country_id, country_id, ratio))
+        return cursor.fetchone()
+    
+    # ---------- نقشه جهان ----------
+    
+    def get_region_distance(self, country_id, target_id):
+        """فاصله منطقه‌ای دو کشور؛ None اگر مسیری نباشد"""
+        row = self.conn.execute('''
+        SELECT d.distance
+        FROM countries src
+        JOIN countries dst ON dst.id = ?
+        JOIN region_distance d ON d.from_region = src.region AND d.to_region = dst.region
+        WHERE src.id = ?
+        ''', (target_id, country_id)).fetchone()
+        return row[0] if row else None
+    
+    def get_region_adjacency(self):
+        rows = self.conn.execute('SELECT region_a, region_b FROM region_adjacency').fetchall()
+        return sorted((row[0], row[1]) for row in rows)
+    
+    def get_regions(self):
+        rows = self.conn.execute('SELECT DISTINCT region FROM countries WHERE region IS NOT NULL').fetchall()
+        return {row[0] for row in rows}
+    
+    def replace_world_map(self, adjacency):
+        """بازنویسی مرزها و جدول فاصله؛ تعداد جفت‌های فاصله برگردانده می‌شود"""
+        with self.lock:
+            cursor = self.conn.cursor()
+            try:
+                regions = [row[0] for row in cursor.execute('SELECT DISTINCT region FROM countries')]
+                pairs = write_map(cursor, adjacency, regions)
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+            return pairs
+    
+    def acquire_lease(self, name, holder, ttl_seconds):
+        """گرفتن یا تمدید اجاره؛ فقط اگر آزاد، منقضی یا متعلق به همین holder باشد"""
+        with self.lock:
+            now = time.time()
+            cursor = self.conn.cursor()
+            cursor.execute('''
+            INSERT INTO leases (name, holder, expires_at)
+            VALUES (?, ?, ?)
+            ON CONFLICT(name) DO UPDATE
+            SET holder = excluded.holder,
+                expires_at = excluded.expires_at
+            WHERE leases.holder = excluded.holder OR leases.expires_at < ?
+            ''', (name, holder, now + ttl_seconds, now))
+            self.conn.commit()
+            return cursor.rowcount == 1
+    
+    def release_lease(self, name, holder):
+        """آزاد کردن اجاره برای واگذاری سریع رهبری"""
+        with self.lock:
+            cursor = self.conn.cursor()
+            cursor.execute('''
+            DELETE FROM leases WHERE name = ? AND holder = ?
+            ''', (name, holder))
+            self.conn.commit()
     
     def close(self):
         self.conn.close()
@@ -0,0 +1,70 @@
+import time
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+class UpdateDeduplicator:
+    """حذف آپدیت‌های تکراری تلگرام بر اساس update_id قبل از dispatch
+
+    یک LRU محدود در حافظه جلوی همه چیز است؛ اگر db داده شود، پنجره مشترک
+    بین workerها در جدول processed_updates هم بررسی می‌شود.
+    """
+
+    def __init__(self, db=None, capacity=10000, window_seconds=3600, prune_every=500):
+        self.db = db
+        self.capacity = capacity
+        self.window_seconds = window_seconds
+        self.prune_every = prune_every
+        self._recent = OrderedDict()
+        self._lock = threading.Lock()
+        self._inserts = 0
+        self.duplicates = 0
+
+    def is_duplicate(self, update_id):
+        """True اگر این update_id قبلاً دیده شده باشد؛ در غیر این صورت ثبت می‌شود"""
+        if update_id is None:
+            return False
+
+        with self._lock:
+            if update_id in self._recent:
+                self._recent.move_to_end(update_id)
+                self.duplicates += 1
+                return True
+            self._recent[update_id] = None
+            if len(self._recent) > self.capacity:
+                self._recent.popitem(last=False)
+
+        if self.db and not self._claim(update_id):
+            with self._lock:
+                self.duplicates += 1
+            return True
+        return False
+
+    def _claim(self, update_id):
+        """ثبت در پنجره مشترک؛ False یعنی worker دیگری آن را پردازش کرده است"""
+        # تراکنش ضمنی روی اتصال مشترک نباید وسط تراکنش صریح thread دیگری (spend) شروع شود
+        with self.db.lock:
+            try:
+                cursor = self.db.conn.cursor()
+                cursor.execute('''
+                INSERT OR IGNORE INTO processed_updates (update_id, seen_at)
+                VALUES (?, ?)
+                ''', (update_id, time.time()))
+                claimed = cursor.rowcount == 1
+                self._inserts += 1
+                if self._inserts % self.prune_every == 0:
+                    cursor.execute('''
+                    DELETE FROM processed_updates WHERE seen_at < ?
+                    ''', (time.time() - self.window_seconds,))
+                self.db.conn.commit()
+                return claimed
+            except sqlite3.Error as e:
+                # در صورت خطای دیتابیس پردازش ادامه می‌یابد (LRU محلی همچنان فعال است)
+                logger.error(f"Update dedup check failed: {e}")
+                return True
+
+    def __len__(self):
+        return len(self._recent)
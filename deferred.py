@@ -0,0 +1,60 @@
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+class DeferredExecutor:
+    """اجرای کارهای سنگین callback خارج از thread وب‌هوک"""
+
+    def __init__(self, max_workers):
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='deferred')
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.failed = 0
+
+    def submit(self, func, *args, **kwargs):
+        """ارسال کار به صف پس‌زمینه؛ خطاها لاگ می‌شوند و به فراخواننده نمی‌رسند"""
+        with self._lock:
+            self.pending += 1
+        queued_at = time.perf_counter()
+
+        def run():
+            started = time.perf_counter()
+            ok = True
+            try:
+                func(*args, **kwargs)
+            except Exception as e:
+                ok = False
+                logger.error(f"Deferred job {getattr(func, '__name__', func)} failed: {e}")
+            finally:
+                with self._lock:
+                    self.pending -= 1
+                    if ok:
+                        self.completed += 1
+                    else:
+                        self.failed += 1
+                logger.debug(
+                    f"Deferred job {getattr(func, '__name__', func)} waited "
+                    f"{(started - queued_at) * 1000:.1f} ms, ran {(time.perf_counter() - started) * 1000:.1f} ms"
+                )
+
+        return self._executor.submit(run)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.max_workers,
+                'pending': self.pending,
+                'completed': self.completed,
+                'failed': self.failed,
+            }
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+    def __len__(self):
+        return self.pending
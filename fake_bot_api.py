@@ -0,0 +1,146 @@
+"""سرور جعلی Bot API تلگرام برای تست و اندازه‌گیری توان ارسال
+
+اجرای سرور:
+    python fake_bot_api.py --port 8081 --latency-ms 30
+سپس TELEGRAM_API_BASE_URL=http://127.0.0.1:8081/bot
+
+اندازه‌گیری تعداد فراخوانی خروجی در ثانیه:
+    python fake_bot_api.py --bench 2000 --concurrency 16 --latency-ms 30
+"""
+import json
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FAKE_BOT_USER = {
+    'id': 1000000001,
+    'is_bot': True,
+    'first_name': 'AncientWarBot',
+    'username': 'ancient_war_fake_bot',
+}
+
+class FakeBotAPI:
+    """سرور HTTP محلی که به همه متدهای Bot API پاسخ موفق می‌دهد"""
+
+    def __init__(self, host='127.0.0.1', port=0, latency_ms=0):
+        self.latency = latency_ms / 1000
+        self.calls = {}
+        self._lock = threading.Lock()
+        self._message_id = 0
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/bot"
+
+    def _next_message_id(self):
+        with self._lock:
+            self._message_id += 1
+            return self._message_id
+
+    def _record(self, method):
+        with self._lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+
+    def result_for(self, method, payload):
+        """نتیجه ساختگی ولی معتبر برای هر متد"""
+        if method == 'getMe':
+            return FAKE_BOT_USER
+        if method in ('sendMessage', 'editMessageText'):
+            return {
+                'message_id': payload.get('message_id') or self._next_message_id(),
+                'date': int(time.time()),
+                'chat': {'id': int(payload.get('chat_id') or 0), 'type': 'private'},
+                'from': FAKE_BOT_USER,
+                'text': payload.get('text', ''),
+            }
+        return True
+
+    def _make_handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # اتصال keep-alive
+            # بدون TCP_NODELAY هر پاسخ keep-alive حدود 40ms پشت delayed ACK می‌ماند
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                method = self.path.rsplit('/', 1)[-1]
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                try:
+                    payload = json.loads(body) if body else {}
+                except ValueError:
+                    payload = {}  # multipart (فایل) پشتیبانی نمی‌شود
+                api._record(method)
+                if api.latency:
+                    time.sleep(api.latency)
+
+                response = json.dumps({'ok': True, 'result': api.result_for(method, payload)}).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(response)))
+                self.end_headers()
+                self.wfile.write(response)
+
+            do_GET = do_POST
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-bot-api', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+def bench(total, concurrency, latency_ms, pool_size=None):
+    """اندازه‌گیری حداکثر sendMessage در ثانیه با همان Bot تولیدی"""
+    from telegram_client import build_bot
+
+    api = FakeBotAPI(latency_ms=latency_ms).start()
+    try:
+        bot = build_bot(token='123456:FAKE', base_url=api.base_url, pool_size=pool_size)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for future in [pool.submit(bot.send_message, chat_id=i, text='bench') for i in range(total)]:
+                future.result()
+        elapsed = time.perf_counter() - started
+        return {
+            'calls': total,
+            'concurrency': concurrency,
+            'seconds': round(elapsed, 3),
+            'calls_per_second': round(total / elapsed, 1),
+            'request': bot.request.stats(),
+        }
+    finally:
+        api.stop()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Fake Telegram Bot API server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--bench', type=int, default=0, help='number of sendMessage calls to benchmark')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--pool-size', type=int, default=None)
+    args = parser.parse_args()
+
+    if args.bench:
+        print(json.dumps(bench(args.bench, args.concurrency, args.latency_ms, args.pool_size), indent=2))
+    else:
+        server = FakeBotAPI(args.host, args.port, args.latency_ms)
+        print(f"Fake Bot API listening on {server.base_url}")
+        try:
+            server._server.serve_forever()
+        except KeyboardInterrupt:
+            server.stop()
@@ -1,13 +1,49 @@
+import time
 import random
 import logging
 from datetime import datetime, timedelta
+from config import AI_TICK_BUDGET_SECONDS, AI_TICK_MIN_COUNTRIES
 from database import Database
+from world import WorldMap
 
 logger = logging.getLogger(__name__)
 
+# وزن عوامل فوریت تصمیم‌گیری AI
+URGENCY_LOW_FOOD = 3.0  # غذای کمتر از آستانه جمع‌آوری
+URGENCY_LOW_GOLD = 1.0
+URGENCY_PER_WAR = 1.0  # هر رابطه WAR (حداکثر سه)
+URGENCY_RIVAL = 2.0  # نزدیکی قدرت به قوی‌ترین کشور انسانی در دسترس
+URGENCY_PER_WAIT = 0.5  # هر تیک انتظار؛ کشورهای عقب‌افتاده بالاخره نوبت می‌گیرند
+
+def ai_urgency(row, waited=0):
+    """امتیاز فوریت یک کشور AI از ردیف get_ai_priorities"""
+    score = URGENCY_PER_WAIT * waited
+    food = row['food']
+    if food is not None and food < 500:
+        score += URGENCY_LOW_FOOD * (500 - max(food, 0)) / 500
+    gold = row['gold']
+    if gold is not None and gold < 300:
+        score += URGENCY_LOW_GOLD * (300 - max(gold, 0)) / 300
+    score += URGENCY_PER_WAR * min(row['wars'], 3)
+    power, rival = row['power'], row['rival_power']
+    if power and rival:
+        # بیشترین فوریت وقتی قدرت دو طرف برابر است
+        score += URGENCY_RIVAL * max(0.0, 1 - abs(power / rival - 1))
+    return score
+
 class GameLogic:
-    def __init__(self):
-        self.db = Database()
+    def __init__(self, db=None, tick_budget_seconds=AI_TICK_BUDGET_SECONDS, tick_min_countries=AI_TICK_MIN_COUNTRIES):
+        # هر پیاده‌سازی Storage (Database یا MemoryStorage)؛ در غیر این صورت اتصال جدید ساخته می‌شود
+        self.db = db or Database()
+        self.world = WorldMap(self.db)
+        # سقف زمان هر تیک AI (0 = بدون سقف)
+        self.tick_budget_seconds = tick_budget_seconds
+        # حداقل کشورهای هر تیک تا اگر رتبه‌بندی خودش بودجه را بگیرد صف باز هم جلو برود
+        self.tick_min_countries = tick_min_countries
+        # کشورهایی که در تیک‌های قبل به بودجه نرسیدند: شناسه -> تعداد تیک انتظار
+        self.carry_over = {}
+        self.tick_stats = {}
+        self.totals = {'ticks': 0, 'processed': 0, 'deferred': 0, 'overruns': 0}
     
     def ai_decision_maker(self, ai_country_id):
         """تصمیم‌گیری AI برای کشور مشخص"""
@@ -59,135 +95,122 @@ class GameLogic:
         if (resources['gold'] > 200 and resources['food'] > 300 and 
             army['level'] < 5):
             
-            # افزایش نیروها
+            # افزایش نیروها (پرداخت و آموزش در یک تراکنش)
             infantry_gain = random.randint(10, 30)
-            self.db.update_resources(country_id, {
-                'gold': -100,
-                'food': -150,
-                'iron': -50
-            })
-            
-            cursor = self.db.conn.cursor()
-            cursor.execute('''
-            UPDATE army 
-            SET infantry = infantry + ?
-            WHERE country_id = ?
-            ''', (infantry_gain, country_id))
-            self.db.conn.commit()
+            trained = self.db.spend(
+                country_id,
+                {'gold': 100, 'food': 150, 'iron': 50},
+                army_effect={'infantry': infantry_gain}
+            )
+            if not trained:
+                return None
             
             return f"AI آموزش ارتش: +{infantry_gain} پیاده‌نظام"
         return None
     
     def _ai_attack_decision(self, country_id, resources, army):
         """تصمیم حمله AI"""
-        # پیدا کردن کشورهای ضعیف‌تر
-        cursor = self.db.conn.cursor()
-        cursor.execute('''
-        SELECT a.country_id, a.power, c.name 
-        FROM army a
-        JOIN countries c ON a.country_id = c.id
-        WHERE c.controller = 'HUMAN' 
-          AND a.power < ? 
-          AND c.id != ?
-        ORDER BY a.power ASC
-        LIMIT 3
-        ''', (army['power'] * 1.2, country_id))
-        
-        weak_countries = cursor.fetchall()
+        # پیدا کردن کشورهای ضعیف‌تر در دسترس نقشه
+        weak_countries = self.db.get_attack_targets(country_id, army['power'] * 1.2, self.world.reach)
         
         if weak_countries and army['power'] > 200:
             target = random.choice(weak_countries)
             
             # ثبت حمله در رویدادها
-            cursor.execute('''
-            INSERT INTO events (event_type, country_id, target_country_id, description)
-            VALUES (?, ?, ?, ?)
-            ''', ('AI_ATTACK', country_id, target['country_id'], 
-                  f"حمله AI به {target['name']}"))
-            self.db.conn.commit()
+            self.db.add_event('AI_ATTACK', country_id, target['country_id'], f"حمله AI به {target['name']}")
             
             return f"AI حمله به {target['name']}"
         return None
     
     def _ai_form_alliance(self, country_id, resources, army):
         """تشکیل اتحاد توسط AI"""
-        cursor = self.db.conn.cursor()
-        cursor.execute('''
-        SELECT c.id, c.name 
-        FROM countries c
-        LEFT JOIN alliances a ON 
-            (a.country1_id = ? AND a.country2_id = c.id) OR
-            (a.country2_id = ? AND a.country1_id = c.id)
-        WHERE c.controller = 'AI' 
-          AND c.id != ?
-          AND a.id IS NULL
-        LIMIT 2
-        ''', (country_id, country_id, country_id))
-        
-        possible_allies = cursor.fetchall()
+        possible_allies = self.db.get_alliance_candidates(country_id)
         
         if possible_allies:
             ally = random.choice(possible_allies)
             
             # اگر منابع کافی داریم، اتحاد تشکیل بده
             if resources['gold'] > 500:
-                cursor.execute('''
-                INSERT INTO alliances (country1_id, country2_id, relation_type)
-                VALUES (?, ?, 'ALLIANCE')
-                ''', (min(country_id, ally['id']), max(country_id, ally['id'])))
-                self.db.conn.commit()
+                self.db.create_alliance(country_id, ally['id'])
                 
                 return f"AI تشکیل اتحاد با {ally['name']}"
         return None
     
     def _ai_betray_alliance(self, country_id, resources, army):
         """خیانت AI به اتحاد"""
-        cursor = self.db.conn.cursor()
-        cursor.execute('''
-        SELECT c.id, c.name 
-        FROM alliances a
-        JOIN countries c ON 
-            (c.id = a.country2_id AND a.country1_id = ?) OR
-            (c.id = a.country1_id AND a.country2_id = ?)
-        WHERE a.relation_type = 'ALLIANCE'
-        ''', (country_id, country_id))
-        
-        allies = cursor.fetchall()
+        allies = self.db.get_allies(country_id)
         
         if allies and random.random() < 0.1:  # 10% احتمال خیانت
-            traitor = random.choice(allies)
-            
-            # تغییر رابطه به دشمنی
-            cursor.execute('''
-            UPDATE alliances 
-            SET relation_type = 'WAR'
-            WHERE (country1_id = ? AND country2_id = ?)
-               OR (country1_id = ? AND country2_id = ?)
-            ''', (country_id, traitor['id'], traitor['id'], country_id))
+            traitor_id, traitor_name = random.choice(allies).partner(country_id)
             
-            cursor.execute('''
-            INSERT INTO events (event_type, country_id, target_country_id, description)
-            VALUES (?, ?, ?, ?)
-            ''', ('BETRAYAL', country_id, traitor['id'], 
-                  f"خیانت AI به {traitor['name']}"))
-            
-            self.db.conn.commit()
-            return f"AI خیانت به {traitor['name']}"
+            # تغییر رابطه به دشمنی و ثبت رویداد در یک تراکنش
+            self.db.betray_alliance(country_id, traitor_id, f"خیانت AI به {traitor_name}")
+            return f"AI خیانت به {traitor_name}"
         return None
     
-    def process_all_ai_decisions(self):
-        """پردازش تصمیم‌های تمام AIها"""
-        ai_countries = self.db.get_ai_countries()
-        all_decisions = []
+    def process_all_ai_decisions(self, budget_seconds=None):
+        """پردازش تصمیم‌های AIها به ترتیب فوریت تا پایان بودجه زمانی تیک
+        
+        بودجه از بعد از رتبه‌بندی حساب می‌شود و دست‌کم tick_min_countries کشور پردازش می‌شوند.
+        کشورهای باقی‌مانده به تیک بعد منتقل می‌شوند و با هر تیک انتظار اولویت بیشتری می‌گیرند.
+        """
+        budget = self.tick_budget_seconds if budget_seconds is None else budget_seconds
+        started = time.perf_counter()
+        
+        rows = self.db.get_ai_priorities(self.world.reach)
+        queue = sorted(
+            rows,
+            key=lambda row: ai_urgency(row, self.carry_over.get(row['id'], 0)),
+            reverse=True
+        )
+        ranked = time.perf_counter()
+        deadline = ranked + budget if budget and budget > 0 else None
         
-        for country in ai_countries:
-            decisions = self.ai_decision_maker(country['id'])
+        all_decisions = []
+        processed = 0
+        for row in queue:
+            if (deadline is not None and processed >= self.tick_min_countries
+                    and time.perf_counter() >= deadline):
+                break
+            decisions = self.ai_decision_maker(row['id'])
             all_decisions.extend(decisions)
+            processed += 1
+        
+        # کشورهای پردازش‌نشده (و حذف کشورهایی که دیگر AI نیستند)
+        carry_over = {}
+        for row in queue[processed:]:
+            carry_over[row['id']] = self.carry_over.get(row['id'], 0) + 1
+        self.carry_over = carry_over
+        
+        elapsed = time.perf_counter() - started
+        deferred = len(queue) - processed
+        self.tick_stats = {
+            'countries': len(queue),
+            'processed': processed,
+            'deferred': deferred,
+            'coverage': round(processed / len(queue), 3) if queue else 1.0,
+            'max_wait_ticks': max(carry_over.values(), default=0),
+            'rank_ms': round((ranked - started) * 1000, 1),
+            'elapsed_ms': round(elapsed * 1000, 1),
+            'budget_ms': round(budget * 1000, 1) if deadline is not None else None,
+        }
+        self.totals['ticks'] += 1
+        self.totals['processed'] += processed
+        self.totals['deferred'] += deferred
+        if deferred:
+            self.totals['overruns'] += 1
+            logger.info(
+                f"AI tick budget reached: {processed}/{len(queue)} countries in "
+                f"{self.tick_stats['elapsed_ms']} ms, {deferred} carried over"
+            )
         
         return all_decisions
     
     def calculate_battle_outcome(self, attacker_id, defender_id):
-        """محاسبه نتیجه نبرد"""
+        """محاسبه نتیجه نبرد؛ None اگر مدافع در دسترس مهاجم نباشد"""
+        if not self.world.in_reach(attacker_id, defender_id):
+            return None
+        
         attacker_army = self.db.get_country_army(attacker_id)
         defender_army = self.db.get_country_army(defender_id)
         
@@ -0,0 +1,97 @@
+import time
+import logging
+from config import (
+    HISTORY_RAW_RETENTION_HOURS, HISTORY_HOURLY_RETENTION_DAYS, HISTORY_DAILY_RETENTION_DAYS
+)
+
+logger = logging.getLogger(__name__)
+
+RAW = 0
+HOURLY = 1
+DAILY = 2
+
+HOUR = 3600
+DAY = 86400
+
+METRICS = ('power', 'level', 'gold', 'iron', 'stone', 'food')
+
+class CountryHistory:
+    """نمونه‌برداری از قدرت و منابع کشورها در هر تیک و کاهش دقت داده‌های قدیمی"""
+
+    def __init__(self, db,
+                 raw_retention=HISTORY_RAW_RETENTION_HOURS * HOUR,
+                 hourly_retention=HISTORY_HOURLY_RETENTION_DAYS * DAY,
+                 daily_retention=HISTORY_DAILY_RETENTION_DAYS * DAY):
+        self.db = db
+        self.raw_retention = raw_retention
+        self.hourly_retention = hourly_retention
+        self.daily_retention = daily_retention
+        self._last_compaction_hour = None
+
+    def sample(self, now=None):
+        """ثبت یک نمونه برای همه کشورهای فعال با یک INSERT ... SELECT"""
+        with self.db.lock:
+            now = int(now or time.time())
+            cursor = self.db.conn.cursor()
+            cursor.execute('''
+            INSERT OR REPLACE INTO country_history
+                (resolution, country_id, ts, power, level, gold, iron, stone, food)
+            SELECT ?, c.id, ?, a.power, a.level, r.gold, r.iron, r.stone, r.food
+            FROM countries c
+            LEFT JOIN army a ON a.country_id = c.id
+            LEFT JOIN resources r ON r.country_id = c.id
+            WHERE c.is_active = 1
+            ''', (RAW, now))
+            self.db.conn.commit()
+            self.maybe_compact(now)
+            return cursor.rowcount
+
+    def maybe_compact(self, now=None):
+        """فشرده‌سازی حداکثر یک بار در هر ساعت"""
+        now = int(now or time.time())
+        hour = now // HOUR
+        if hour != self._last_compaction_hour:
+            self._last_compaction_hour = hour
+            self.compact(now)
+
+    def _downsample(self, cursor, source, target, bucket, cutoff):
+        # فقط بازه‌های کامل (هم‌تراز با bucket) تجمیع می‌شوند
+        cutoff -= cutoff % bucket
+        averages = ', '.join(f'CAST(AVG({m}) AS INTEGER)' for m in METRICS)
+        cursor.execute(f'''
+        INSERT OR REPLACE INTO country_history
+            (resolution, country_id, ts, {', '.join(METRICS)})
+        SELECT ?, country_id, ts - ts % ?, {averages}
+        FROM country_history
+        WHERE resolution = ? AND ts < ?
+        GROUP BY country_id, ts - ts % ?
+        ''', (target, bucket, source, cutoff, bucket))
+        cursor.execute('''
+        DELETE FROM country_history WHERE resolution = ? AND ts < ?
+        ''', (source, cutoff))
+
+    def compact(self, now=None):
+        """خام → ساعتی → روزانه، و حذف داده‌های روزانه خارج از بازه نگهداری"""
+        with self.db.lock:
+            now = int(now or time.time())
+            started = time.perf_counter()
+            cursor = self.db.conn.cursor()
+            self._downsample(cursor, RAW, HOURLY, HOUR, now - self.raw_retention)
+            self._downsample(cursor, HOURLY, DAILY, DAY, now - self.hourly_retention)
+            cursor.execute('''
+            DELETE FROM country_history WHERE resolution = ? AND ts < ?
+            ''', (DAILY, now - self.daily_retention))
+            self.db.conn.commit()
+            logger.info(f"History compacted in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    def series(self, country_id, start, end=None):
+        """سری زمانی یک کشور در بازه؛ از دقیق‌ترین سطح موجود برای هر زمان"""
+        end = int(end or time.time())
+        cursor = self.db.conn.cursor()
+        cursor.execute(f'''
+        SELECT ts, resolution, {', '.join(METRICS)}
+        FROM country_history
+        WHERE resolution IN (?, ?, ?) AND country_id = ? AND ts BETWEEN ? AND ?
+        ORDER BY ts
+        ''', (RAW, HOURLY, DAILY, country_id, int(start), end))
+        return cursor.fetchall()
@@ -0,0 +1,78 @@
+import os
+import socket
+import time
+import logging
+import sqlite3
+from functools import wraps
+from config import LEADER_LEASE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+class LeaderElection:
+    """انتخاب رهبر بین workerهای gunicorn با یک ردیف اجاره در دیتابیس"""
+
+    def __init__(self, db, name="ai_scheduler", ttl_seconds=LEADER_LEASE_SECONDS):
+        self.db = db
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self._is_leader = False
+        self._valid_until = 0.0
+        self._resigned = False
+
+    @property
+    def holder(self):
+        # pid در هر بار خوانده می‌شود تا بعد از fork هم درست باشد
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    @property
+    def renew_interval(self):
+        """فاصله تمدید؛ یک‌سوم مدت اجاره تا قبل از انقضا تمدید شود"""
+        return max(self.ttl_seconds // 3, 1)
+
+    def renew(self):
+        """تلاش برای گرفتن یا تمدید رهبری"""
+        if self._resigned:
+            # بعد از کناره‌گیری (خاموش شدن) تمدید دیرهنگام زمان‌بند اجاره را دوباره نمی‌گیرد
+            return False
+        started = time.monotonic()
+        try:
+            acquired = self.db.acquire_lease(self.name, self.holder, self.ttl_seconds)
+        except sqlite3.Error as e:
+            logger.error(f"Leader lease renewal failed: {e}")
+            acquired = False
+
+        if acquired != self._is_leader:
+            if acquired:
+                logger.info(f"{self.holder} became leader of '{self.name}'")
+            else:
+                logger.info(f"{self.holder} lost leadership of '{self.name}'")
+
+        self._is_leader = acquired
+        if acquired:
+            self._valid_until = started + self.ttl_seconds
+        return acquired
+
+    def is_leader(self):
+        """رهبری فقط تا پایان اجاره معتبر است، حتی اگر تمدید عقب بیفتد"""
+        return self._is_leader and time.monotonic() < self._valid_until
+
+    def resign(self):
+        """کناره‌گیری هنگام خاموش شدن تا worker دیگر بلافاصله رهبر شود"""
+        self._resigned = True
+        if not self._is_leader:
+            return
+        try:
+            self.db.release_lease(self.name, self.holder)
+        except sqlite3.Error as e:
+            logger.error(f"Leader lease release failed: {e}")
+        self._is_leader = False
+        self._valid_until = 0.0
+
+    def only_leader(self, job):
+        """دکوریتور: کار پس‌زمینه فقط در پروسه رهبر اجرا شود"""
+        @wraps(job)
+        def wrapper(*args, **kwargs):
+            if not self.is_leader():
+                return None
+            return job(*args, **kwargs)
+        return wrapper
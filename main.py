@@ -1,17 +1,19 @@
+from __future__ import annotations
+
 import os
+import time
+import atexit
 import logging
 import sys
+import threading
 from datetime import datetime
-from flask import Flask, request
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import (
-    Updater, CommandHandler, CallbackQueryHandler,
-    MessageHandler, Filters, CallbackContext
-)
-from apscheduler.schedulers.background import BackgroundScheduler
+from flask import Flask, request, jsonify
 
-# شبیه‌سازی imghdr برای پایتون 3.13
-if sys.version_info >= (3, 13):
+def install_imghdr_shim():
+    """شبیه‌سازی imghdr برای پایتون 3.13 (فقط قبل از import تلگرام لازم است)"""
+    if sys.version_info < (3, 13) or 'imghdr' in sys.modules:
+        return
+    
     import types
     imghdr_module = types.ModuleType('imghdr')
     
@@ -42,10 +44,30 @@ if sys.version_info >= (3, 13):
 
 # ایمپورت config
 try:
-    from config import BOT_TOKEN, OWNER_ID, PORT, LISTEN, WEBHOOK_URL
+    from config import BOT_TOKEN, OWNER_ID, PORT, LISTEN, WEBHOOK_URL, STARTUP_MODE, DEFERRED_WORKERS
+    from config import RATE_LIMITS, DEBOUNCE_SECONDS
+    from config import SERVE_MODE, AI_TICK_MINUTES, READ_MODE, READ_SNAPSHOT_MAX_AGE_SECONDS
     from database import Database
     from game_logic import GameLogic
     from advisor import Advisor
+    from leader import LeaderElection
+    from season import SeasonEngine
+    from history import CountryHistory
+    from pagination import KeysetPaginator
+    from models import Alliance
+    from dedup import UpdateDeduplicator
+    from notifications import DigestNotifier
+    from readers import ReadReplica
+    from startup import StartupTracker
+    from deferred import DeferredExecutor
+    from throttle import RateLimiter, Debouncer
+    from counters import ThroughputMeter
+    from router import CallbackRouter, FAST, DEFERRED
+    from backup import BackupManager
+    from traffic import TrafficRecorder
+    from memprofile import MemoryProfiler
+    from config import BACKUP_INTERVAL_MINUTES, TRAFFIC_RECORD_DIR
+    from config import MEMORY_TRACE_FRAMES, MEMORY_TRACE_ON_START, MEMORY_SAMPLE_MINUTES, MEMORY_REPORT_TOP
 except ImportError as e:
     logging.error(f"خطا در ایمپورت ماژول‌ها: {e}")
     # مقادیر پیش‌فرض برای تست
@@ -54,6 +76,20 @@ except ImportError as e:
     PORT = int(os.getenv("PORT", 8443))
     LISTEN = "0.0.0.0"
     WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+    STARTUP_MODE = "eager"
+    DEFERRED_WORKERS = 4
+    RATE_LIMITS = {}
+    DEBOUNCE_SECONDS = 0
+    SERVE_MODE = "flask"
+    AI_TICK_MINUTES = 5
+    READ_MODE = "primary"
+    READ_SNAPSHOT_MAX_AGE_SECONDS = 30
+    BACKUP_INTERVAL_MINUTES = 0
+    TRAFFIC_RECORD_DIR = ""
+    MEMORY_TRACE_FRAMES = 1
+    MEMORY_TRACE_ON_START = False
+    MEMORY_SAMPLE_MINUTES = 0
+    MEMORY_REPORT_TOP = 8
 
 # تنظیمات لاگ
 logging.basicConfig(
@@ -62,16 +98,21 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# اشیاء اصلی
-try:
-    db = Database()
-    game = GameLogic()
-    advisor = Advisor()
-except Exception as e:
-    db = None
-    game = None
-    advisor = None
-    logger.warning(f"ایجاد اشیاء بازی با مشکل مواجه شد: {e}")
+# اشیاء اصلی (در warm_up ساخته می‌شوند)
+db = None
+game = None
+advisor = None
+season_engine = None
+history = None
+update_dedup = None
+notifier = None
+reads = None
+backups = None
+
+# کلاس‌های تلگرام (در load_telegram بارگذاری می‌شوند)
+Update = None
+InlineKeyboardButton = None
+InlineKeyboardMarkup = None
 
 # Flask app برای Webhook
 app = Flask(__name__)
@@ -79,6 +120,133 @@ app = Flask(__name__)
 # ذخیره updater تلگرام
 updater = None
 
+# زمان‌بند و انتخاب رهبر برای کارهای پس‌زمینه
+scheduler = None
+leader = None
+
+# اجرای پس‌زمینه مسیرهای سنگین callback
+deferred = DeferredExecutor(DEFERRED_WORKERS)
+
+# محدودیت نرخ و حذف فشارهای تکراری دکمه‌ها
+rate_limiter = RateLimiter(RATE_LIMITS)
+debouncer = Debouncer(DEBOUNCE_SECONDS)
+
+# نرخ آپدیت‌ها و تصمیم‌های AI برای آمار مدیریت
+meter = ThroughputMeter()
+
+# ضبط اختیاری آپدیت‌های ورودی برای پخش دوباره (traffic.py)
+recorder = None
+if TRAFFIC_RECORD_DIR:
+    from config import TRAFFIC_RECORD_SALT, TRAFFIC_RECORD_MAX_BYTES
+    # شناسه مالک حفظ می‌شود تا مسیرهای مدیریت هم پخش شوند
+    recorder = TrafficRecorder(
+        TRAFFIC_RECORD_DIR, TRAFFIC_RECORD_SALT, TRAFFIC_RECORD_MAX_BYTES, keep_ids=(OWNER_ID,)
+    )
+    # workerهای gunicorn تابع main را اجرا نمی‌کنند؛ فایل در خروج پروسه بسته می‌شود
+    atexit.register(recorder.close)
+
+# حافظه این worker و اندازه هر کش برای گزارش «حافظه» پنل مدیریت؛ هر کش جدید باید اینجا ثبت شود
+memory = MemoryProfiler(MEMORY_TRACE_FRAMES)
+memory.track('update_dedup', lambda: update_dedup)
+memory.track('rate_limiter_buckets', lambda: rate_limiter)
+memory.track('debouncer_keys', lambda: debouncer)
+memory.track('deferred_pending', lambda: deferred)
+memory.track('notifier_pending', lambda: notifier)
+memory.track('meter_series', lambda: meter)
+memory.track('counters', lambda: getattr(db, 'counters', None))
+memory.track('persistence_cache', lambda: updater.dispatcher.persistence if updater else None)
+memory.track('read_snapshot_bytes', lambda: reads.snapshot_bytes() if reads else None)
+memory.track('ai_carry_over', lambda: game.carry_over if game else None)
+memory.track('callback_routes', lambda: router)
+if MEMORY_TRACE_ON_START:
+    memory.start()
+
+# وضعیت راه‌اندازی
+startup = StartupTracker()
+_warm_up_lock = threading.Lock()
+
+def init_services():
+    """ساخت اشیاء بازی با یک اتصال مشترک دیتابیس"""
+    global db, game, advisor, season_engine, history, update_dedup, notifier, reads, backups
+    from config import UPDATE_DEDUP_CAPACITY, UPDATE_DEDUP_WINDOW_SECONDS, UPDATE_DEDUP_SHARED
+    from config import NOTIFY_RATE_PER_SECOND, NOTIFY_BURST, NOTIFY_DIGEST_MAX_LINES
+    try:
+        db = Database()
+        game = GameLogic(db)
+        # جدول فاصله فقط وقتی نقشه config تغییر کرده باشد دوباره ساخته می‌شود
+        game.world.sync()
+        reads = ReadReplica(db, mode=READ_MODE, max_age_seconds=READ_SNAPSHOT_MAX_AGE_SECONDS)
+        db.reader = reads
+        advisor = Advisor(db)
+        season_engine = SeasonEngine(db)
+        history = CountryHistory(db)
+        backups = BackupManager()
+        update_dedup = UpdateDeduplicator(
+            db if UPDATE_DEDUP_SHARED else None,
+            capacity=UPDATE_DEDUP_CAPACITY,
+            window_seconds=UPDATE_DEDUP_WINDOW_SECONDS,
+        )
+        notifier = DigestNotifier(
+            db,
+            send_notification,
+            rate_per_second=NOTIFY_RATE_PER_SECOND,
+            burst=NOTIFY_BURST,
+            max_lines=NOTIFY_DIGEST_MAX_LINES,
+        )
+    except Exception as e:
+        db = None
+        game = None
+        advisor = None
+        season_engine = None
+        history = None
+        update_dedup = None
+        notifier = None
+        reads = None
+        backups = None
+        logger.error(f"ایجاد اشیاء بازی با مشکل مواجه شد: {e}")
+        # warm_up خطا را در /ready گزارش می‌دهد تا worker بدون دیتابیس سالم اعلام نشود
+        raise
+
+def load_telegram():
+    """بارگذاری کتابخانه تلگرام در اولین نیاز"""
+    global Update, InlineKeyboardButton, InlineKeyboardMarkup
+    install_imghdr_shim()
+    from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+    build_static_keyboards()
+
+def warm_up():
+    """راه‌اندازی زیرسیستم‌های سنگین؛ در هر پروسه فقط یک بار اجرا می‌شود"""
+    global updater, scheduler
+    with _warm_up_lock:
+        if startup.ready.is_set():
+            return
+        
+        error = None
+        try:
+            with startup.phase('services'):
+                init_services()
+            # در حالت webhook با async کارهای دوره‌ای روی event loop اجرا می‌شوند
+            if not (SERVE_MODE == 'async' and WEBHOOK_URL.strip()):
+                with startup.phase('scheduler'):
+                    scheduler = ai_scheduler()
+            with startup.phase('telegram_import'):
+                load_telegram()
+            with startup.phase('updater'):
+                updater = setup_updater()
+        except Exception as e:
+            error = str(e)
+            logger.error(f"خطا در راه‌اندازی: {e}")
+        startup.mark_ready(error)
+
+def ensure_warm():
+    """در حالت lazy/background تا پایان راه‌اندازی صبر می‌کند"""
+    if not startup.ready.is_set():
+        warm_up()
+
+def read_conn():
+    """اتصال خواندن برای نماهای فقط‌خواندنی (جدا از اتصال نویسنده)"""
+    return reads.conn() if reads is not None else db.conn
+
 def create_inline_keyboard(buttons_list, columns=2):
     """ایجاد کیبورد اینلاین از لیست دکمه‌ها"""
     keyboard = []
@@ -95,6 +263,78 @@ def create_inline_keyboard(buttons_list, columns=2):
     
     return InlineKeyboardMarkup(keyboard)
 
+# کیبوردهای ثابت: (متن، callback_data)؛ یک بار در load_telegram ساخته و بارها استفاده می‌شوند
+DASHBOARD_BUTTONS = (
+    ("🔄 به‌روزرسانی", "refresh_dashboard"),
+    ("⚔️ ارتقا ارتش", "upgrade_army"),
+    ("💰 جمع‌آوری منابع", "collect_resources"),
+    ("🤝 اتحادها", "show_alliances"),
+    ("👑 مشاوره وزیر", "get_advice"),
+    ("🏆 رده‌بندی", "show_ranking"),
+)
+ADMIN_BUTTONS = (
+    ("➕ افزودن بازیکن", "admin_add_player"),
+    ("🎮 شروع فصل جدید", "admin_start_season"),
+    ("🏁 پایان فصل", "admin_end_season"),
+    ("📢 ارسال پیام عمومی", "admin_broadcast"),
+    ("🔄 ریست بازی", "admin_reset_game"),
+    ("📊 آمار بازی", "admin_stats"),
+    ("🧠 حافظه worker", "admin_memory"),
+)
+MEMORY_BUTTONS = (
+    ("🔄 snapshot دوباره", "admin_memory"),
+    ("⏹️ توقف ردیابی", "admin_memory_stop"),
+    ("🔙 بازگشت", "admin_panel"),
+)
+RESET_CONFIRM_BUTTONS = (
+    ("✅ بله، ریست کن", "admin_confirm_reset"),
+    ("❌ خیر، لغو", "admin_panel"),
+)
+
+DASHBOARD_KEYBOARD = None
+ADMIN_KEYBOARD = None
+RESET_CONFIRM_KEYBOARD = None
+MEMORY_KEYBOARD = None
+
+def build_static_keyboards():
+    global DASHBOARD_KEYBOARD, ADMIN_KEYBOARD, RESET_CONFIRM_KEYBOARD, MEMORY_KEYBOARD
+    def buttons(spec):
+        return [InlineKeyboardButton(text, callback_data=data) for text, data in spec]
+    DASHBOARD_KEYBOARD = create_inline_keyboard(buttons(DASHBOARD_BUTTONS), columns=2)
+    ADMIN_KEYBOARD = create_inline_keyboard(buttons(ADMIN_BUTTONS), columns=2)
+    RESET_CONFIRM_KEYBOARD = InlineKeyboardMarkup([buttons(RESET_CONFIRM_BUTTONS)])
+    MEMORY_KEYBOARD = create_inline_keyboard(buttons(MEMORY_BUTTONS), columns=2)
+
+# قالب‌های ثابت پیام‌ها
+DASHBOARD_TEMPLATE = (
+    "{color} **{name}**\n"
+    "👤 فرمانروا: {ruler}\n"
+    "🎖️ تخصص: {specialty}\n\n"
+    
+    "💰 **منابع:**\n"
+    "• طلا: {gold} 🪙\n"
+    "• آهن: {iron} ⚒️\n"
+    "• سنگ: {stone} 🪨\n"
+    "• غذا: {food} 🌾\n\n"
+    
+    "⚔️ **ارتش:**\n"
+    "• سطح: {level} 🏆\n"
+    "• پیاده‌نظام: {infantry} 🛡️\n"
+    "• سواره‌نظام: {cavalry} 🐎\n"
+    "• تیرانداز: {archers} 🏹\n"
+    "• قدرت کل: {power} ⚡\n"
+    "• دفاع: {defense} 🛡️\n"
+)
+ADMIN_PANEL_TEXT = (
+    "👑 **پنل مدیریت جنگ جهانی باستان**\n\n"
+    "لطفاً یکی از گزینه‌ها را انتخاب کنید:"
+)
+RESET_CONFIRM_TEXT = (
+    "⚠️ **هشدار: ریست کامل بازی**\n\n"
+    "آیا مطمئن هستید که می‌خواهید کل بازی را ریست کنید؟\n"
+    "❗ این عمل غیرقابل بازگشت است و همه داده‌ها پاک می‌شوند!"
+)
+
 def start_command(update: Update, context: CallbackContext):
     """دستور /start"""
     try:
@@ -139,38 +379,26 @@ def show_player_dashboard(update: Update, context: CallbackContext, user_id):
         resources = db.get_country_resources(player_country['id'])
         army = db.get_country_army(player_country['id'])
         
-        # ایجاد متن داشبورد
-        dashboard_text = (
-            f"{player_country['color']} **{player_country['name']}**\n"
-            f"👤 فرمانروا: {update.effective_user.full_name}\n"
-            f"🎖️ تخصص: {player_country['specialty']}\n\n"
-            
-            f"💰 **منابع:**\n"
-            f"• طلا: {resources['gold'] if resources else 0} 🪙\n"
-            f"• آهن: {resources['iron'] if resources else 0} ⚒️\n"
-            f"• سنگ: {resources['stone'] if resources else 0} 🪨\n"
-            f"• غذا: {resources['food'] if resources else 0} 🌾\n\n"
-            
-            f"⚔️ **ارتش:**\n"
-            f"• سطح: {army['level'] if army else 1} 🏆\n"
-            f"• پیاده‌نظام: {army['infantry'] if army else 100} 🛡️\n"
-            f"• سواره‌نظام: {army['cavalry'] if army else 20} 🐎\n"
-            f"• تیرانداز: {army['archers'] if army else 30} 🏹\n"
-            f"• قدرت کل: {army['power'] if army else 150} ⚡\n"
-            f"• دفاع: {army['defense'] if army else 50} 🛡️\n"
+        # ایجاد متن داشبورد از قالب ثابت
+        dashboard_text = DASHBOARD_TEMPLATE.format(
+            color=player_country['color'],
+            name=player_country['name'],
+            ruler=update.effective_user.full_name,
+            specialty=player_country['specialty'],
+            gold=resources['gold'] if resources else 0,
+            iron=resources['iron'] if resources else 0,
+            stone=resources['stone'] if resources else 0,
+            food=resources['food'] if resources else 0,
+            level=army['level'] if army else 1,
+            infantry=army['infantry'] if army else 100,
+            cavalry=army['cavalry'] if army else 20,
+            archers=army['archers'] if army else 30,
+            power=army['power'] if army else 150,
+            defense=army['defense'] if army else 50,
         )
         
-        # ایجاد دکمه‌های داشبورد
-        buttons = [
-            InlineKeyboardButton("🔄 به‌روزرسانی", callback_data="refresh_dashboard"),
-            InlineKeyboardButton("⚔️ ارتقا ارتش", callback_data="upgrade_army"),
-            InlineKeyboardButton("💰 جمع‌آوری منابع", callback_data="collect_resources"),
-            InlineKeyboardButton("🤝 اتحادها", callback_data="show_alliances"),
-            InlineKeyboardButton("👑 مشاوره وزیر", callback_data="get_advice"),
-            InlineKeyboardButton("🏆 رده‌بندی", callback_data="show_ranking"),
-        ]
-        
-        keyboard = create_inline_keyboard(buttons, columns=2)
+        # کیبورد داشبورد یک بار ساخته شده است
+        keyboard = DASHBOARD_KEYBOARD
         
         if update.callback_query:
             update.callback_query.edit_message_text(
@@ -188,49 +416,39 @@ def show_player_dashboard(update: Update, context: CallbackContext, user_id):
         logger.error(f"خطا در show_player_dashboard: {e}")
         update.message.reply_text("خطا در نمایش داشبورد!")
 
+# جدول مسیرهای callback (پایین فایل، بعد از تعریف هندلرها پر می‌شود)
+router = CallbackRouter(OWNER_ID)
+
 def button_callback_handler(update: Update, context: CallbackContext):
     """مدیریت کلیک روی دکمه‌های اینلاین"""
     try:
         query = update.callback_query
-        query.answer()
-        
         user_id = query.from_user.id
         data = query.data
         
-        if data == "refresh_dashboard":
-            show_player_dashboard(update, context, user_id)
-        
-        elif data == "upgrade_army":
-            upgrade_army(update, context, user_id)
-        
-        elif data == "collect_resources":
-            collect_resources(update, context, user_id)
-        
-        elif data == "get_advice":
-            send_advisor_advice(update, context, user_id)
-        
-        elif data == "show_ranking":
-            show_ranking(update, context)
-        
-        elif data == "show_alliances":
-            show_alliances(update, context, user_id)
+        # فشارهای تکراری یا بیش از حد فقط یک پاسخ ارزان می‌گیرند
+        if debouncer.is_duplicate(user_id, data) or not rate_limiter.allow(user_id, data):
+            query.answer("⏳ کمی صبر کن و دوباره امتحان کن.")
+            return
         
-        elif data.startswith("assign_country_"):
-            if user_id == OWNER_ID:
-                country_id = int(data.split("_")[2])
-                context.user_data['selected_country'] = country_id
-                query.edit_message_text(
-                    text="کشور انتخاب شد. لطفاً آیدی عددی بازیکن را ارسال کنید:",
-                    parse_mode='Markdown'
-                )
+        # پاسخ فوری تا تلگرام منتظر نماند و درخواست را تکرار نکند
+        query.answer()
         
-        elif data.startswith("admin_"):
-            if user_id == OWNER_ID:
-                handle_admin_commands(update, context, data)
+        if router.mode(data) == DEFERRED:
+            deferred.submit(dispatch_callback, update, context, user_id, data)
+        else:
+            dispatch_callback(update, context, user_id, data)
     
     except Exception as e:
         logger.error(f"خطا در button_callback_handler: {e}")
 
+def dispatch_callback(update: Update, context: CallbackContext, user_id, data):
+    """اجرای هندلر مربوط به داده callback"""
+    try:
+        router.dispatch(update, context, user_id, data)
+    except Exception as e:
+        logger.error(f"خطا در dispatch_callback: {e}")
+
 def upgrade_army(update: Update, context: CallbackContext, user_id):
     """ارتقای ارتش"""
     try:
@@ -258,19 +476,14 @@ def upgrade_army(update: Update, context: CallbackContext, user_id):
             'food': army['level'] * 150
         }
         
-        # بررسی منابع کافی
-        if (resources['gold'] >= upgrade_cost['gold'] and
-            resources['iron'] >= upgrade_cost['iron'] and
-            resources['food'] >= upgrade_cost['food']):
-            
-            # ارتقا ارتش
-            db.upgrade_army_level(player_country['id'], upgrade_cost)
-            
+        # بررسی و کسر منابع و ارتقا ارتش در یک تراکنش
+        if db.upgrade_army_level(player_country['id'], upgrade_cost, expected_level=army['level']):
             update.callback_query.message.reply_text(
                 text=f"✅ ارتش {player_country['name']} به سطح {army['level'] + 1} ارتقا یافت!\n"
                 f"💰 هزینه: طلا:{upgrade_cost['gold']} آهن:{upgrade_cost['iron']} غذا:{upgrade_cost['food']}"
             )
         else:
+            resources = db.get_country_resources(player_country['id'])
             update.callback_query.message.reply_text(
                 text=f"❌ منابع کافی برای ارتقا ندارید!\n"
                 f"💰 نیاز: طلا:{upgrade_cost['gold']} آهن:{upgrade_cost['iron']} غذا:{upgrade_cost['food']}\n"
@@ -331,25 +544,52 @@ def send_advisor_advice(update: Update, context: CallbackContext, user_id):
         logger.error(f"خطا در send_advisor_advice: {e}")
         update.callback_query.message.reply_text("خطا در دریافت مشاوره!")
 
-def show_ranking(update: Update, context: CallbackContext):
+# صفحه‌بندی keyset برای فهرست‌های بلند (cursor در callback_data)
+RANKING_PAGER = KeysetPaginator('rk', '''
+    SELECT a.country_id, a.power, a.level, c.name, c.color,
+           CASE WHEN c.controller = 'HUMAN' THEN '👤' ELSE '🤖' END as controller
+    FROM army a
+    JOIN countries c ON a.country_id = c.id
+    WHERE c.is_active = 1 {keyset}
+    ORDER BY {order}
+    LIMIT ?
+    ''', keys=(('a.power', 'power', int), ('a.country_id', 'country_id', int)), descending=True)
+
+ALLIANCES_PAGER = KeysetPaginator('al', f'''
+    SELECT {Alliance.select_columns()}
+    FROM alliances a
+    JOIN countries c1 ON a.country1_id = c1.id
+    JOIN countries c2 ON a.country2_id = c2.id
+    WHERE (a.country1_id = ? OR a.country2_id = ?) {{keyset}}
+    ORDER BY {{order}}
+    LIMIT ?
+    ''', keys=(('a.relation_type', 'relation_type', str), ('a.id', 'id', int)), row_factory=Alliance.row_factory)
+
+AI_COUNTRIES_PAGER = KeysetPaginator('ac', '''
+    SELECT id, name, color
+    FROM countries
+    WHERE controller = 'AI' AND is_active = 1 {keyset}
+    ORDER BY {order}
+    LIMIT ?
+    ''', keys=(('id', 'id', int),))
+
+def send_or_edit_page(update: Update, page_data, text, buttons=None, columns=2):
+    """صفحه اول پیام جدید است و صفحه‌های بعد همان پیام را ویرایش می‌کنند"""
+    keyboard = create_inline_keyboard(buttons, columns=columns) if buttons else None
+    if page_data:
+        update.callback_query.edit_message_text(text=text, reply_markup=keyboard, parse_mode='Markdown')
+    else:
+        update.callback_query.message.reply_text(text=text, reply_markup=keyboard, parse_mode='Markdown')
+
+def show_ranking(update: Update, context: CallbackContext, page_data=None):
     """نمایش رده‌بندی"""
     try:
         if not db:
             update.callback_query.message.reply_text("خطا در اتصال به پایگاه داده!")
             return
             
-        cursor = db.conn.cursor()
-        cursor.execute('''
-        SELECT c.name, c.color, a.power, a.level, 
-               CASE WHEN c.controller = 'HUMAN' THEN '👤' ELSE '🤖' END as controller
-        FROM army a
-        JOIN countries c ON a.country_id = c.id
-        WHERE c.is_active = 1
-        ORDER BY a.power DESC
-        LIMIT 10
-        ''')
-        
-        rankings = cursor.fetchall()
+        page = RANKING_PAGER.fetch(read_conn(), data=page_data)
+        rankings = page.rows
         
         if not rankings:
             update.callback_query.message.reply_text("هنوز رده‌بندی‌ای موجود نیست.")
@@ -357,7 +597,7 @@ def show_ranking(update: Update, context: CallbackContext):
         
         ranking_text = "🏆 **رده‌بندی قدرتمندترین کشورها:**\n\n"
         
-        for i, country in enumerate(rankings, 1):
+        for i, country in enumerate(rankings, page.position):
             medal = ""
             if i == 1: medal = "🥇"
             elif i == 2: medal = "🥈"
@@ -369,12 +609,13 @@ def show_ranking(update: Update, context: CallbackContext):
                 f"   ⚡ قدرت: {country['power']} | 🏆 سطح: {country['level']}\n"
             )
         
-        update.callback_query.message.reply_text(text=ranking_text, parse_mode='Markdown')
+        buttons = [InlineKeyboardButton(text, callback_data=data) for text, data in page.nav_buttons()]
+        send_or_edit_page(update, page_data, ranking_text, buttons)
     except Exception as e:
         logger.error(f"خطا در show_ranking: {e}")
         update.callback_query.message.reply_text("خطا در نمایش رده‌بندی!")
 
-def show_alliances(update: Update, context: CallbackContext, user_id):
+def show_alliances(update: Update, context: CallbackContext, user_id, page_data=None):
     """نمایش اتحادها"""
     try:
         if not db:
@@ -387,21 +628,10 @@ def show_alliances(update: Update, context: CallbackContext, user_id):
             update.callback_query.message.reply_text("شما کشوری ندارید!")
             return
         
-        cursor = db.conn.cursor()
-        cursor.execute('''
-        SELECT 
-            c1.name as country1,
-            c2.name as country2,
-            a.relation_type,
-            a.strength
-        FROM alliances a
-        JOIN countries c1 ON a.country1_id = c1.id
-        JOIN countries c2 ON a.country2_id = c2.id
-        WHERE c1.id = ? OR c2.id = ?
-        ORDER BY a.relation_type
-        ''', (player_country['id'], player_country['id']))
-        
-        alliances = cursor.fetchall()
+        page = ALLIANCES_PAGER.fetch(
+            read_conn(), (player_country['id'], player_country['id']), data=page_data
+        )
+        alliances = page.rows
         
         if not alliances:
             alliance_text = f"🌍 **{player_country['name']}** هیچ اتحادی ندارد.\n"
@@ -418,7 +648,8 @@ def show_alliances(update: Update, context: CallbackContext, user_id):
                     f"   📊 رابطه: {relation_text} | 💪 قدرت: {alliance['strength']}%\n"
                 )
         
-        update.callback_query.message.reply_text(text=alliance_text, parse_mode='Markdown')
+        buttons = [InlineKeyboardButton(text, callback_data=data) for text, data in page.nav_buttons()]
+        send_or_edit_page(update, page_data, alliance_text, buttons)
     except Exception as e:
         logger.error(f"خطا در show_alliances: {e}")
         update.callback_query.message.reply_text("خطا در نمایش اتحادها!")
@@ -432,65 +663,51 @@ def admin_panel(update: Update, context: CallbackContext):
             update.message.reply_text("❌ فقط مالک ربات می‌تواند از این دستور استفاده کند!")
             return
         
-        buttons = [
-            InlineKeyboardButton("➕ افزودن بازیکن", callback_data="admin_add_player"),
-            InlineKeyboardButton("🎮 شروع فصل جدید", callback_data="admin_start_season"),
-            InlineKeyboardButton("🏁 پایان فصل", callback_data="admin_end_season"),
-            InlineKeyboardButton("📢 ارسال پیام عمومی", callback_data="admin_broadcast"),
-            InlineKeyboardButton("🔄 ریست بازی", callback_data="admin_reset_game"),
-            InlineKeyboardButton("📊 آمار بازی", callback_data="admin_stats"),
-        ]
-        
-        keyboard = create_inline_keyboard(buttons, columns=2)
-        
         update.message.reply_text(
-            text="👑 **پنل مدیریت جنگ جهانی باستان**\n\n"
-            "لطفاً یکی از گزینه‌ها را انتخاب کنید:",
-            reply_markup=keyboard,
+            text=ADMIN_PANEL_TEXT,
+            reply_markup=ADMIN_KEYBOARD,
             parse_mode='Markdown'
         )
     except Exception as e:
         logger.error(f"خطا در admin_panel: {e}")
         update.message.reply_text("خطا در نمایش پنل مدیریت!")
 
-def handle_admin_commands(update: Update, context: CallbackContext, data):
-    """مدیریت دستورات ادمین"""
+def show_admin_panel(update: Update, context: CallbackContext):
+    """بازگشت به پنل مدیریت از دکمه‌های «بازگشت» و «لغو»"""
     try:
-        query = update.callback_query
-        
-        if data == "admin_add_player":
-            show_ai_countries_for_assignment(update, context)
-        
-        elif data == "admin_start_season":
-            start_new_season(update, context)
-        
-        elif data == "admin_end_season":
-            end_current_season(update, context)
-        
-        elif data == "admin_broadcast":
-            context.user_data['awaiting_broadcast'] = True
-            query.edit_message_text(
-                text="لطفاً پیام عمومی خود را برای همه بازیکنان ارسال کنید:",
-                parse_mode='Markdown'
-            )
-        
-        elif data == "admin_reset_game":
-            reset_game_confirmation(update, context)
-        
-        elif data == "admin_stats":
-            show_admin_stats(update, context)
-    
+        update.callback_query.edit_message_text(
+            text=ADMIN_PANEL_TEXT,
+            reply_markup=ADMIN_KEYBOARD,
+            parse_mode='Markdown'
+        )
     except Exception as e:
-        logger.error(f"خطا در handle_admin_commands: {e}")
+        logger.error(f"خطا در show_admin_panel: {e}")
+
+def prompt_broadcast(update: Update, context: CallbackContext):
+    """درخواست متن پیام عمومی از مالک"""
+    context.user_data['awaiting_broadcast'] = True
+    update.callback_query.edit_message_text(
+        text="لطفاً پیام عمومی خود را برای همه بازیکنان ارسال کنید:",
+        parse_mode='Markdown'
+    )
 
-def show_ai_countries_for_assignment(update: Update, context: CallbackContext):
+def select_country_for_assignment(update: Update, context: CallbackContext, country_id):
+    """ذخیره کشور انتخاب‌شده تا پیام بعدی مالک آیدی بازیکن باشد"""
+    context.user_data['selected_country'] = country_id
+    update.callback_query.edit_message_text(
+        text="کشور انتخاب شد. لطفاً آیدی عددی بازیکن را ارسال کنید:",
+        parse_mode='Markdown'
+    )
+
+def show_ai_countries_for_assignment(update: Update, context: CallbackContext, page_data=None):
     """نمایش لیست کشورهای AI برای اختصاص"""
     try:
         if not db:
             update.callback_query.message.reply_text("خطا در اتصال به پایگاه داده!")
             return
             
-        ai_countries = db.get_ai_countries()
+        page = AI_COUNTRIES_PAGER.fetch(db.conn, data=page_data)
+        ai_countries = page.rows
         
         if not ai_countries:
             update.callback_query.message.reply_text("❌ همه کشورها در اختیار بازیکنان هستند!")
@@ -505,7 +722,9 @@ def show_ai_countries_for_assignment(update: Update, context: CallbackContext):
                 )
             )
         
-        # اضافه کردن دکمه بازگشت
+        # دکمه‌های صفحه قبل/بعد و بازگشت
+        for text, data in page.nav_buttons():
+            buttons.append(InlineKeyboardButton(text, callback_data=data))
         buttons.append(InlineKeyboardButton("🔙 بازگشت", callback_data="admin_panel"))
         
         keyboard = create_inline_keyboard(buttons, columns=2)
@@ -532,8 +751,8 @@ def start_new_season(update: Update, context: CallbackContext):
         result = cursor.fetchone()
         next_season = (result['max_season'] or 0) + 1
         
-        # شروع فصل جدید
-        db.start_new_season(next_season)
+        # بایگانی فصل قبل، بازنشانی جهان (با حفظ بازیکنان) و شروع فصل جدید
+        season_engine.rollover(next_season)
         
         # ارسال پیام به کانال خبری (شبیه‌سازی)
         news_message = (
@@ -584,15 +803,7 @@ def end_current_season(update: Update, context: CallbackContext):
         
         if winner:
             # به‌روزرسانی فصل
-            cursor.execute('''
-            UPDATE seasons 
-            SET end_date = CURRENT_TIMESTAMP,
-                winner_country_id = ?,
-                winner_player_id = ?,
-                is_active = 0
-            WHERE id = ?
-            ''', (winner['country_id'], winner['player_id'], active_season['id']))
-            db.conn.commit()
+            db.end_season(active_season['id'], winner['country_id'], winner['player_id'])
             
             # پیام پایان فصل
             news_message = (
@@ -619,22 +830,31 @@ def end_current_season(update: Update, context: CallbackContext):
 def reset_game_confirmation(update: Update, context: CallbackContext):
     """تأیید ریست بازی"""
     try:
-        buttons = [
-            InlineKeyboardButton("✅ بله، ریست کن", callback_data="admin_confirm_reset"),
-            InlineKeyboardButton("❌ خیر، لغو", callback_data="admin_panel"),
-        ]
+        update.callback_query.edit_message_text(
+            text=RESET_CONFIRM_TEXT,
+            reply_markup=RESET_CONFIRM_KEYBOARD,
+            parse_mode='Markdown'
+        )
+    except Exception as e:
+        logger.error(f"خطا در reset_game_confirmation: {e}")
+
+def reset_game(update: Update, context: CallbackContext):
+    """ریست کامل بازی پس از تأیید"""
+    try:
+        if not season_engine:
+            update.callback_query.message.reply_text("خطا در اتصال به پایگاه داده!")
+            return
         
-        keyboard = InlineKeyboardMarkup([buttons])
+        archive_path = season_engine.reset()
         
         update.callback_query.edit_message_text(
-            text="⚠️ **هشدار: ریست کامل بازی**\n\n"
-            "آیا مطمئن هستید که می‌خواهید کل بازی را ریست کنید؟\n"
-            "❗ این عمل غیرقابل بازگشت است و همه داده‌ها پاک می‌شوند!",
-            reply_markup=keyboard,
+            text="✅ **بازی با موفقیت ریست شد!**\n\n"
+            f"🗄️ نسخه قبلی در `{archive_path}` بایگانی شد.",
             parse_mode='Markdown'
         )
     except Exception as e:
-        logger.error(f"خطا در reset_game_confirmation: {e}")
+        logger.error(f"خطا در reset_game: {e}")
+        update.callback_query.message.reply_text("خطا در ریست بازی!")
 
 def show_admin_stats(update: Update, context: CallbackContext):
     """نمایش آمار مدیریت"""
@@ -643,35 +863,68 @@ def show_admin_stats(update: Update, context: CallbackContext):
             update.callback_query.message.reply_text("خطا در اتصال به پایگاه داده!")
             return
             
-        cursor = db.conn.cursor()
-        
-        # تعداد بازیکنان
-        cursor.execute('SELECT COUNT(*) as count FROM players WHERE is_active = 1')
-        player_count = cursor.fetchone()['count']
-        
-        # تعداد کشورها
-        cursor.execute('SELECT COUNT(*) as count FROM countries WHERE is_active = 1')
-        country_count = cursor.fetchone()['count']
-        
-        # تعداد AI
-        cursor.execute('SELECT COUNT(*) as count FROM countries WHERE controller = "AI" AND is_active = 1')
-        ai_count = cursor.fetchone()['count']
-        
-        # تعداد HUMAN
-        cursor.execute('SELECT COUNT(*) as count FROM countries WHERE controller = "HUMAN" AND is_active = 1')
-        human_count = cursor.fetchone()['count']
-        
-        # فصل فعال
-        active_season = db.get_active_season()
-        season_info = f"فصل {active_season['season_number']}" if active_season else "هیچ فصل فعالی"
+        # شمارنده‌ها همراه تراکنش‌های تغییر به‌روز می‌شوند؛ اینجا فقط یک خواندن از آینه
+        counts = db.counters.snapshot()
+        season_number = counts.get('active_season', 0)
+        season_info = f"فصل {season_number}" if season_number else "هیچ فصل فعالی"
+        read_stats = reads.stats() if reads is not None else {'mode': 'primary', 'age_seconds': 0}
+        
+        # نرخ‌ها در پنجره چنددقیقه‌ای اخیر همین worker
+        ai_ticks = meter.total('ai_ticks')
+        decisions_per_tick = meter.total('ai_decisions') / ai_ticks if ai_ticks else 0
+        uptime = max(time.time() - meter.started, 1)
+        
+        # هزینه آخرین پشتیبان (ممکن است worker دیگری آن را گرفته باشد)
+        last_backup = backups.last() if backups is not None else []
+        if last_backup:
+            backup_info = (
+                f"{last_backup[0]['started_at']} "
+                f"({last_backup[0]['total_ms'] / 1000:.1f} ثانیه، {last_backup[0]['compressed_bytes'] / 1024:.0f} KB)"
+            )
+        else:
+            backup_info = "هنوز گرفته نشده"
+        
+        # پوشش تیک AI فقط در worker رهبر (که تیک را اجرا می‌کند) موجود است
+        tick = game.tick_stats if game else {}
+        if tick:
+            tick_info = (
+                f"{tick['processed']}/{tick['countries']} کشور در {tick['elapsed_ms'] / 1000:.1f} ثانیه، "
+                f"{tick['deferred']} منتقل‌شده"
+            )
+        else:
+            tick_info = "در این worker اجرا نشده"
+        
+        # اتصال‌ها و تأخیر فراخوانی‌های API تلگرام از همین worker (پرکاربردترین endpointها)
+        request_stats = updater.bot.request.stats() if updater and hasattr(updater.bot.request, 'stats') else None
+        if request_stats:
+            connections = request_stats['connections']
+            api_info = (
+                f"{connections['requests']} درخواست با {connections['new_connections']} اتصال تازه "
+                f"(استفاده مجدد {connections['reuse_ratio'] if connections['requests'] else '-'})"
+            )
+            busiest = sorted(request_stats['endpoints'].items(), key=lambda item: item[1]['calls'], reverse=True)
+            for name, endpoint in busiest[:3]:
+                api_info += (
+                    f"\n   {name}: {endpoint['calls']} بار، میانگین {endpoint['avg_ms']} ms، "
+                    f"بیشینه {endpoint['max_ms']} ms، {endpoint['errors']} خطا"
+                )
+        else:
+            api_info = "در دسترس نیست"
         
         stats_text = (
             f"📊 **آمار مدیریت جنگ جهانی باستان**\n\n"
-            f"👥 بازیکنان انسانی: {player_count}\n"
-            f"🌍 کل کشورها: {country_count}\n"
-            f"🤖 کشورهای AI: {ai_count}\n"
-            f"👤 کشورهای انسانی: {human_count}\n"
-            f"📅 وضعیت فصل: {season_info}\n\n"
+            f"👥 بازیکنان انسانی: {counts.get('players_active', 0)}\n"
+            f"🌍 کل کشورها: {counts.get('countries_active', 0)}\n"
+            f"🤖 کشورهای AI: {counts.get('countries_ai', 0)}\n"
+            f"👤 کشورهای انسانی: {counts.get('countries_human', 0)}\n"
+            f"📅 وضعیت فصل: {season_info}\n"
+            f"📖 مسیر خواندن: {read_stats['mode']} (کهنگی {read_stats['age_seconds']} ثانیه)\n\n"
+            f"📈 آپدیت در دقیقه: {meter.per_minute('updates'):.1f}\n"
+            f"🌐 API تلگرام: {api_info}\n"
+            f"🤖 تصمیم AI در هر تیک: {decisions_per_tick:.1f}\n"
+            f"⏱️ آخرین تیک AI: {tick_info}\n"
+            f"💾 تغییر ردیف در ثانیه: {db.conn.total_changes / uptime:.2f}\n"
+            f"🗄️ آخرین پشتیبان: {backup_info}\n\n"
             f"🔄 آخرین به‌روزرسانی: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
         )
         
@@ -683,6 +936,52 @@ def show_admin_stats(update: Update, context: CallbackContext):
         logger.error(f"خطا در show_admin_stats: {e}")
         update.callback_query.message.reply_text("خطا در نمایش آمار!")
 
+def show_memory_report(update: Update, context: CallbackContext, allocations=True):
+    """گزارش حافظه همین worker: RSS، اندازه کش‌ها و محل‌های تخصیص (tracemalloc)"""
+    try:
+        report = memory.report(top=MEMORY_REPORT_TOP, allocations=allocations)
+        mb = lambda value: f"{value / 2 ** 20:.1f}" if value is not None else "?"
+        
+        lines = [
+            f"🧠 **حافظه worker {report['pid']}**\n",
+            f"RSS: {mb(report['rss_bytes'])} MB (بیشینه {mb(report['peak_bytes'])} MB)",
+            f"رشد RSS از {report['tracked_since']}: {mb(report['rss_growth_bytes'])} MB\n",
+            "📦 **اندازه کش‌ها:**",
+            "```",
+            *(f"{name}: {size}" for name, size in report['caches'].items()),
+            "```",
+        ]
+        if allocations:
+            traced = report['allocations']
+            lines.append(
+                f"ردیابی tracemalloc: {mb(report['traced_bytes'])} MB (بیشینه {mb(report['traced_peak_bytes'])} MB)\n"
+            )
+            lines += ["📍 **بیشترین تخصیص:**", "```"]
+            lines += [f"{s['kb']:>9.1f} KB {s['count']:>7} {s['site']}" for s in traced['top']]
+            lines.append("```")
+            if traced['since_seconds'] is None:
+                lines.append("📈 اولین snapshot این worker؛ دفعه بعد رشد نسبت به آن نمایش داده می‌شود.")
+            else:
+                lines += [f"📈 **رشد در {traced['since_seconds']} ثانیه اخیر:**", "```"]
+                lines += [f"{s['kb']:>+9.1f} KB {s['count']:>+7} {s['site']}" for s in traced['growth']] or ["-"]
+                lines.append("```")
+        else:
+            lines.append("ردیابی tracemalloc خاموش است.")
+        
+        update.callback_query.edit_message_text(
+            text="\n".join(lines),
+            reply_markup=MEMORY_KEYBOARD,
+            parse_mode='Markdown'
+        )
+    except Exception as e:
+        logger.error(f"خطا در show_memory_report: {e}")
+        update.callback_query.message.reply_text("خطا در گزارش حافظه!")
+
+def stop_memory_tracing(update: Update, context: CallbackContext):
+    """خاموش کردن tracemalloc (هزینه CPU و حافظه دارد) و نمایش گزارش بدون تخصیص‌ها"""
+    memory.stop()
+    show_memory_report(update, context, allocations=False)
+
 def handle_message(update: Update, context: CallbackContext):
     """مدیریت پیام‌های متنی"""
     try:
@@ -767,28 +1066,124 @@ def handle_message(update: Update, context: CallbackContext):
         logger.error(f"خطا در handle_message: {e}")
         update.message.reply_text("خطا در پردازش پیام!")
 
+# ------------------ CALLBACK ROUTES ------------------
+
+# مسیرهای بازیکن
+router.route("refresh_dashboard", show_player_dashboard, user=True)
+router.route("upgrade_army", upgrade_army, user=True)
+router.route("collect_resources", collect_resources, user=True)
+router.route("get_advice", send_advisor_advice, user=True)
+router.route("show_ranking", show_ranking)
+router.route("show_alliances", show_alliances, user=True)
+router.prefix(RANKING_PAGER.prefix + ':', show_ranking, param='page_data')
+router.prefix(ALLIANCES_PAGER.prefix + ':', show_alliances, user=True, param='page_data')
+
+# مسیرهای مالک
+router.prefix(AI_COUNTRIES_PAGER.prefix + ':', show_ai_countries_for_assignment, owner_only=True, param='page_data')
+router.prefix("assign_country_", select_country_for_assignment, mode=FAST, owner_only=True,
+              param='country_id', parse=lambda data: int(data[len("assign_country_"):]))
+router.route("admin_panel", show_admin_panel, mode=FAST, owner_only=True)
+router.route("admin_add_player", show_ai_countries_for_assignment, owner_only=True)
+router.route("admin_start_season", start_new_season, owner_only=True)
+router.route("admin_end_season", end_current_season, owner_only=True)
+router.route("admin_broadcast", prompt_broadcast, mode=FAST, owner_only=True)
+router.route("admin_reset_game", reset_game_confirmation, mode=FAST, owner_only=True)
+router.route("admin_confirm_reset", reset_game, owner_only=True)
+router.route("admin_stats", show_admin_stats, owner_only=True)
+router.route("admin_memory", show_memory_report, owner_only=True)
+router.route("admin_memory_stop", stop_memory_tracing, owner_only=True)
+
+def create_leader():
+    """ساخت انتخاب رهبر؛ فقط worker رهبر کارهای پس‌زمینه را اجرا می‌کند"""
+    global leader
+    if db and not leader:
+        leader = LeaderElection(db)
+        leader.renew()
+        # workerهای gunicorn تابع main را اجرا نمی‌کنند؛ اجاره در خروج پروسه آزاد می‌شود
+        atexit.register(leader.resign)
+    return leader
+
+def send_notification(user_id, text):
+    """ارسال پیام اعلان با Bot مشترک updater"""
+    updater.bot.send_message(chat_id=user_id, text=text)
+
+def process_ai_decisions():
+    """یک دور تصمیم‌گیری همه AIها"""
+    try:
+        if game:
+            since = notifier.checkpoint() if notifier is not None else None
+            decisions = game.process_all_ai_decisions()
+            meter.hit('ai_ticks')
+            meter.hit('ai_decisions', len(decisions))
+            if decisions:
+                logger.info(f"AI decisions processed: {len(decisions)}")
+            # یک پیام خلاصه برای هر بازیکنی که در این تیک هدف حمله یا خیانت بوده
+            if notifier is not None and updater:
+                players = notifier.notify_since(since)
+                if players:
+                    logger.info(f"AI event digests queued for {players} players")
+        # نمونه تاریخچه قدرت و منابع پس از هر تیک
+        if history:
+            history.sample()
+    except Exception as e:
+        logger.error(f"Error in AI scheduler: {e}")
+
+def run_backup():
+    """پشتیبان آنلاین دوره‌ای با اتصال جداگانه"""
+    try:
+        if backups is not None:
+            backups.run()
+    except Exception as e:
+        logger.error(f"Error in backup job: {e}")
+
+def leader_job(job):
+    """محدود کردن کار پس‌زمینه به پروسه رهبر"""
+    return leader.only_leader(job) if leader else job
+
+def sample_memory():
+    """لاگ دوره‌ای RSS و اندازه کش‌های هر worker برای دیدن رشد قبل از کشته شدن worker"""
+    try:
+        memory.sample()
+    except Exception as e:
+        logger.error(f"Error sampling memory: {e}")
+
 def ai_scheduler():
     """زمان‌بند برای اجرای خودکار AI"""
+    from apscheduler.schedulers.background import BackgroundScheduler
     scheduler = BackgroundScheduler()
     
-    def process_ai_decisions():
-        try:
-            if game:
-                decisions = game.process_all_ai_decisions()
-                if decisions:
-                    logger.info(f"AI decisions processed: {len(decisions)}")
-        except Exception as e:
-            logger.error(f"Error in AI scheduler: {e}")
+    if create_leader():
+        scheduler.add_job(leader.renew, 'interval', seconds=leader.renew_interval)
     
     # اجرای هر 5 دقیقه
-    scheduler.add_job(process_ai_decisions, 'interval', minutes=5)
+    scheduler.add_job(leader_job(process_ai_decisions), 'interval', minutes=AI_TICK_MINUTES)
+    if BACKUP_INTERVAL_MINUTES > 0:
+        scheduler.add_job(leader_job(run_backup), 'interval', minutes=BACKUP_INTERVAL_MINUTES)
+    # همه workerها (نه فقط رهبر)
+    if MEMORY_SAMPLE_MINUTES > 0:
+        scheduler.add_job(sample_memory, 'interval', minutes=MEMORY_SAMPLE_MINUTES)
     scheduler.start()
     
     return scheduler
 
 def setup_updater():
     """تنظیم و راه‌اندازی updater"""
-    updater_instance = Updater(token=BOT_TOKEN, use_context=True)
+    from telegram.ext import (
+        Updater, CommandHandler, CallbackQueryHandler,
+        MessageHandler, Filters
+    )
+    from telegram_client import build_bot
+    from persistence import SQLitePersistence
+    from config import PTB_WORKERS
+    
+    # Bot با pool اتصال keep-alive به اندازه همه threadهای فرستنده
+    # و وضعیت گفتگو (مثل انتخاب کشور توسط مالک) مشترک بین workerها در SQLite
+    updater_instance = Updater(
+        bot=build_bot(),
+        use_context=True,
+        workers=PTB_WORKERS,
+        persistence=SQLitePersistence(),
+    )
     dp = updater_instance.dispatcher
     
     # اضافه کردن هندلرهای دستورات
@@ -803,49 +1198,116 @@ def setup_updater():
     
     return updater_instance
 
+HOME_TEXT = "🤖 Ancient War Bot v2 is running on Python 3.13 with python-telegram-bot 13.15!"
+
 @app.route('/')
 def home():
-    return "🤖 Ancient War Bot v2 is running on Python 3.13 with python-telegram-bot 13.15!"
+    return HOME_TEXT
+
+@app.route('/ready')
+def ready():
+    """وضعیت آمادگی worker و زمان مراحل راه‌اندازی"""
+    status = startup.status()
+    return jsonify(status), (200 if status['ready'] else 503)
 
 @app.route('/webhook', methods=['POST'])
 def webhook():
     """Webhook endpoint برای تلگرام"""
-    global updater
+    ensure_warm()
+    
+    if not updater:
+        return 'Service Unavailable', 503
     
     if request.headers.get('content-type') == 'application/json':
-        json_str = request.get_data().decode('UTF-8')
-        update = Update.de_json(json_str, updater.bot)
-        updater.dispatcher.process_update(update)
+        process_update_json(request.get_json(force=True))
         return 'OK'
     return 'Bad Request', 400
 
+def process_update_json(data):
+    """تبدیل JSON آپدیت و اجرای هندلرهای همزمان (مشترک بین Flask و حالت async)"""
+    # ضبط قبل از حذف تکراری‌ها تا ارسال‌های مجدد تلگرام هم در پخش باشند
+    if recorder is not None:
+        try:
+            recorder.record(data)
+        except Exception as e:
+            # ضبط نباید هیچ‌وقت سرویس‌دهی را متوقف کند (مثلاً دیسک پر)
+            logger.error(f"Error recording update: {e}")
+    # آپدیت‌های ارسال مجدد تلگرام قبل از هر کار هندلر یا دیتابیس کنار گذاشته می‌شوند
+    if update_dedup is not None and update_dedup.is_duplicate(data.get('update_id')):
+        logger.info(f"Duplicate update {data.get('update_id')} dropped")
+        return
+    
+    meter.hit('updates')
+    update = Update.de_json(data, updater.bot)
+    updater.dispatcher.process_update(update)
+
+def serve_async():
+    """سرویس‌دهی با asyncio: webhook، dispatch و تیک AI روی یک event loop"""
+    from async_server import AsyncBotServer
+    from config import ASYNC_HANDLER_WORKERS, ASYNC_MAX_IN_FLIGHT
+    
+    server = AsyncBotServer(
+        process_update=process_update_json,
+        status=startup.status,
+        home_text=HOME_TEXT,
+        host=LISTEN,
+        port=PORT,
+        handler_workers=ASYNC_HANDLER_WORKERS,
+        max_in_flight=ASYNC_MAX_IN_FLIGHT,
+    )
+    
+    # کارهای دیتابیسی دوره‌ای در executor اختصاصی دیتابیس
+    if create_leader():
+        server.add_periodic(leader.renew_interval, leader.renew)
+    server.add_periodic(AI_TICK_MINUTES * 60, leader_job(process_ai_decisions))
+    if BACKUP_INTERVAL_MINUTES > 0:
+        server.add_periodic(BACKUP_INTERVAL_MINUTES * 60, leader_job(run_backup), background=True)
+    if MEMORY_SAMPLE_MINUTES > 0:
+        server.add_periodic(MEMORY_SAMPLE_MINUTES * 60, sample_memory, background=True)
+    
+    server.serve()
+
 def main():
     """تابع اصلی اجرای ربات"""
-    global updater
-    
-    # راه‌اندازی AI Scheduler
-    scheduler = ai_scheduler()
+    # راه‌اندازی دیتابیس، updater و AI Scheduler
+    warm_up()
     
-    # راه‌اندازی updater
-    updater = setup_updater()
+    if not updater:
+        logger.error("Updater راه‌اندازی نشد؛ خروج.")
+        return
     
     if WEBHOOK_URL and WEBHOOK_URL.strip():
         # حالت Webhook (برای Render)
-        logger.info(f"Starting in Webhook mode with URL: {WEBHOOK_URL}")
+        logger.info(f"Starting in Webhook mode ({SERVE_MODE}) with URL: {WEBHOOK_URL}")
         
         # تنظیم Webhook
         updater.bot.set_webhook(url=f"{WEBHOOK_URL}/webhook")
         
-        # اجرای Flask app
-        app.run(host=LISTEN, port=PORT)
+        if SERVE_MODE == 'async':
+            serve_async()
+        else:
+            # اجرای Flask app
+            app.run(host=LISTEN, port=PORT)
     else:
         # حالت Polling (برای توسعه)
         logger.info("Starting in Polling mode...")
         updater.start_polling()
         updater.idle()
     
-    # توقف زمان‌بند
-    scheduler.shutdown()
+    # توقف زمان‌بند، کارهای معوق، اعلان‌ها و واگذاری رهبری
+    deferred.shutdown(wait=True)
+    if notifier is not None:
+        notifier.shutdown(wait=True)
+    if scheduler:
+        scheduler.shutdown()
+    if leader:
+        leader.resign()
+
+# راه‌اندازی worker بر اساس حالت انتخاب‌شده
+if STARTUP_MODE == 'background':
+    threading.Thread(target=warm_up, name='warm-up', daemon=True).start()
+elif STARTUP_MODE != 'lazy' and __name__ != '__main__':
+    warm_up()
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,153 @@
+"""ردیابی حافظه هر worker: RSS، اندازه کش‌ها و محل‌های پرمصرف تخصیص با tracemalloc
+
+گزارش همین پروسه:
+    python memprofile.py
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+import tracemalloc
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# فریم‌هایی که در فهرست محل‌های تخصیص نمی‌آیند
+IGNORED_FILES = ('<frozen importlib._bootstrap>', '<frozen importlib._bootstrap_external>', '<unknown>', tracemalloc.__file__)
+
+def process_memory():
+    """RSS فعلی و بیشینه پروسه به بایت (از /proc در لینوکس، در غیر این صورت فقط بیشینه)"""
+    try:
+        values = {}
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(('VmRSS:', 'VmHWM:')):
+                    name, amount = line.split(':', 1)
+                    values[name] = int(amount.split()[0]) * 1024
+        return {'rss': values.get('VmRSS'), 'peak': values.get('VmHWM')}
+    except OSError:
+        import resource
+        # ru_maxrss در لینوکس کیلوبایت و در macOS بایت است
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return {'rss': None, 'peak': peak if sys.platform == 'darwin' else peak * 1024}
+
+class MemoryProfiler:
+    """گزارش حافظه یک worker
+
+    هر کش یا صف با track(name, source) ثبت می‌شود؛ source تابعی بدون آرگومان است که شیء
+    دارای __len__ یا یک عدد (تعداد یا بایت، یا None اگر هنوز ساخته نشده) برمی‌گرداند. tracemalloc هزینه
+    CPU و حافظه دارد، پس فقط با start() (یا با اولین snapshot) روشن می‌شود و هر snapshot
+    با قبلی مقایسه می‌شود.
+    """
+
+    def __init__(self, frames=1, history=144):
+        self.frames = frames
+        self.sources = {}
+        self.samples = deque(maxlen=history)  # (زمان، RSS)
+        self._previous = None
+        self._previous_at = None
+
+    def track(self, name, source):
+        self.sources[name] = source
+
+    def cache_sizes(self):
+        sizes = {}
+        for name, source in self.sources.items():
+            try:
+                value = source()
+                if value is None:
+                    continue
+                sizes[name] = value if isinstance(value, int) else len(value)
+            except Exception as e:
+                logger.warning(f"Memory source {name} failed: {e}")
+        return sizes
+
+    def sample(self):
+        """ثبت RSS و اندازه کش‌ها برای دنبال کردن رشد در طول عمر worker"""
+        rss = process_memory()['rss']
+        sizes = self.cache_sizes()
+        self.samples.append((time.time(), rss))
+        logger.info(
+            f"Memory pid {os.getpid()}: rss {(rss or 0) / 2 ** 20:.1f} MB, "
+            + ", ".join(f"{name}={size}" for name, size in sizes.items())
+        )
+        return sizes
+
+    @property
+    def tracing(self):
+        return tracemalloc.is_tracing()
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            logger.info(f"tracemalloc started with {self.frames} frames")
+
+    def stop(self):
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+            logger.info("tracemalloc stopped")
+        self._previous = None
+        self._previous_at = None
+
+    def snapshot(self, top=10):
+        """محل‌های پرمصرف و بیشترین رشد از snapshot قبلی (اولین بار فقط مبنا گرفته می‌شود)"""
+        self.start()
+        current = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, name) for name in IGNORED_FILES]
+        )
+        previous, previous_at = self._previous, self._previous_at
+        self._previous, self._previous_at = current, time.time()
+
+        def site(stat):
+            frame = stat.traceback[0]
+            return f"{os.path.basename(frame.filename)}:{frame.lineno}"
+
+        result = {
+            'top': [
+                {'site': site(stat), 'kb': round(stat.size / 1024, 1), 'count': stat.count}
+                for stat in current.statistics('lineno')[:top]
+            ],
+            'growth': [],
+            'since_seconds': round(self._previous_at - previous_at) if previous else None,
+        }
+        if previous is not None:
+            diffs = [stat for stat in current.compare_to(previous, 'lineno') if stat.size_diff > 0]
+            result['growth'] = [
+                {'site': site(stat), 'kb': round(stat.size_diff / 1024, 1), 'count': stat.count_diff}
+                for stat in diffs[:top]
+            ]
+        return result
+
+    def report(self, top=10, allocations=True):
+        """گزارش کامل این worker"""
+        memory = process_memory()
+        sizes = self.sample()
+        first = self.samples[0]
+        report = {
+            'pid': os.getpid(),
+            'rss_bytes': memory['rss'],
+            'peak_bytes': memory['peak'],
+            'rss_growth_bytes': memory['rss'] - first[1] if memory['rss'] and first[1] else None,
+            'tracked_since': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(first[0])),
+            'caches': sizes,
+        }
+        if allocations:
+            report['allocations'] = self.snapshot(top)
+            report['traced_bytes'], report['traced_peak_bytes'] = tracemalloc.get_traced_memory()
+        return report
+
+if __name__ == '__main__':
+    import json
+
+    parser = argparse.ArgumentParser(description='Memory report of this process after importing the bot')
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    # ردیابی قبل از import تا هزینه بارگذاری ماژول‌ها هم دیده شود
+    tracemalloc.start(1)
+    os.environ.setdefault('STARTUP_MODE', 'lazy')
+    import main
+    main.init_services()
+    main.load_telegram()
+    print(json.dumps(main.memory.report(args.top), indent=2, ensure_ascii=False))
@@ -0,0 +1,267 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+# مهاجرت‌ها به ترتیب اجرا می‌شوند؛ نسخه هر مهاجرت = شماره آن در این لیست
+# هرگز ترتیب را عوض نکن یا مهاجرتی را حذف نکن، فقط به انتها اضافه کن
+MIGRATIONS = []
+
+def migration(func):
+    """ثبت یک مرحله مهاجرت در انتهای لیست"""
+    MIGRATIONS.append(func)
+    return func
+
+def get_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+def migrate(conn):
+    """اجرای مهاجرت‌های باقی‌مانده؛ اگر دیتابیس به‌روز باشد فقط یک PRAGMA خوانده می‌شود"""
+    target = len(MIGRATIONS)
+    if get_version(conn) >= target:
+        return False
+
+    cursor = conn.cursor()
+    # قفل نوشتن تا دو worker هم‌زمان مهاجرت را اجرا نکنند
+    cursor.execute('BEGIN IMMEDIATE')
+    try:
+        current = get_version(conn)
+        for version in range(current + 1, target + 1):
+            logger.info(f"Applying migration {version}: {MIGRATIONS[version - 1].__name__}")
+            MIGRATIONS[version - 1](cursor)
+        cursor.execute(f'PRAGMA user_version = {target}')
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return True
+
+@migration
+def create_base_schema(cursor):
+    """جداول اصلی بازی و کشورهای باستانی"""
+    from config import ANCIENT_COUNTRIES
+
+    # جدول بازیکنان
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS players (
+        user_id INTEGER PRIMARY KEY,
+        username TEXT,
+        full_name TEXT,
+        country_id INTEGER,
+        joined_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        is_active BOOLEAN DEFAULT 1
+    )
+    ''')
+
+    # جدول کشورها
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS countries (
+        id INTEGER PRIMARY KEY,
+        name TEXT UNIQUE,
+        controller TEXT DEFAULT 'AI', -- 'HUMAN' یا 'AI'
+        player_id INTEGER,
+        specialty TEXT,
+        color TEXT,
+        is_active BOOLEAN DEFAULT 1
+    )
+    ''')
+
+    # جدول منابع
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS resources (
+        country_id INTEGER PRIMARY KEY,
+        gold INTEGER DEFAULT 1000,
+        iron INTEGER DEFAULT 500,
+        stone INTEGER DEFAULT 800,
+        food INTEGER DEFAULT 1200,
+        last_update TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+
+    # جدول ارتش
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS army (
+        country_id INTEGER PRIMARY KEY,
+        level INTEGER DEFAULT 1,
+        infantry INTEGER DEFAULT 100,
+        cavalry INTEGER DEFAULT 20,
+        archers INTEGER DEFAULT 30,
+        defense INTEGER DEFAULT 50,
+        power INTEGER DEFAULT 150,
+        last_training TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+
+    # جدول اتحادها
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS alliances (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        country1_id INTEGER,
+        country2_id INTEGER,
+        relation_type TEXT, -- 'ALLIANCE', 'WAR', 'NEUTRAL'
+        strength INTEGER DEFAULT 50,
+        created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE(country1_id, country2_id)
+    )
+    ''')
+
+    # جدول فصل
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS seasons (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        season_number INTEGER,
+        start_date TIMESTAMP,
+        end_date TIMESTAMP,
+        winner_country_id INTEGER,
+        winner_player_id INTEGER,
+        is_active BOOLEAN DEFAULT 0
+    )
+    ''')
+
+    # جدول رویدادها
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        event_type TEXT,
+        country_id INTEGER,
+        target_country_id INTEGER,
+        description TEXT,
+        resources_change TEXT, -- JSON
+        army_change TEXT, -- JSON
+        event_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+
+    # کشورهای اولیه در یک executemany
+    cursor.executemany('''
+    INSERT OR IGNORE INTO countries (id, name, specialty, color)
+    VALUES (?, ?, ?, ?)
+    ''', [(c['id'], c['name'], c['specialty'], c['color']) for c in ANCIENT_COUNTRIES])
+
+@migration
+def create_leases(cursor):
+    """جدول اجاره رهبری بین پروسه‌ها"""
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS leases (
+        name TEXT PRIMARY KEY,
+        holder TEXT,
+        expires_at REAL -- epoch ثانیه
+    )
+    ''')
+
+@migration
+def create_country_history(cursor):
+    """سری زمانی فشرده قدرت و منابع کشورها"""
+    # resolution: 0 خام (هر تیک)، 1 ساعتی، 2 روزانه؛ ts = epoch ثانیه (شروع بازه در سطوح تجمیعی)
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS country_history (
+        resolution INTEGER NOT NULL,
+        country_id INTEGER NOT NULL,
+        ts INTEGER NOT NULL,
+        power INTEGER,
+        level INTEGER,
+        gold INTEGER,
+        iron INTEGER,
+        stone INTEGER,
+        food INTEGER,
+        PRIMARY KEY (resolution, country_id, ts)
+    ) WITHOUT ROWID
+    ''')
+
+@migration
+def create_paging_indexes(cursor):
+    """ایندکس‌های صفحه‌بندی keyset"""
+    # ایندکس روی power شامل rowid (country_id) هم هست: ترتیب (power, country_id)
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_army_power ON army (power)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_countries_controller ON countries (controller, is_active)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_alliances_country1 ON alliances (country1_id, relation_type)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_alliances_country2 ON alliances (country2_id, relation_type)')
+
+@migration
+def create_persistence_data(cursor):
+    """وضعیت گفتگوی تلگرام (user_data/chat_data/bot_data) به صورت ردیف‌های جدا"""
+    # kind: 'user'، 'chat'، 'bot' یا 'conv:<name>'
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS persistence_data (
+        kind TEXT NOT NULL,
+        key TEXT NOT NULL,
+        data TEXT NOT NULL, -- JSON
+        updated_at REAL,
+        PRIMARY KEY (kind, key)
+    ) WITHOUT ROWID
+    ''')
+
+@migration
+def create_processed_updates(cursor):
+    """پنجره update_idهای پردازش‌شده، مشترک بین workerها"""
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS processed_updates (
+        update_id INTEGER PRIMARY KEY,
+        seen_at REAL NOT NULL
+    )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_processed_updates_seen ON processed_updates (seen_at)')
+
+@migration
+def create_world_map(cursor):
+    """منطقه کشورها، مرز مناطق و جدول فاصله همه جفت مناطق"""
+    from config import ANCIENT_COUNTRIES, REGION_ADJACENCY
+    from world import write_map
+
+    columns = [row[1] for row in cursor.execute('PRAGMA table_info(countries)')]
+    if 'region' not in columns:
+        cursor.execute('ALTER TABLE countries ADD COLUMN region TEXT')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_countries_region ON countries (region, controller)')
+    cursor.executemany(
+        'UPDATE countries SET region = ? WHERE id = ?',
+        [(c['region'], c['id']) for c in ANCIENT_COUNTRIES]
+    )
+
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS region_adjacency (
+        region_a TEXT NOT NULL,
+        region_b TEXT NOT NULL,
+        PRIMARY KEY (region_a, region_b)
+    ) WITHOUT ROWID
+    ''')
+    # کلید (مبدأ، فاصله، مقصد): مناطق در دسترس یک مبدأ با یک جستجوی بازه‌ای
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS region_distance (
+        from_region TEXT NOT NULL,
+        to_region TEXT NOT NULL,
+        distance INTEGER NOT NULL,
+        PRIMARY KEY (from_region, distance, to_region)
+    ) WITHOUT ROWID
+    ''')
+    write_map(cursor, REGION_ADJACENCY, [c['region'] for c in ANCIENT_COUNTRIES])
+
+@migration
+def create_counters(cursor):
+    """شمارنده‌های آمار مدیریت که همراه تراکنش‌های تغییر به‌روز می‌شوند"""
+    from counters import recount
+
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS counters (
+        name TEXT PRIMARY KEY,
+        value INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID
+    ''')
+    recount(cursor)
+
+@migration
+def create_backup_log(cursor):
+    """هزینه هر اجرای پشتیبان آنلاین (backup.py)"""
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS backup_log (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        path TEXT,
+        started_at TIMESTAMP,
+        pages INTEGER,
+        steps INTEGER,
+        restarts INTEGER,
+        copy_ms REAL,
+        total_ms REAL,
+        size_bytes INTEGER,
+        compressed_bytes INTEGER,
+        schema_version INTEGER
+    )
+    ''')
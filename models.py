@@ -0,0 +1,106 @@
+class Model:
+    """پایه اشیاء دامنه با __slots__ که مستقیماً از tuple ردیف ساخته می‌شوند
+
+    ترتیب آرگومان‌های __init__ همان COLUMNS است و کوئری‌ها ستون‌ها را با select_columns()
+    به همین ترتیب می‌خوانند. obj['key']، obj.get و dict(obj) مثل sqlite3.Row کار می‌کنند.
+    """
+    __slots__ = ()
+    COLUMNS = ()
+
+    @classmethod
+    def select_columns(cls, alias=None):
+        prefix = f"{alias}." if alias else ''
+        return ', '.join(prefix + column for column in cls.COLUMNS)
+
+    @classmethod
+    def row_factory(cls, cursor, row):
+        return cls(*row)
+
+    @classmethod
+    def from_mapping(cls, mapping):
+        """ساخت از dict (موتور حافظه)؛ کلیدهای اضافه نادیده گرفته می‌شوند"""
+        return cls(*(mapping.get(column) for column in cls.COLUMNS))
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def keys(self):
+        return self.COLUMNS
+
+    def __repr__(self):
+        values = ', '.join(f"{column}={getattr(self, column)!r}" for column in self.COLUMNS)
+        return f"{type(self).__name__}({values})"
+
+class Country(Model):
+    COLUMNS = ('id', 'name', 'controller', 'player_id', 'specialty', 'color', 'is_active', 'region')
+    __slots__ = COLUMNS
+
+    def __init__(self, id, name, controller, player_id, specialty, color, is_active, region):
+        self.id = id
+        self.name = name
+        self.controller = controller
+        self.player_id = player_id
+        self.specialty = specialty
+        self.color = color
+        self.is_active = is_active
+        self.region = region
+
+class Resources(Model):
+    COLUMNS = ('country_id', 'gold', 'iron', 'stone', 'food', 'last_update')
+    __slots__ = COLUMNS
+
+    def __init__(self, country_id, gold, iron, stone, food, last_update):
+        self.country_id = country_id
+        self.gold = gold
+        self.iron = iron
+        self.stone = stone
+        self.food = food
+        self.last_update = last_update
+
+class Army(Model):
+    COLUMNS = ('country_id', 'level', 'infantry', 'cavalry', 'archers', 'defense', 'power', 'last_training')
+    __slots__ = COLUMNS
+
+    def __init__(self, country_id, level, infantry, cavalry, archers, defense, power, last_training):
+        self.country_id = country_id
+        self.level = level
+        self.infantry = infantry
+        self.cavalry = cavalry
+        self.archers = archers
+        self.defense = defense
+        self.power = power
+        self.last_training = last_training
+
+class Alliance(Model):
+    """ردیف alliances به همراه نام دو کشور (country1، country2) از جوین با countries"""
+    TABLE_COLUMNS = ('id', 'country1_id', 'country2_id', 'relation_type', 'strength', 'created_date')
+    COLUMNS = TABLE_COLUMNS + ('country1', 'country2')
+    __slots__ = COLUMNS
+
+    def __init__(self, id, country1_id, country2_id, relation_type, strength, created_date, country1, country2):
+        self.id = id
+        self.country1_id = country1_id
+        self.country2_id = country2_id
+        self.relation_type = relation_type
+        self.strength = strength
+        self.created_date = created_date
+        self.country1 = country1
+        self.country2 = country2
+
+    @classmethod
+    def select_columns(cls, alias='a', first='c1', second='c2'):
+        """ستون‌های جدول از alias و نام کشورها از جوین‌های first و second"""
+        columns = [f"{alias}.{column}" for column in cls.TABLE_COLUMNS]
+        return ', '.join(columns + [f"{first}.name AS country1", f"{second}.name AS country2"])
+
+    def partner(self, country_id):
+        """(شناسه، نام) طرف دیگر رابطه"""
+        if self.country1_id == country_id:
+            return self.country2_id, self.country2
+        return self.country1_id, self.country1
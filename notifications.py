@@ -0,0 +1,137 @@
+import time
+import logging
+import threading
+from collections import OrderedDict
+from throttle import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# رویدادهایی که به بازیکن هدف اطلاع داده می‌شوند
+NOTIFY_EVENTS = {
+    'AI_ATTACK': "⚔️ {attacker} به {target} حمله کرد",
+    'BETRAYAL': "🗡 {attacker} به اتحاد با {target} خیانت کرد",
+}
+
+DIGEST_HEADER = "📜 گزارش رویدادهای اخیر:"
+
+class DigestNotifier:
+    """اعلان خلاصه رویدادهای AI به بازیکنان انسانی
+
+    رویدادهای هر تیک برای هر بازیکن در یک پیام جمع می‌شوند و پیام‌ها با یک
+    سطل توکن در thread جداگانه ارسال می‌شوند. اگر برای بازیکنی هنوز پیامی
+    در صف باشد، رویدادهای تازه به همان پیام اضافه می‌شوند.
+    """
+
+    def __init__(self, db, send, rate_per_second=20, burst=20, max_lines=10):
+        self.db = db
+        self.send = send  # send(user_id, text)
+        self.rate_per_second = rate_per_second
+        self.burst = burst
+        self.max_lines = max_lines
+        self._pending = OrderedDict()  # user_id -> خطوط پیام
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopped = False
+        self.events = 0
+        self.merged = 0
+        self.sent = 0
+        self.failed = 0
+
+    def checkpoint(self):
+        """آخرین id رویداد؛ قبل از تیک خوانده می‌شود تا رویدادهای همان تیک جدا شوند"""
+        row = self.db.conn.execute('SELECT COALESCE(MAX(id), 0) FROM events').fetchone()
+        return row[0]
+
+    def collect(self, since_id):
+        """رویدادهای بعد از since_id، گروه‌بندی‌شده به ازای بازیکن هدف"""
+        placeholders = ', '.join('?' for _ in NOTIFY_EVENTS)
+        cursor = self.db.conn.cursor()
+        cursor.execute(f'''
+        SELECT e.event_type, a.name AS attacker, t.name AS target, t.player_id
+        FROM events e
+        JOIN countries t ON t.id = e.target_country_id
+        JOIN countries a ON a.id = e.country_id
+        WHERE e.id > ?
+          AND e.event_type IN ({placeholders})
+          AND t.controller = 'HUMAN'
+          AND t.player_id IS NOT NULL
+        ORDER BY e.id
+        ''', (since_id, *NOTIFY_EVENTS))
+
+        digests = OrderedDict()
+        for row in cursor.fetchall():
+            line = NOTIFY_EVENTS[row['event_type']].format(attacker=row['attacker'], target=row['target'])
+            digests.setdefault(row['player_id'], []).append(line)
+        return digests
+
+    def notify_since(self, since_id):
+        """جمع‌آوری رویدادهای تیک و قرار دادن خلاصه‌ها در صف ارسال"""
+        digests = self.collect(since_id)
+        if digests:
+            self.enqueue(digests)
+        return len(digests)
+
+    def enqueue(self, digests):
+        with self._cond:
+            for user_id, lines in digests.items():
+                self.events += len(lines)
+                if user_id in self._pending:
+                    # کاربر هنوز پیام ارسال‌نشده دارد؛ پیام دوم ساخته نمی‌شود
+                    self._pending[user_id].extend(lines)
+                    self.merged += 1
+                else:
+                    self._pending[user_id] = list(lines)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='notifier', daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def format_digest(self, lines):
+        shown = lines[-self.max_lines:]
+        text = '\n'.join([DIGEST_HEADER] + shown)
+        if len(lines) > len(shown):
+            text += f"\n… و {len(lines) - len(shown)} رویداد دیگر"
+        return text
+
+    def _run(self):
+        bucket = TokenBucket(self.burst, self.rate_per_second, time.monotonic())
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopped:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                user_id, lines = self._pending.popitem(last=False)
+
+            while not bucket.consume(time.monotonic()):
+                time.sleep((1 - bucket.tokens) / self.rate_per_second)
+
+            try:
+                self.send(user_id, self.format_digest(lines))
+                self.sent += 1
+            except Exception as e:
+                # کاربری که ربات را مسدود کرده یا خطای شبکه؛ پیام کنار گذاشته می‌شود
+                self.failed += 1
+                logger.warning(f"Digest to {user_id} failed: {e}")
+
+    def shutdown(self, wait=True):
+        """پایان ارسال؛ پیام‌های در صف قبل از توقف فرستاده می‌شوند"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+            thread = self._thread
+        if wait and thread is not None:
+            thread.join()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'pending': len(self._pending),
+                'events': self.events,
+                'merged': self.merged,
+                'sent': self.sent,
+                'failed': self.failed,
+            }
+
+    def __len__(self):
+        return len(self._pending)
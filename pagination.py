@@ -0,0 +1,93 @@
+from config import PAGE_SIZE
+
+NEXT = 'n'
+PREV = 'p'
+
+class Page:
+    """یک صفحه از نتایج به همراه cursorهای صفحه بعد و قبل"""
+    __slots__ = ('rows', 'position', 'next_cursor', 'prev_cursor')
+
+    def __init__(self, rows, position, next_cursor, prev_cursor):
+        self.rows = rows
+        self.position = position  # شماره ردیف اول صفحه (از 1)
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def nav_buttons(self):
+        """(متن، callback_data) برای دکمه‌های قبلی/بعدی"""
+        buttons = []
+        if self.prev_cursor:
+            buttons.append(("◀️ قبلی", self.prev_cursor))
+        if self.next_cursor:
+            buttons.append(("بعدی ▶️", self.next_cursor))
+        return buttons
+
+class KeysetPaginator:
+    """صفحه‌بندی keyset؛ cursor در callback_data ذخیره می‌شود
+
+    query باید شامل {keyset} (بعد از شرط‌های WHERE) و {order} باشد و با LIMIT ? تمام شود.
+    keys: لیست (عبارت SQL، نام ستون در نتیجه، نوع) که ترتیب یکتا می‌سازد.
+    row_factory: برای ساخت مستقیم اشیاء مدل (مثلا Alliance.row_factory)؛ پیش‌فرض row_factory اتصال.
+    هر صفحه یک کوئری بازه‌ای روی ایندکس است، پس هزینه به عمق صفحه بستگی ندارد.
+    """
+
+    def __init__(self, prefix, query, keys, descending=False, page_size=PAGE_SIZE, row_factory=None):
+        self.prefix = prefix
+        self.query = query
+        self.row_factory = row_factory
+        self.keys = keys
+        self.descending = descending
+        self.page_size = page_size
+        self._key_expr = '(' + ', '.join(k[0] for k in keys) + ')'
+
+    def owns(self, data):
+        return data.startswith(self.prefix + ':')
+
+    def encode(self, direction, position, row):
+        values = ':'.join(str(row[k[1]]) for k in self.keys)
+        return f"{self.prefix}:{direction}:{position}:{values}"
+
+    def decode(self, data):
+        """callback_data -> (جهت، شماره ردیف اول صفحه، مقادیر کلید)"""
+        parts = data.split(':')
+        direction, position = parts[1], int(parts[2])
+        values = tuple(k[2](v) for k, v in zip(self.keys, parts[3:]))
+        return direction, position, values
+
+    def fetch(self, conn, params=(), data=None):
+        """دریافت صفحه اول (data=None) یا صفحه‌ای که cursor آن در data است"""
+        direction, position, values = self.decode(data) if data else (NEXT, 1, None)
+        forward = direction == NEXT
+
+        keyset = ''
+        args = list(params)
+        if values is not None:
+            # در ترتیب نزولی صفحه بعد کلیدهای کوچک‌تر دارد
+            op = '<' if forward == self.descending else '>'
+            keyset = f"AND {self._key_expr} {op} ({', '.join('?' for _ in values)})"
+            args.extend(values)
+
+        ascending = forward != self.descending
+        order = ', '.join(f"{k[0]} {'ASC' if ascending else 'DESC'}" for k in self.keys)
+        args.append(self.page_size + 1)
+
+        cursor = conn.cursor()
+        if self.row_factory is not None:
+            cursor.row_factory = self.row_factory
+        cursor.execute(self.query.format(keyset=keyset, order=order), args)
+        rows = cursor.fetchall()
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+
+        if forward:
+            has_next, has_prev = has_more, values is not None
+        else:
+            rows.reverse()
+            has_next, has_prev = True, has_more
+
+        if not rows:
+            return Page(rows, position, None, None)
+
+        next_cursor = self.encode(NEXT, position + len(rows), rows[-1]) if has_next else None
+        prev_cursor = self.encode(PREV, max(position - self.page_size, 1), rows[0]) if has_prev else None
+        return Page(rows, position, next_cursor, prev_cursor)
@@ -0,0 +1,154 @@
+import json
+import time
+import logging
+import sqlite3
+import threading
+from collections import defaultdict, OrderedDict
+from telegram.ext import BasePersistence
+from config import DB_NAME
+
+logger = logging.getLogger(__name__)
+
+EMPTY = '{}'
+# کلیدی که در کش نیست (هرگز دیده نشده یا از LRU بیرون رفته)؛ با هیچ JSON برابر نیست
+MISSING = object()
+
+class SQLitePersistence(BasePersistence):
+    """persistence تلگرام با یک ردیف برای هر user/chat در SQLite
+
+    فقط کلیدهای تغییرکرده نوشته می‌شوند و قبل از هر آپدیت همان یک ردیف دوباره خوانده
+    می‌شود تا workerهای مختلف gunicorn وضعیت مشترک داشته باشند. کش نوشتن‌ها را کم می‌کند،
+    نه خواندن‌ها: هر آپدیت برای هر نوع (user، chat، bot) یک SELECT با کلید اصلی دارد.
+    """
+
+    def __init__(self, db_path=DB_NAME, store_user_data=True, store_chat_data=True,
+                 store_bot_data=True, cache_size=10000):
+        super().__init__(
+            store_user_data=store_user_data,
+            store_chat_data=store_chat_data,
+            store_bot_data=store_bot_data,
+            store_callback_data=False,
+        )
+        # اتصال جدا تا commitهای persistence با تراکنش‌های بازی قاطی نشود
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, timeout=10)
+        self._lock = threading.Lock()
+        # (kind, key) -> آخرین JSON نوشته/خوانده‌شده؛ برای رد کردن نوشتن‌های بدون تغییر
+        self._cache = OrderedDict()
+        self.cache_size = cache_size
+        self.reads = 0
+        self.writes = 0
+        self.skipped_writes = 0
+
+    # ---------- لایه ردیف ----------
+
+    def _remember(self, kind, key, text):
+        self._cache[(kind, key)] = text
+        self._cache.move_to_end((kind, key))
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _read(self, kind, key):
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT data FROM persistence_data WHERE kind = ? AND key = ?', (kind, str(key))
+            ).fetchone()
+            self.reads += 1
+        return row[0] if row else EMPTY
+
+    def _write(self, kind, key, data):
+        text = json.dumps(data, sort_keys=True, ensure_ascii=False)
+        with self._lock:
+            if self._cache.get((kind, key), MISSING) == text:
+                self.skipped_writes += 1
+                return
+            if text == EMPTY:
+                # ردیف خالی نگه داشته نمی‌شود تا جدول فقط کاربران دارای وضعیت را داشته باشد
+                self.conn.execute(
+                    'DELETE FROM persistence_data WHERE kind = ? AND key = ?', (kind, str(key))
+                )
+            else:
+                self.conn.execute('''
+                INSERT OR REPLACE INTO persistence_data (kind, key, data, updated_at)
+                VALUES (?, ?, ?, ?)
+                ''', (kind, str(key), text, time.time()))
+            self.conn.commit()
+            self.writes += 1
+            self._remember(kind, key, text)
+
+    def _refresh(self, kind, key, data):
+        """یک SELECT برای هر نوع؛ data فقط وقتی عوض می‌شود که ردیف با کش فرق کند"""
+        text = self._read(kind, key)
+        with self._lock:
+            if self._cache.get((kind, key), MISSING) == text:
+                return
+            self._remember(kind, key, text)
+        # worker دیگری این داده را تغییر داده است
+        data.clear()
+        data.update(json.loads(text))
+
+    # ---------- API مورد نیاز BasePersistence ----------
+
+    def get_user_data(self):
+        # داده‌ها هنگام پردازش هر آپدیت با refresh_user_data بارگذاری می‌شوند
+        return defaultdict(dict)
+
+    def get_chat_data(self):
+        return defaultdict(dict)
+
+    def get_bot_data(self):
+        text = self._read('bot', 0)
+        with self._lock:
+            self._remember('bot', 0, text)
+        return json.loads(text)
+
+    def refresh_user_data(self, user_id, user_data):
+        self._refresh('user', user_id, user_data)
+
+    def refresh_chat_data(self, chat_id, chat_data):
+        self._refresh('chat', chat_id, chat_data)
+
+    def refresh_bot_data(self, bot_data):
+        self._refresh('bot', 0, bot_data)
+
+    def update_user_data(self, user_id, data):
+        self._write('user', user_id, data)
+
+    def update_chat_data(self, chat_id, data):
+        self._write('chat', chat_id, data)
+
+    def update_bot_data(self, data):
+        self._write('bot', 0, data)
+
+    def get_conversations(self, name):
+        rows = self.conn.execute(
+            'SELECT key, data FROM persistence_data WHERE kind = ?', (f'conv:{name}',)
+        ).fetchall()
+        return {tuple(json.loads(key)): json.loads(text) for key, text in rows}
+
+    def update_conversation(self, name, key, new_state):
+        kind = f'conv:{name}'
+        key = json.dumps(list(key))
+        with self._lock:
+            if new_state is None:
+                self.conn.execute('DELETE FROM persistence_data WHERE kind = ? AND key = ?', (kind, key))
+            else:
+                self.conn.execute('''
+                INSERT OR REPLACE INTO persistence_data (kind, key, data, updated_at)
+                VALUES (?, ?, ?, ?)
+                ''', (kind, key, json.dumps(new_state), time.time()))
+            self.conn.commit()
+
+    def flush(self):
+        # هر تغییر بلافاصله commit می‌شود؛ چیزی برای flush نمانده است
+        pass
+
+    def stats(self):
+        return {
+            'cached_keys': len(self._cache),
+            'reads': self.reads,
+            'writes': self.writes,
+            'skipped_writes': self.skipped_writes,
+        }
+
+    def __len__(self):
+        return len(self._cache)
@@ -0,0 +1,96 @@
+import os
+import time
+import logging
+import sqlite3
+import threading
+from urllib.parse import quote
+from config import DB_NAME
+
+logger = logging.getLogger(__name__)
+
+class ReadReplica:
+    """مسیر خواندن جدا برای نماهای فقط‌خواندنی (رده‌بندی، اتحادها، آمار، هشدارها)
+
+    mode='ro': هر thread یک اتصال mode=ro دارد؛ در WAL خواننده‌ها نویسنده را متوقف نمی‌کنند.
+    mode='snapshot': کپی درون‌حافظه‌ای با backup API که حداکثر max_age_seconds کهنه است.
+    mode='primary': همان اتصال اصلی (رفتار قبلی).
+    """
+
+    def __init__(self, db, mode='ro', max_age_seconds=30, path=DB_NAME):
+        self.db = db
+        self.mode = mode
+        self.max_age_seconds = max_age_seconds
+        self.uri = f"file:{quote(os.path.abspath(path))}?mode=ro"
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._snapshot_at = 0.0
+        self.reads = 0
+        self.refreshes = 0
+        self.last_refresh_ms = 0.0
+
+    def _connect_ro(self):
+        conn = sqlite3.connect(self.uri, uri=True, check_same_thread=False, timeout=10)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def conn(self):
+        """اتصال خواندن برای thread جاری"""
+        self.reads += 1
+        if self.mode == 'snapshot':
+            return self._current_snapshot()
+        if self.mode == 'ro':
+            conn = getattr(self._local, 'conn', None)
+            if conn is None:
+                conn = self._local.conn = self._connect_ro()
+            return conn
+        return self.db.conn
+
+    def _current_snapshot(self):
+        if self._snapshot is None or time.monotonic() - self._snapshot_at > self.max_age_seconds:
+            with self._lock:
+                # thread دیگری ممکن است همین حالا تازه‌سازی کرده باشد
+                if self._snapshot is None or time.monotonic() - self._snapshot_at > self.max_age_seconds:
+                    self.refresh()
+        return self._snapshot
+
+    def refresh(self):
+        """ساخت snapshot تازه؛ خواننده‌های snapshot قبلی تا پایان کارشان از همان استفاده می‌کنند"""
+        started = time.perf_counter()
+        snapshot = sqlite3.connect(':memory:', check_same_thread=False)
+        snapshot.row_factory = sqlite3.Row
+        source = self._connect_ro()
+        try:
+            source.backup(snapshot)
+        finally:
+            source.close()
+        self._snapshot = snapshot
+        self._snapshot_at = time.monotonic()
+        self.refreshes += 1
+        self.last_refresh_ms = (time.perf_counter() - started) * 1000
+        logger.debug(f"Read snapshot refreshed in {self.last_refresh_ms:.1f} ms")
+        return snapshot
+
+    def age_seconds(self):
+        """کهنگی داده خوانده‌شده؛ در حالت‌های ro و primary صفر است"""
+        if self.mode != 'snapshot' or self._snapshot is None:
+            return 0.0
+        return time.monotonic() - self._snapshot_at
+
+    def snapshot_bytes(self):
+        """حجم کپی درون‌حافظه‌ای (فقط حالت snapshot)"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            return 0
+        page_count = snapshot.execute('PRAGMA page_count').fetchone()[0]
+        return page_count * snapshot.execute('PRAGMA page_size').fetchone()[0]
+
+    def stats(self):
+        return {
+            'mode': self.mode,
+            'reads': self.reads,
+            'refreshes': self.refreshes,
+            'last_refresh_ms': round(self.last_refresh_ms, 1),
+            'age_seconds': round(self.age_seconds(), 1),
+            'max_age_seconds': self.max_age_seconds,
+        }
@@ -0,0 +1,152 @@
+"""مسیریابی جدول‌محور callback_data دکمه‌ها
+
+بنچمارک مسیریابی و ساخت کیبوردها در برابر زنجیره if/elif و ساخت دوباره کیبورد:
+    python router.py --iterations 100000
+"""
+import time
+import logging
+import argparse
+
+logger = logging.getLogger(__name__)
+
+# نوع اجرای هر مسیر:
+# FAST در همان thread وب‌هوک اجرا می‌شود (بدون دیتابیس)، DEFERRED به executor پس‌زمینه می‌رود
+FAST = 'fast'
+DEFERRED = 'deferred'
+
+class Route:
+    __slots__ = ('key', 'handler', 'mode', 'user', 'owner_only', 'param', 'parse')
+
+    def __init__(self, key, handler, mode, user, owner_only, param, parse):
+        self.key = key
+        self.handler = handler
+        self.mode = mode
+        self.user = user  # شناسه کاربر به عنوان آرگومان سوم
+        self.owner_only = owner_only
+        self.param = param  # نام آرگومان کلیدی مقدار استخراج‌شده از مسیر پیشوندی
+        self.parse = parse
+
+class CallbackRouter:
+    """نگاشت callback_data به هندلر با یک جستجوی dict
+
+    مسیرهای دقیق مستقیماً با data پیدا می‌شوند. مسیرهای پیشوندی بر اساس طول پیشوند
+    گروه‌بندی شده‌اند، پس هر طول فقط یک جستجوی dict روی data[:length] است. هندلر به
+    صورت handler(update, context[, user_id][, param=parse(data)]) صدا زده می‌شود.
+    """
+
+    def __init__(self, owner_id):
+        self.owner_id = owner_id
+        self.routes = {}
+        self.prefixes = {}
+        self._prefix_lengths = ()
+        # ترتیب ثبت، فقط برای بنچمارک زنجیره if/elif
+        self.order = []
+
+    def route(self, key, handler, mode=DEFERRED, user=False, owner_only=False):
+        route = Route(key, handler, mode, user, owner_only, None, None)
+        self.routes[key] = route
+        self.order.append(route)
+        return route
+
+    def prefix(self, prefix, handler, mode=DEFERRED, user=False, owner_only=False, param=None, parse=None):
+        """parse(data) مقدار آرگومان param را از data می‌سازد (پیش‌فرض: خود data)"""
+        route = Route(prefix, handler, mode, user, owner_only, param, parse)
+        self.prefixes[prefix] = route
+        self.order.append(route)
+        # پیشوندهای بلندتر اول، مثل ترتیب شرط‌های if/elif
+        self._prefix_lengths = tuple(sorted({len(p) for p in self.prefixes}, reverse=True))
+        return route
+
+    def resolve(self, data):
+        """مسیر مربوط به data یا None"""
+        route = self.routes.get(data)
+        if route is not None:
+            return route
+        for length in self._prefix_lengths:
+            route = self.prefixes.get(data[:length])
+            if route is not None:
+                return route
+        return None
+
+    def mode(self, data):
+        """نوع اجرای یک callback؛ مسیرهای ناشناخته معوق اجرا می‌شوند"""
+        route = self.resolve(data)
+        return route.mode if route is not None else DEFERRED
+
+    def dispatch(self, update, context, user_id, data):
+        """اجرای هندلر؛ False اگر مسیری نباشد یا کاربر اجازه نداشته باشد"""
+        route = self.resolve(data)
+        if route is None:
+            logger.debug(f"No route for callback {data!r}")
+            return False
+        if route.owner_only and user_id != self.owner_id:
+            return False
+
+        args = (update, context, user_id) if route.user else (update, context)
+        if route.param is None:
+            route.handler(*args)
+        else:
+            value = route.parse(data) if route.parse else data
+            route.handler(*args, **{route.param: value})
+        return True
+
+    def __len__(self):
+        return len(self.routes) + len(self.prefixes)
+
+def linear_resolve(router, data):
+    """همان تطبیق زنجیره if/elif قبلی: مقایسه به ترتیب ثبت تا اولین تطابق"""
+    for route in router.order:
+        if router.routes.get(route.key) is route:
+            if data == route.key:
+                return route
+        elif data.startswith(route.key):
+            return route
+    return None
+
+def _per_call_ns(func, items, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations // len(items)):
+        for item in items:
+            func(item)
+    return (time.perf_counter() - started) / (iterations // len(items) * len(items)) * 1e9
+
+def bench(iterations=100000):
+    """هزینه هر callback: مسیریابی (dict در برابر زنجیره) و ساخت کیبورد (ثابت در برابر دوباره)"""
+    import os
+    os.environ.setdefault('STARTUP_MODE', 'lazy')
+    import main
+
+    main.load_telegram()
+    router = main.router
+    samples = list(router.routes) + [
+        'rk:n:11:150:3', 'al:n:11:42', 'ac:n:11:7', 'assign_country_7', 'unknown_callback',
+    ]
+    for data in samples:
+        assert linear_resolve(router, data) is router.resolve(data), data
+
+    dashboard_buttons = lambda: main.create_inline_keyboard([
+        main.InlineKeyboardButton(text, callback_data=data) for text, data in main.DASHBOARD_BUTTONS
+    ], columns=2)
+    report = {
+        'routes': len(router.order),
+        'resolve_ns': {
+            'if_elif_chain': round(_per_call_ns(lambda d: linear_resolve(router, d), samples, iterations), 1),
+            'dict_router': round(_per_call_ns(router.resolve, samples, iterations), 1),
+        },
+    }
+    keyboard_iterations = max(iterations // 10, 1)
+    report['dashboard_keyboard_us'] = {
+        'rebuilt': round(_per_call_ns(lambda _: dashboard_buttons(), [None], keyboard_iterations) / 1000, 2),
+        'prebuilt': round(_per_call_ns(lambda _: main.DASHBOARD_KEYBOARD, [None], keyboard_iterations) / 1000, 2),
+        # سریال‌سازی برای ارسال در هر دو حالت لازم است
+        'to_dict': round(_per_call_ns(lambda _: main.DASHBOARD_KEYBOARD.to_dict(), [None], keyboard_iterations) / 1000, 2),
+    }
+    return report
+
+if __name__ == '__main__':
+    import json
+
+    parser = argparse.ArgumentParser(description='Benchmark callback routing and keyboard rendering')
+    parser.add_argument('--iterations', type=int, default=100000)
+    args = parser.parse_args()
+    print(json.dumps(bench(args.iterations), indent=2))
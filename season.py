@@ -0,0 +1,185 @@
+import os
+import time
+import sqlite3
+import logging
+from datetime import datetime
+from config import ARCHIVE_DIR, TEMPLATE_DB_NAME
+from migrations import MIGRATIONS, migrate, get_version
+from counters import recount
+
+logger = logging.getLogger(__name__)
+
+# جداولی که از الگو بازسازی می‌شوند
+WORLD_TABLES = ('countries', 'resources', 'army')
+# نقشه مناطق و جدول فاصله همراه جهان از الگو می‌آیند
+MAP_TABLES = ('region_adjacency', 'region_distance')
+
+class SeasonEngine:
+    """بایگانی فصل با backup API و بازسازی جهان از دیتابیس الگو در یک تراکنش"""
+
+    def __init__(self, db, archive_dir=ARCHIVE_DIR, template_path=TEMPLATE_DB_NAME):
+        self.db = db
+        self.archive_dir = archive_dir
+        self.template_path = template_path
+
+    def ensure_template(self):
+        """ساخت دیتابیس الگو (جهان تازه) فقط اگر وجود ندارد
+
+        الگوی موجود (مثلا جهان worldgen) دور ریخته نمی‌شود؛ اگر نسخه آن قدیمی باشد
+        مهاجرت‌های باقی‌مانده روی همان فایل اجرا می‌شوند.
+        """
+        if os.path.exists(self.template_path):
+            conn = sqlite3.connect(self.template_path)
+            try:
+                if get_version(conn) != len(MIGRATIONS):
+                    migrate(conn)
+                    logger.info(f"Season template migrated in place at {self.template_path}")
+                return self.template_path
+            finally:
+                conn.close()
+
+        # ساخت در فایل موقت و جایگزینی اتمیک
+        tmp_path = f"{self.template_path}.tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        conn = sqlite3.connect(tmp_path)
+        try:
+            migrate(conn)
+            # هر کشور با منابع و ارتش اولیه شروع می‌کند
+            conn.execute('INSERT OR IGNORE INTO resources (country_id) SELECT id FROM countries')
+            conn.execute('INSERT OR IGNORE INTO army (country_id) SELECT id FROM countries')
+            conn.commit()
+        finally:
+            conn.close()
+        os.replace(tmp_path, self.template_path)
+        logger.info(f"Season template rebuilt at {self.template_path}")
+        return self.template_path
+
+    def archive(self, label):
+        """کپی کامل دیتابیس زنده در فایل بایگانی با backup API"""
+        os.makedirs(self.archive_dir, exist_ok=True)
+        path = os.path.join(
+            self.archive_dir, f"season_{label}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db"
+        )
+        started = time.perf_counter()
+        target = sqlite3.connect(path)
+        try:
+            # تغییرات نیمه‌کاره thread دیگری روی اتصال مشترک در بایگانی نمی‌آیند
+            with self.db.lock:
+                self.db.conn.backup(target)
+        finally:
+            target.close()
+        logger.info(f"Archived season {label} to {path} in {(time.perf_counter() - started) * 1000:.1f} ms")
+        return path
+
+    def _columns(self, table):
+        return [row[1] for row in self.db.conn.execute(f'PRAGMA main.table_info({table})')]
+
+    def _rebuild_world(self, cursor, keep_players):
+        """بازسازی کشورها، منابع، ارتش و نقشه مناطق از الگو با INSERT ... SELECT"""
+        for table in ('alliances', 'events', 'resources', 'army'):
+            cursor.execute(f'DELETE FROM {table}')
+
+        if keep_players:
+            # کشورها و کنترل‌کننده‌ها حفظ می‌شوند؛ فقط کشورهای تازه الگو اضافه می‌شوند
+            tables = ('resources', 'army')
+            columns = ', '.join(self._columns('countries'))
+            cursor.execute(f'''
+            INSERT OR IGNORE INTO countries ({columns})
+            SELECT {columns} FROM template.countries
+            ''')
+        else:
+            tables = WORLD_TABLES
+            # وضعیت گفتگوها (کشور انتخاب‌شده، انتظار پیام همگانی) هم با ریست کامل پاک می‌شود
+            for table in ('players', 'countries', 'seasons', 'country_history', 'persistence_data'):
+                cursor.execute(f'DELETE FROM {table}')
+
+        for table in tables:
+            columns = ', '.join(self._columns(table))
+            cursor.execute(f'''
+            INSERT INTO {table} ({columns})
+            SELECT {columns} FROM template.{table}
+            ''')
+
+        if keep_players:
+            # کشورهای زنده‌ای که در الگو نیستند (مثل جهان worldgen با الگوی قدیمی) منابع و ارتش اولیه می‌گیرند
+            for table in ('resources', 'army'):
+                cursor.execute(f'INSERT OR IGNORE INTO main.{table} (country_id) SELECT id FROM main.countries')
+
+        self._copy_map(cursor, keep_players)
+
+    def _copy_map(self, cursor, keep_players):
+        """نقشه الگو جایگزین نقشه زنده می‌شود (WorldMap.sync فقط هنگام راه‌اندازی اجرا می‌شود)
+
+        با حفظ بازیکنان، اگر منطقه کشوری در نقشه الگو نباشد نقشه زنده نگه داشته می‌شود
+        تا آن کشورها بدون جدول فاصله نمانند.
+        """
+        if keep_players:
+            missing = cursor.execute('''
+            SELECT COUNT(*) FROM (SELECT DISTINCT region FROM main.countries WHERE region IS NOT NULL) r
+            WHERE NOT EXISTS (
+                SELECT 1 FROM template.region_distance d
+                WHERE d.from_region = r.region AND d.distance = 0 AND d.to_region = r.region
+            )
+            ''').fetchone()[0]
+            if missing:
+                logger.info(f"World map kept: {missing} live regions are not in the template map")
+                return
+
+        for table in MAP_TABLES:
+            columns = ', '.join(self._columns(table))
+            cursor.execute(f'DELETE FROM main.{table}')
+            cursor.execute(f'''
+            INSERT INTO main.{table} ({columns})
+            SELECT {columns} FROM template.{table}
+            ''')
+
+    def _run_swap(self, keep_players, season_number=None):
+        # کل جابه‌جایی (commit، ATTACH و تراکنش) روی اتصال مشترک بدون دخالت هندلرها
+        with self.db.lock:
+            template = self.ensure_template()
+            conn = self.db.conn
+            started = time.perf_counter()
+
+            # ATTACH نمی‌تواند داخل تراکنش باشد
+            conn.commit()
+            conn.execute('ATTACH DATABASE ? AS template', (template,))
+            try:
+                cursor = conn.cursor()
+                cursor.execute('BEGIN IMMEDIATE')
+                try:
+                    self._rebuild_world(cursor, keep_players)
+                    if season_number is not None:
+                        cursor.execute('''
+                        UPDATE seasons SET is_active = 0, end_date = COALESCE(end_date, CURRENT_TIMESTAMP)
+                        WHERE is_active = 1
+                        ''')
+                        cursor.execute('''
+                        INSERT INTO seasons (season_number, start_date, is_active)
+                        VALUES (?, CURRENT_TIMESTAMP, 1)
+                        ''', (season_number,))
+                    # تعداد بازیکنان و کشورها پس از بازسازی دوباره شمرده می‌شود
+                    values = recount(cursor)
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+            finally:
+                conn.execute('DETACH DATABASE template')
+            self.db.counters.apply(values=values)
+
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            logger.info(f"World rebuilt from template in {elapsed_ms:.1f} ms (keep_players={keep_players})")
+            return elapsed_ms
+
+    def rollover(self, next_season):
+        """پایان فصل جاری: بایگانی، بازنشانی جهان با حفظ بازیکنان و شروع فصل بعد"""
+        archive_path = self.archive(f"{next_season - 1}") if next_season > 1 else None
+        self._run_swap(keep_players=True, season_number=next_season)
+        return archive_path
+
+    def reset(self):
+        """ریست کامل بازی؛ نسخه فعلی قبل از پاک شدن بایگانی می‌شود"""
+        archive_path = self.archive("reset")
+        self._run_swap(keep_players=False)
+        return archive_path
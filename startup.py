@@ -0,0 +1,42 @@
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+class StartupTracker:
+    """زمان‌سنجی مراحل راه‌اندازی worker و وضعیت آمادگی"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}  # نام مرحله -> میلی‌ثانیه
+        self.ready = threading.Event()
+        self.error = None
+        self.total_ms = None
+
+    @contextmanager
+    def phase(self, name):
+        """اندازه‌گیری و لاگ مدت یک مرحله راه‌اندازی"""
+        phase_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_ms = (time.perf_counter() - phase_start) * 1000
+            self.phases[name] = round(elapsed_ms, 1)
+            logger.info(f"Startup phase '{name}' took {elapsed_ms:.1f} ms")
+
+    def mark_ready(self, error=None):
+        self.error = error
+        self.total_ms = round((time.perf_counter() - self.started) * 1000, 1)
+        self.ready.set()
+        logger.info(f"Worker boot finished in {self.total_ms} ms (error: {error})")
+
+    def status(self):
+        """وضعیت برای endpoint آمادگی"""
+        return {
+            'ready': self.ready.is_set() and self.error is None,
+            'phases_ms': dict(self.phases),
+            'total_ms': self.total_ms,
+            'error': self.error,
+        }
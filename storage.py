@@ -0,0 +1,550 @@
+import os
+import logging
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from collections import deque
+from datetime import datetime
+from config import ANCIENT_COUNTRIES, INITIAL_RESOURCES, INITIAL_ARMY, REGION_ADJACENCY
+from world import normalize_adjacency, region_distances, write_map
+from models import Country, Resources, Army, Alliance
+
+logger = logging.getLogger(__name__)
+
+# ستون‌های مجاز برای ساخت کوئری‌های پویا
+RESOURCE_COLUMNS = ('gold', 'iron', 'stone', 'food')
+ARMY_COLUMNS = ('level', 'infantry', 'cavalry', 'archers', 'defense', 'power')
+
+class Storage(ABC):
+    """عملیات ذخیره‌سازی که GameLogic و Advisor به آن‌ها وابسته‌اند
+
+    Database (SQLite) و MemoryStorage (درون‌حافظه) هر دو این رابط را پیاده می‌کنند؛ پیاده‌سازی ناقص
+    هنگام ساخت شیء (نه هنگام فراخوانی) TypeError می‌دهد.
+    ردیف‌ها با row['key'] خوانده می‌شوند (sqlite3.Row یا dict).
+    """
+
+    # خواندن وضعیت
+    @abstractmethod
+    def get_country_by_id(self, country_id): ...
+    @abstractmethod
+    def get_player_country(self, user_id): ...
+    @abstractmethod
+    def get_ai_countries(self): ...
+    @abstractmethod
+    def get_all_players(self): ...
+    @abstractmethod
+    def get_country_resources(self, country_id): ...
+    @abstractmethod
+    def get_country_army(self, country_id): ...
+
+    # بازیکنان و فصل‌ها
+    @abstractmethod
+    def assign_country_to_player(self, country_id, user_id, username, full_name): ...
+    @abstractmethod
+    def get_active_season(self): ...
+    @abstractmethod
+    def start_new_season(self, season_number): ...
+    @abstractmethod
+    def end_season(self, season_id, winner_country_id, winner_player_id): ...
+
+    # تغییر منابع و ارتش
+    @abstractmethod
+    def update_resources(self, country_id, resources_dict): ...
+    @abstractmethod
+    def spend(self, country_id, cost, army_effect=None, army_guard=None): ...
+
+    def upgrade_army_level(self, country_id, cost, expected_level=None):
+        """ارتقای سطح ارتش؛ اگر منابع کافی نباشد یا سطح تغییر کرده باشد False"""
+        return self.spend(
+            country_id,
+            cost,
+            army_effect={'level': 1, 'power': 50, 'defense': 20},
+            army_guard={'level': expected_level} if expected_level is not None else None,
+        )
+
+    # AI، اتحادها و رویدادها
+    @abstractmethod
+    def get_attack_targets(self, country_id, max_power, reach, limit=3): ...
+    @abstractmethod
+    def add_event(self, event_type, country_id, target_country_id, description): ...
+    @abstractmethod
+    def get_alliance_candidates(self, country_id, limit=2): ...
+    @abstractmethod
+    def create_alliance(self, country1_id, country2_id, relation_type='ALLIANCE'): ...
+    @abstractmethod
+    def get_allies(self, country_id): ...
+    @abstractmethod
+    def betray_alliance(self, country_id, ally_id, description): ...
+    @abstractmethod
+    def count_alliances(self, country_id): ...
+    @abstractmethod
+    def get_strongest_enemy(self, country_id): ...
+    @abstractmethod
+    def get_weak_target(self, country_id, reach, ratio): ...
+    @abstractmethod
+    def get_ai_priorities(self, reach): ...
+
+    # نقشه جهان
+    @abstractmethod
+    def get_region_distance(self, country_id, target_id): ...
+    @abstractmethod
+    def get_region_adjacency(self): ...
+    @abstractmethod
+    def get_regions(self): ...
+    @abstractmethod
+    def replace_world_map(self, adjacency): ...
+
+    def close(self):
+        pass
+
+def _timestamp():
+    # همان قالب CURRENT_TIMESTAMP در SQLite
+    return datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+
+class MemoryStorage(Storage):
+    """موتور ذخیره‌سازی کاملاً درون‌حافظه برای شبیه‌سازی، بنچمارک و استقرارهای کوچک
+
+    داده‌ها در dictها نگه داشته می‌شوند و مسیر داغ هیچ I/O دیسکی ندارد. اگر persist_path
+    داده شود، وضعیت از آن فایل SQLite بارگذاری و هر persist_interval ثانیه (در صورت تغییر)
+    با همان schema در آن ذخیره می‌شود.
+
+    نوشتن‌ها self.lock را می‌گیرند؛ خواندن‌ها بدون قفل روی کپی list(...) از dictها پیمایش
+    می‌کنند تا درج هم‌زمان خطای «dictionary changed size during iteration» ندهد.
+
+    مسیر داغ AI با ایندکس‌ها کار می‌کند، نه پیمایش همه کشورها: reach (منطقه مبدأ -> {مقصد: فاصله})،
+    humans (منطقه -> کشورهای انسانی) و links (کشور -> کلید اتحادهایش).
+    """
+
+    def __init__(self, persist_path=None, persist_interval=0, max_events=10000):
+        self.persist_path = persist_path
+        self.persist_interval = persist_interval
+        self.lock = threading.RLock()
+        self.countries = {}
+        self.resources = {}
+        self.army = {}
+        self.players = {}
+        self.alliances = {}  # (country1_id, country2_id) -> ردیف؛ همیشه country1_id < country2_id
+        self.seasons = []
+        self.events = deque(maxlen=max_events)
+        self._ids = {'alliances': 0, 'seasons': 0, 'events': 0}
+        self.adjacency = normalize_adjacency(REGION_ADJACENCY)
+        self.reach = {}
+        self.humans = {}
+        self.links = {}
+        self.country_ids = []
+        self.dirty = False
+        self.saves = 0
+        self._stop = threading.Event()
+        self._saver = None
+
+        if persist_path and os.path.exists(persist_path):
+            self.load(persist_path)
+        else:
+            self._seed()
+            self._build_indexes()
+
+        if persist_path and persist_interval > 0:
+            self._saver = threading.Thread(target=self._autosave, name='memory-storage-save', daemon=True)
+            self._saver.start()
+
+    # ---------- بارگذاری و ذخیره ----------
+
+    def _seed(self):
+        """جهان تازه: کشورهای باستانی با منابع و ارتش اولیه"""
+        now = _timestamp()
+        for c in ANCIENT_COUNTRIES:
+            self.countries[c['id']] = {
+                'id': c['id'], 'name': c['name'], 'controller': 'AI', 'player_id': None,
+                'specialty': c['specialty'], 'color': c['color'], 'is_active': 1,
+                'region': c['region'],
+            }
+            self.resources[c['id']] = dict(INITIAL_RESOURCES, country_id=c['id'], last_update=now)
+            self.army[c['id']] = dict(INITIAL_ARMY, country_id=c['id'], last_training=now)
+
+    def _compute_distances(self):
+        """ایندکس فاصله به تفکیک منطقه مبدأ (هنگام بارگذاری و تغییر نقشه)"""
+        reach = {}
+        for (source, to), distance in region_distances(self.adjacency).items():
+            reach.setdefault(source, {})[to] = distance
+        for country in self.countries.values():
+            region = country.get('region')
+            if region is not None:
+                reach.setdefault(region, {}).setdefault(region, 0)
+        self.reach = reach
+
+    def _index(self, index, key, value):
+        index.setdefault(key, set()).add(value)
+
+    def _build_indexes(self):
+        self._compute_distances()
+        # کشورها فقط هنگام بارگذاری اضافه می‌شوند؛ پیمایش‌های با توقف زودهنگام از این فهرست ثابت می‌خوانند
+        self.country_ids = sorted(self.countries)
+        self.humans = {}
+        for country in self.countries.values():
+            if country['controller'] == 'HUMAN':
+                self._index(self.humans, country.get('region'), country['id'])
+        self.links = {}
+        for key in self.alliances:
+            self._index(self.links, key[0], key)
+            self._index(self.links, key[1], key)
+
+    def _next_id(self, table):
+        self._ids[table] += 1
+        return self._ids[table]
+
+    def load(self, path):
+        from migrations import migrate
+        conn = sqlite3.connect(path)
+        conn.row_factory = sqlite3.Row
+        try:
+            migrate(conn)
+            with self.lock:
+                self.countries = {r['id']: dict(r) for r in conn.execute('SELECT * FROM countries')}
+                self.resources = {r['country_id']: dict(r) for r in conn.execute('SELECT * FROM resources')}
+                self.army = {r['country_id']: dict(r) for r in conn.execute('SELECT * FROM army')}
+                self.players = {r['user_id']: dict(r) for r in conn.execute('SELECT * FROM players')}
+                self.alliances = {
+                    (r['country1_id'], r['country2_id']): dict(r) for r in conn.execute('SELECT * FROM alliances')
+                }
+                self.seasons = [dict(r) for r in conn.execute('SELECT * FROM seasons ORDER BY id')]
+                self.events.clear()
+                self.events.extend(dict(r) for r in conn.execute(
+                    'SELECT * FROM (SELECT * FROM events ORDER BY id DESC LIMIT ?) ORDER BY id',
+                    (self.events.maxlen,)
+                ))
+                self.adjacency = [tuple(r) for r in conn.execute('SELECT region_a, region_b FROM region_adjacency')]
+                for table, rows in (('alliances', self.alliances.values()), ('seasons', self.seasons), ('events', self.events)):
+                    self._ids[table] = max((r['id'] for r in rows), default=0)
+                self._build_indexes()
+                self.dirty = False
+        finally:
+            conn.close()
+        logger.info(f"Memory storage loaded from {path}: {len(self.countries)} countries")
+
+    def persist(self, path=None):
+        """ذخیره کامل وضعیت در یک فایل SQLite (فایل موقت و جایگزینی اتمیک)"""
+        from migrations import migrate
+        from counters import recount
+        path = path or self.persist_path
+        with self.lock:
+            tables = {
+                'countries': [dict(r) for r in self.countries.values()],
+                'resources': [dict(r) for r in self.resources.values()],
+                'army': [dict(r) for r in self.army.values()],
+                'players': [dict(r) for r in self.players.values()],
+                'alliances': [dict(r) for r in self.alliances.values()],
+                'seasons': [dict(r) for r in self.seasons],
+                'events': [dict(r) for r in self.events],
+            }
+            adjacency = list(self.adjacency)
+            dirty, self.dirty = self.dirty, False
+
+        tmp_path = f"{path}.tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        conn = sqlite3.connect(tmp_path)
+        try:
+            migrate(conn)
+            cursor = conn.cursor()
+            for table, rows in tables.items():
+                cursor.execute(f'DELETE FROM {table}')
+                if rows:
+                    columns = sorted({column for row in rows for column in row})
+                    cursor.executemany(
+                        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+                        [[row.get(column) for column in columns] for row in rows]
+                    )
+            write_map(cursor, adjacency, [r.get('region') for r in tables['countries']])
+            recount(cursor)
+            conn.commit()
+        except Exception:
+            # تغییرات ذخیره‌نشده در نوبت بعد دوباره نوشته می‌شوند
+            self.dirty = self.dirty or dirty
+            raise
+        finally:
+            conn.close()
+        os.replace(tmp_path, path)
+        self.saves += 1
+        return path
+
+    def _autosave(self):
+        while not self._stop.wait(self.persist_interval):
+            if self.dirty:
+                try:
+                    self.persist()
+                except Exception as e:
+                    logger.error(f"Memory storage save failed: {e}")
+
+    def close(self):
+        self._stop.set()
+        if self._saver is not None:
+            self._saver.join()
+        if self.persist_path and self.dirty:
+            self.persist()
+
+    # ---------- خواندن وضعیت ----------
+
+    def get_country_by_id(self, country_id):
+        country = self.countries.get(country_id)
+        return Country.from_mapping(country) if country else None
+
+    def get_player_country(self, user_id):
+        player = self.players.get(user_id)
+        if not player or not player['is_active']:
+            return None
+        return self.get_country_by_id(player['country_id'])
+
+    def get_ai_countries(self):
+        return [Country.from_mapping(c) for _, c in sorted(self.countries.items())
+                if c['controller'] == 'AI' and c['is_active']]
+
+    def get_all_players(self):
+        return [dict(p, country_name=self.countries[p['country_id']]['name'])
+                for p in list(self.players.values())
+                if p['is_active'] and p['country_id'] in self.countries]
+
+    def get_country_resources(self, country_id):
+        row = self.resources.get(country_id)
+        return Resources.from_mapping(row) if row else None
+
+    def get_country_army(self, country_id):
+        row = self.army.get(country_id)
+        return Army.from_mapping(row) if row else None
+
+    # ---------- بازیکنان و فصل‌ها ----------
+
+    def assign_country_to_player(self, country_id, user_id, username, full_name):
+        with self.lock:
+            country = self.countries.get(country_id)
+            if not country or country['controller'] != 'AI':
+                return False
+            now = _timestamp()
+            self.players[user_id] = {
+                'user_id': user_id, 'username': username, 'full_name': full_name,
+                'country_id': country_id, 'joined_date': now, 'is_active': 1,
+            }
+            country['controller'] = 'HUMAN'
+            country['player_id'] = user_id
+            self._index(self.humans, country.get('region'), country_id)
+            self.resources[country_id] = dict(INITIAL_RESOURCES, country_id=country_id, last_update=now)
+            self.army[country_id] = dict(INITIAL_ARMY, country_id=country_id, last_training=now)
+            self.dirty = True
+            return True
+
+    def get_active_season(self):
+        for season in self.seasons:
+            if season['is_active']:
+                return dict(season)
+        return None
+
+    def start_new_season(self, season_number):
+        with self.lock:
+            for season in self.seasons:
+                season['is_active'] = 0
+            self.seasons.append({
+                'id': self._next_id('seasons'), 'season_number': season_number,
+                'start_date': _timestamp(), 'end_date': None,
+                'winner_country_id': None, 'winner_player_id': None, 'is_active': 1,
+            })
+            self.dirty = True
+
+    def end_season(self, season_id, winner_country_id, winner_player_id):
+        with self.lock:
+            for season in self.seasons:
+                if season['id'] == season_id:
+                    season.update(
+                        end_date=_timestamp(), winner_country_id=winner_country_id,
+                        winner_player_id=winner_player_id, is_active=0,
+                    )
+            self.dirty = True
+
+    # ---------- تغییر منابع و ارتش ----------
+
+    def update_resources(self, country_id, resources_dict):
+        with self.lock:
+            row = self.resources.get(country_id)
+            if row is None:
+                return
+            for key, value in resources_dict.items():
+                if key not in RESOURCE_COLUMNS:
+                    raise ValueError(f"Unknown column: {key}")
+                row[key] += value
+            row['last_update'] = _timestamp()
+            self.dirty = True
+
+    def spend(self, country_id, cost, army_effect=None, army_guard=None):
+        """همان قرارداد Database.spend: همه یا هیچ، زیر یک قفل"""
+        cost = {key: value for key, value in cost.items() if value}
+        army_effect = army_effect or {}
+        army_guard = army_guard or {}
+        for key in list(cost) + list(army_effect) + list(army_guard):
+            if key not in RESOURCE_COLUMNS and key not in ARMY_COLUMNS:
+                raise ValueError(f"Unknown column: {key}")
+
+        with self.lock:
+            resources = self.resources.get(country_id)
+            army = self.army.get(country_id)
+            if cost and (resources is None or any(resources[key] < value for key, value in cost.items())):
+                return False
+            if (army_effect or army_guard) and (
+                    army is None or any(army[key] != value for key, value in army_guard.items())):
+                return False
+
+            now = _timestamp()
+            if cost:
+                for key, value in cost.items():
+                    resources[key] -= value
+                resources['last_update'] = now
+            if army_effect or army_guard:
+                for key, value in army_effect.items():
+                    army[key] += value
+                army['last_training'] = now
+            self.dirty = True
+            return True
+
+    # ---------- AI، اتحادها و رویدادها ----------
+
+    def _reachable(self, region, reach):
+        return [to for to, d in self.reach.get(region, {}).items() if d <= reach]
+
+    def get_attack_targets(self, country_id, max_power, reach, limit=3):
+        if country_id not in self.countries:
+            return []
+        targets = []
+        for region in self._reachable(self.countries[country_id].get('region'), reach):
+            for target_id in list(self.humans.get(region, ())):
+                army = self.army.get(target_id)
+                if target_id != country_id and army is not None and army['power'] < max_power:
+                    targets.append({'country_id': target_id, 'power': army['power'],
+                                    'name': self.countries[target_id]['name']})
+        targets.sort(key=lambda t: t['power'])
+        return targets[:limit]
+
+    def add_event(self, event_type, country_id, target_country_id, description):
+        with self.lock:
+            event_id = self._next_id('events')
+            self.events.append({
+                'id': event_id, 'event_type': event_type, 'country_id': country_id,
+                'target_country_id': target_country_id, 'description': description,
+                'resources_change': None, 'army_change': None, 'event_date': _timestamp(),
+            })
+            self.dirty = True
+            return event_id
+
+    def get_alliance_candidates(self, country_id, limit=2):
+        candidates = []
+        for candidate_id in self.country_ids:
+            c = self.countries[candidate_id]
+            if c['controller'] != 'AI' or c['id'] == country_id:
+                continue
+            if (min(country_id, c['id']), max(country_id, c['id'])) in self.alliances:
+                continue
+            candidates.append(Country.from_mapping(c))
+            if len(candidates) >= limit:
+                break
+        return candidates
+
+    def create_alliance(self, country1_id, country2_id, relation_type='ALLIANCE'):
+        key = (min(country1_id, country2_id), max(country1_id, country2_id))
+        with self.lock:
+            if key in self.alliances:
+                # همان قید UNIQUE جدول alliances
+                raise sqlite3.IntegrityError('UNIQUE constraint failed: alliances.country1_id, alliances.country2_id')
+            self.alliances[key] = {
+                'id': self._next_id('alliances'), 'country1_id': key[0], 'country2_id': key[1],
+                'relation_type': relation_type, 'strength': 50, 'created_date': _timestamp(),
+            }
+            self._index(self.links, key[0], key)
+            self._index(self.links, key[1], key)
+            self.dirty = True
+
+    def _relations(self, country_id, relation_type):
+        for a, b in list(self.links.get(country_id, ())):
+            if self.alliances[(a, b)]['relation_type'] == relation_type:
+                other = b if a == country_id else a
+                if other in self.countries:
+                    yield self.countries[other]
+
+    def get_allies(self, country_id):
+        allies = []
+        for key in list(self.links.get(country_id, ())):
+            alliance = self.alliances[key]
+            if alliance['relation_type'] == 'ALLIANCE' and key[0] in self.countries and key[1] in self.countries:
+                allies.append(Alliance.from_mapping(dict(
+                    alliance, country1=self.countries[key[0]]['name'], country2=self.countries[key[1]]['name']
+                )))
+        return allies
+
+    def betray_alliance(self, country_id, ally_id, description):
+        with self.lock:
+            alliance = self.alliances.get((min(country_id, ally_id), max(country_id, ally_id)))
+            if alliance is not None:
+                alliance['relation_type'] = 'WAR'
+            self.add_event('BETRAYAL', country_id, ally_id, description)
+
+    def count_alliances(self, country_id):
+        return sum(1 for _ in self._relations(country_id, 'ALLIANCE'))
+
+    def get_strongest_enemy(self, country_id):
+        enemies = [
+            {'name': c['name'], 'power': self.army[c['id']]['power']}
+            for c in self._relations(country_id, 'WAR') if c['id'] in self.army
+        ]
+        return max(enemies, key=lambda e: e['power'], default=None)
+
+    def get_weak_target(self, country_id, reach, ratio):
+        own = self.army.get(country_id)
+        if own is None:
+            return None
+        targets = self.get_attack_targets(country_id, own['power'] * ratio, reach, limit=1)
+        return {'name': targets[0]['name'], 'power': targets[0]['power']} if targets else None
+
+    def get_ai_priorities(self, reach):
+        wars = {}
+        for (a, b), alliance in list(self.alliances.items()):
+            if alliance['relation_type'] == 'WAR':
+                wars[a] = wars.get(a, 0) + 1
+                wars[b] = wars.get(b, 0) + 1
+        # قوی‌ترین کشور انسانی در دسترس هر منطقه
+        rivals = {}
+        for region, humans in list(self.humans.items()):
+            power = max((self.army[h]['power'] for h in list(humans) if h in self.army), default=None)
+            if power is None:
+                continue
+            for to in self._reachable(region, reach):
+                rivals[to] = max(rivals.get(to, 0), power)
+
+        rows = []
+        for country_id, c in sorted(self.countries.items()):
+            if c['controller'] != 'AI' or not c['is_active']:
+                continue
+            resources = self.resources.get(country_id, {})
+            army = self.army.get(country_id, {})
+            rows.append({
+                'id': country_id, 'food': resources.get('food'), 'gold': resources.get('gold'),
+                'power': army.get('power'), 'wars': wars.get(country_id, 0),
+                'rival_power': rivals.get(c.get('region')),
+            })
+        return rows
+
+    # ---------- نقشه جهان ----------
+
+    def get_region_distance(self, country_id, target_id):
+        source = self.countries.get(country_id)
+        target = self.countries.get(target_id)
+        if not source or not target:
+            return None
+        return self.reach.get(source.get('region'), {}).get(target.get('region'))
+
+    def get_region_adjacency(self):
+        return sorted(tuple(pair) for pair in self.adjacency)
+
+    def get_regions(self):
+        return {c['region'] for c in list(self.countries.values()) if c.get('region') is not None}
+
+    def replace_world_map(self, adjacency):
+        with self.lock:
+            self.adjacency = normalize_adjacency(adjacency)
+            self._compute_distances()
+            self.dirty = True
+            return sum(len(targets) for targets in self.reach.values())
@@ -0,0 +1,96 @@
+import time
+import threading
+from telegram.ext import ExtBot
+from telegram.utils.request import Request
+from config import (
+    BOT_TOKEN, TELEGRAM_API_BASE_URL, TELEGRAM_CONNECT_TIMEOUT,
+    TELEGRAM_READ_TIMEOUT, TELEGRAM_ENDPOINT_TIMEOUTS, TELEGRAM_POOL_SIZE,
+    WEB_THREADS, DEFERRED_WORKERS, PTB_WORKERS, SERVE_MODE, ASYNC_HANDLER_WORKERS
+)
+
+def default_pool_size():
+    """اندازه pool: هر thread که ممکن است هم‌زمان Bot API را صدا بزند یک اتصال"""
+    if TELEGRAM_POOL_SIZE > 0:
+        return TELEGRAM_POOL_SIZE
+    # threadهای وب (یا adapter حالت async)، اجرای معوق، workerهای PTB و چند اتصال برای زمان‌بند و پیام عمومی
+    handler_threads = ASYNC_HANDLER_WORKERS if SERVE_MODE == 'async' else WEB_THREADS
+    return handler_threads + DEFERRED_WORKERS + PTB_WORKERS + 4
+
+class InstrumentedRequest(Request):
+    """Request با timeout به ازای هر endpoint و آمار فراخوانی‌ها و اتصال‌ها"""
+
+    __slots__ = ('endpoint_timeouts', '_stats_lock', '_endpoint_stats')
+
+    def __init__(self, endpoint_timeouts=None, **kwargs):
+        super().__init__(**kwargs)
+        self.endpoint_timeouts = endpoint_timeouts or {}
+        self._stats_lock = threading.Lock()
+        self._endpoint_stats = {}
+
+    def post(self, url, data, timeout=None):
+        endpoint = url.rsplit('/', 1)[-1]
+        if timeout is None:
+            timeout = self.endpoint_timeouts.get(endpoint)
+
+        started = time.perf_counter()
+        ok = False
+        try:
+            result = super().post(url, data, timeout=timeout)
+            ok = True
+            return result
+        finally:
+            self._record(endpoint, (time.perf_counter() - started) * 1000, ok)
+
+    def _record(self, endpoint, elapsed_ms, ok):
+        with self._stats_lock:
+            stats = self._endpoint_stats.get(endpoint)
+            if stats is None:
+                stats = self._endpoint_stats[endpoint] = {
+                    'calls': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0
+                }
+            stats['calls'] += 1
+            stats['total_ms'] += elapsed_ms
+            stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+            if not ok:
+                stats['errors'] += 1
+
+    def connection_stats(self):
+        """تعداد درخواست‌ها در برابر اتصال‌های تازه (نسبت استفاده مجدد keep-alive)"""
+        requests = 0
+        connections = 0
+        idle = 0
+        pools = getattr(self._con_pool, 'pools', None)
+        if pools is not None:
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                requests += pool.num_requests
+                connections += pool.num_connections
+                idle += pool.pool.qsize() if pool.pool else 0
+        return {
+            'pool_size': self.con_pool_size,
+            'requests': requests,
+            'new_connections': connections,
+            'idle_connections': idle,
+            'reuse_ratio': round(1 - connections / requests, 3) if requests else None,
+        }
+
+    def stats(self):
+        with self._stats_lock:
+            endpoints = {
+                name: dict(s, total_ms=round(s['total_ms'], 1), max_ms=round(s['max_ms'], 1),
+                           avg_ms=round(s['total_ms'] / s['calls'], 2))
+                for name, s in self._endpoint_stats.items()
+            }
+        return {'endpoints': endpoints, 'connections': self.connection_stats()}
+
+def build_bot(token=BOT_TOKEN, base_url=TELEGRAM_API_BASE_URL, pool_size=None):
+    """ساخت Bot با pool اتصال مشترک و keep-alive برای همه فراخوانی‌های خروجی"""
+    request = InstrumentedRequest(
+        endpoint_timeouts=TELEGRAM_ENDPOINT_TIMEOUTS,
+        con_pool_size=pool_size or default_pool_size(),
+        connect_timeout=TELEGRAM_CONNECT_TIMEOUT,
+        read_timeout=TELEGRAM_READ_TIMEOUT,
+    )
+    return ExtBot(token, base_url=base_url or None, request=request)
@@ -0,0 +1,112 @@
+import time
+import threading
+from collections import OrderedDict
+
+class TokenBucket:
+    """سطل توکن ساده؛ هر درخواست یک توکن مصرف می‌کند"""
+    __slots__ = ('capacity', 'rate', 'tokens', 'updated')
+
+    def __init__(self, capacity, rate, now):
+        self.capacity = capacity
+        self.rate = rate  # توکن در ثانیه
+        self.tokens = float(capacity)
+        self.updated = now
+
+    def consume(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def is_full(self, now):
+        return self.tokens + (now - self.updated) * self.rate >= self.capacity
+
+class RateLimiter:
+    """محدودیت نرخ در حافظه به ازای هر کاربر و هر مسیر"""
+
+    def __init__(self, limits, max_buckets=50000):
+        # limits: مسیر -> (ظرفیت، توکن در ثانیه)؛ کلید 'default' برای بقیه مسیرها
+        self.limits = limits
+        self.max_buckets = max_buckets
+        # به ترتیب آخرین استفاده؛ قدیمی‌ترین اول
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.throttled = 0
+
+    def allow(self, user_id, route):
+        if route not in self.limits:
+            route = 'default'
+        limit = self.limits.get(route)
+        if not limit:
+            return True
+
+        now = time.monotonic()
+        key = (user_id, route)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= self.max_buckets:
+                    self._prune(now)
+                bucket = self._buckets[key] = TokenBucket(limit[0], limit[1], now)
+            else:
+                self._buckets.move_to_end(key)
+            ok = bucket.consume(now)
+            if ok:
+                self.allowed += 1
+            else:
+                self.throttled += 1
+            return ok
+
+    def _prune(self, now):
+        # از قدیمی‌ترین: سطل‌های پر مثل سطل تازه‌اند و دور ریخته می‌شوند؛ اگر باز جا نباشد
+        # قدیمی‌ترین سطل هم حذف می‌شود تا اندازه هرگز از max_buckets بیشتر نشود
+        while self._buckets:
+            key, bucket = next(iter(self._buckets.items()))
+            if len(self._buckets) < self.max_buckets and not bucket.is_full(now):
+                break
+            del self._buckets[key]
+
+    def __len__(self):
+        return len(self._buckets)
+
+class Debouncer:
+    """ادغام callbackهای یکسان یک کاربر که در یک بازه کوتاه می‌رسند"""
+
+    def __init__(self, window_seconds, max_keys=50000):
+        self.window_seconds = window_seconds
+        self.max_keys = max_keys
+        # به ترتیب آخرین فشار؛ قدیمی‌ترین اول
+        self._last_seen = OrderedDict()
+        self._lock = threading.Lock()
+        self.collapsed = 0
+
+    def is_duplicate(self, user_id, data):
+        if self.window_seconds <= 0:
+            return False
+
+        now = time.monotonic()
+        key = (user_id, data)
+        with self._lock:
+            last = self._last_seen.get(key)
+            if last is not None and now - last < self.window_seconds:
+                self.collapsed += 1
+                return True
+            if last is None and len(self._last_seen) >= self.max_keys:
+                self._prune(now)
+            self._last_seen[key] = now
+            self._last_seen.move_to_end(key)
+            return False
+
+    def _prune(self, now):
+        # از قدیمی‌ترین: کلیدهای خارج از بازه، و اگر همه داخل بازه باشند قدیمی‌ترین کلید
+        while self._last_seen:
+            key, last = next(iter(self._last_seen.items()))
+            if len(self._last_seen) < self.max_keys and now - last < self.window_seconds:
+                break
+            del self._last_seen[key]
+
+    def __len__(self):
+        return len(self._last_seen)
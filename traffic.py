@@ -0,0 +1,384 @@
+"""ضبط ترافیک واقعی webhook و پخش دوباره آن برای مقایسه کارایی دو نسخه
+
+ضبط (در سرور): TRAFFIC_RECORD_DIR=traffic
+پخش روی کپی دیتابیس با سرعت ۱۰ برابر و ذخیره نتیجه:
+    python traffic.py replay traffic/updates_*.jsonl.gz --db ancient_war.db --speed 10 --out a.json
+مقایسه دو اجرا (مثلاً قبل و بعد از یک تغییر):
+    python traffic.py compare a.json b.json
+بررسی اینکه از آپدیت‌های خام (مثلاً خروجی getUpdates) چیز شخصی در ضبط نمی‌ماند:
+    python traffic.py audit raw_updates.jsonl
+"""
+import os
+import json
+import gzip
+import glob
+import time
+import hashlib
+import sqlite3
+import logging
+import argparse
+import tempfile
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# نشانه‌های شیء User یا Chat تلگرام (from، chat، forward_from، via_bot، new_chat_members،
+# text_mention و ...)؛ هر dict با id عددی و یکی از این کلیدها شناسه کاربر یا چت است
+IDENTITY_SHAPE = ('is_bot', 'first_name', 'type', 'title', 'username')
+# شناسه‌های کاربر یا چت بیرون از این اشیاء (مثل contact.user_id)
+ID_KEYS = ('chat_id', 'user_id')
+# اطلاعات شخصی که هر جای آپدیت باشند با مقدار ثابت جایگزین می‌شوند
+PERSONAL_FIELDS = {
+    'username': 'player',
+    'first_name': 'player',
+    'last_name': 'player',
+    'title': 'player',
+    'forward_sender_name': 'player',
+    'forward_signature': 'player',
+    'author_signature': 'player',
+    'phone_number': '',
+    'vcard': '',
+    'bio': '',
+}
+
+def is_identity(value):
+    """True اگر value شیء User یا Chat تلگرام باشد"""
+    return (
+        isinstance(value, dict)
+        and isinstance(value.get('id'), int)
+        and any(key in value for key in IDENTITY_SHAPE)
+    )
+
+class Anonymizer:
+    """تبدیل شناسه کاربران با hash نمک‌دار به عدد ثابت دیگر
+
+    جلسه هر کاربر در پخش حفظ می‌شود ولی شناسه واقعی ذخیره نمی‌شود. keep_ids (مثل مالک)
+    بدون تغییر می‌مانند تا مسیرهای مدیریت هم پخش شوند.
+    """
+
+    def __init__(self, salt, keep_ids=()):
+        self.salt = str(salt).encode()
+        self.keep_ids = set(keep_ids)
+
+    def anonymize_id(self, user_id):
+        if user_id in self.keep_ids or not isinstance(user_id, int):
+            return user_id
+        digest = hashlib.sha256(self.salt + str(user_id).encode()).digest()
+        # همان علامت (چت‌های گروه منفی هستند) و در بازه امن شناسه‌های تلگرام
+        anonymous = int.from_bytes(digest[:6], 'big') % 10 ** 12 + 10 ** 12
+        return anonymous if user_id > 0 else -anonymous
+
+    def anonymize(self, value):
+        if isinstance(value, dict):
+            identity = is_identity(value)
+            result = {}
+            for key, item in value.items():
+                if (identity and key == 'id') or key in ID_KEYS:
+                    result[key] = self.anonymize_id(item)
+                elif key in PERSONAL_FIELDS and isinstance(item, str):
+                    result[key] = PERSONAL_FIELDS[key]
+                else:
+                    result[key] = self.anonymize(item)
+            return result
+        if isinstance(value, list):
+            return [self.anonymize(item) for item in value]
+        return value
+
+    def leaks(self, update):
+        """مقادیر شخصی آپدیت خام که بعد از ناشناس‌سازی هنوز در خروجی هستند
+
+        بدون تکیه بر is_identity: همه id/user_id/chat_idهای عددی و فیلدهای شخصی ورودی
+        جمع می‌شوند و در خروجی جستجو می‌شوند.
+        """
+        sensitive = set()
+
+        def collect(value):
+            if isinstance(value, dict):
+                for key, item in value.items():
+                    if key in ('id',) + ID_KEYS and isinstance(item, int) and item not in self.keep_ids:
+                        sensitive.add(item)
+                    elif key in PERSONAL_FIELDS and isinstance(item, str) and item not in ('', 'player'):
+                        sensitive.add(item)
+                    collect(item)
+            elif isinstance(value, list):
+                for item in value:
+                    collect(item)
+
+        found = []
+
+        def search(value, path):
+            if isinstance(value, dict):
+                for key, item in value.items():
+                    search(item, f"{path}.{key}")
+            elif isinstance(value, list):
+                for index, item in enumerate(value):
+                    search(item, f"{path}[{index}]")
+            elif not isinstance(value, bool) and value in sensitive:
+                found.append(path)
+
+        collect(update)
+        search(self.anonymize(update), 'update')
+        return found
+
+    def anonymize_database(self, conn):
+        """همان نگاشت روی بازیکنان یک کپی دیتابیس تا آپدیت‌های ضبط‌شده کشورشان را پیدا کنند"""
+        players = [row[0] for row in conn.execute('SELECT user_id FROM players')]
+        mapping = [(self.anonymize_id(user_id), user_id) for user_id in players]
+        conn.executemany('UPDATE players SET user_id = ? WHERE user_id = ?', mapping)
+        conn.executemany('UPDATE countries SET player_id = ? WHERE player_id = ?', mapping)
+        conn.commit()
+        return len(mapping)
+
+class TrafficRecorder:
+    """نوشتن آپدیت‌های ورودی (ناشناس‌شده) با زمان دریافت در فایل‌های JSONL فشرده و چرخشی
+
+    هر پروسه فایل خودش را دارد.
+    """
+
+    def __init__(self, directory, salt, max_bytes=50 * 1024 * 1024, keep_ids=(), flush_every=100):
+        self.directory = directory
+        self.anonymizer = Anonymizer(salt, keep_ids)
+        self.max_bytes = max_bytes
+        self.flush_every = flush_every
+        self.recorded = 0
+        self.failed = 0
+        self._file = None
+        self._written = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _open(self):
+        name = f"updates_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{os.getpid()}.jsonl.gz"
+        self._file = gzip.open(os.path.join(self.directory, name), 'wt', encoding='utf-8')
+        self._written = 0
+
+    def record(self, data):
+        line = json.dumps({'t': time.time(), 'update': self.anonymizer.anonymize(data)}, ensure_ascii=False) + '\n'
+        with self._lock:
+            try:
+                if self._file is None or self._written >= self.max_bytes:
+                    self.close_file()
+                    self._open()
+                self._file.write(line)
+                self._written += len(line)
+                self.recorded += 1
+                if self.recorded % self.flush_every == 0:
+                    self._file.flush()
+            except Exception:
+                # فایل خراب کنار گذاشته می‌شود تا آپدیت بعدی فایل تازه‌ای باز کند
+                self._file = None
+                self.failed += 1
+                raise
+
+    def close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def close(self):
+        with self._lock:
+            self.close_file()
+
+def read_capture(paths):
+    """رکوردهای ضبط‌شده از چند فایل، به ترتیب زمان دریافت"""
+    records = []
+    for path in paths:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            try:
+                for line in f:
+                    records.append(json.loads(line))
+            except (EOFError, ValueError):
+                # انتهای ناقص فایلی که هنگام ضبط بسته نشده (تا آخرین flush خوانده می‌شود)
+                logger.warning(f"Capture {path} is truncated; using {len(records)} records so far")
+    records.sort(key=lambda record: record['t'])
+    return records
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+def replay(paths, db_path, salt, speed=1.0, threads=4, latency_ms=0, label=None):
+    """پخش یک ضبط روی کپی دیتابیس با Bot API جعلی و گزارش تأخیر و توان
+
+    salt باید همان نمک ضبط باشد تا بازیکنان کپی دیتابیس با همان نگاشت ناشناس شوند.
+    speed=0 یعنی بدون فاصله زمانی (حداکثر توان). باید در پروسه جداگانه اجرا شود چون
+    متغیرهای محیطی config و دایرکتوری کاری را تغییر می‌دهد.
+    """
+    from fake_bot_api import FakeBotAPI
+
+    records = read_capture(paths)
+    api = FakeBotAPI(latency_ms=latency_ms).start()
+    workdir = tempfile.mkdtemp(prefix='replay_')
+
+    os.environ.update({
+        'TELEGRAM_API_BASE_URL': api.base_url,
+        'BOT_TOKEN': '123456:REPLAY',
+        'STARTUP_MODE': 'lazy',
+        'WEBHOOK_URL': '',
+        'TRAFFIC_RECORD_DIR': '',
+        'BACKUP_INTERVAL_MINUTES': '0',
+    })
+    from config import DB_NAME, OWNER_ID
+
+    # کپی سالم دیتابیس (حتی اگر ربات در حال نوشتن باشد) در دایرکتوری کاری موقت
+    source = sqlite3.connect(db_path)
+    target = sqlite3.connect(os.path.join(workdir, DB_NAME))
+    source.backup(target)
+    # آپدیت‌های ضبط‌شده ممکن است در نسخه اصلی پردازش شده باشند
+    target.execute('DELETE FROM processed_updates')
+    players = Anonymizer(salt, keep_ids=(OWNER_ID,)).anonymize_database(target)
+    target.close()
+    source.close()
+    logger.info(f"Replaying {len(records)} updates against a copy of {db_path} ({players} players)")
+
+    os.chdir(workdir)
+    import main
+
+    # بدون زمان‌بند: فقط مسیر آپدیت‌ها اندازه‌گیری می‌شود
+    main.init_services()
+    main.load_telegram()
+    main.updater = main.setup_updater()
+    main.startup.mark_ready(None)
+
+    latencies = []
+    service = []
+    errors = 0
+    lock = threading.Lock()
+
+    def handle(record, due):
+        nonlocal errors
+        started = time.perf_counter()
+        ok = True
+        try:
+            main.process_update_json(record['update'])
+        except Exception as e:
+            ok = False
+            logger.error(f"Replay of update {record['update'].get('update_id')} failed: {e}")
+        finished = time.perf_counter()
+        with lock:
+            # تأخیر از زمان برنامه‌ریزی‌شده (شامل صف) و زمان خود پردازش
+            latencies.append((finished - due) * 1000)
+            service.append((finished - started) * 1000)
+            if not ok:
+                errors += 1
+
+    started = time.perf_counter()
+    first = records[0]['t'] if records else 0
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for record in records:
+            due = started + ((record['t'] - first) / speed if speed > 0 else 0)
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(handle, record, due)
+    # callbackهای معوق هم باید تمام شوند
+    main.deferred.shutdown(wait=True)
+    if main.notifier is not None:
+        main.notifier.shutdown(wait=True)
+    elapsed = time.perf_counter() - started
+    api.stop()
+
+    return {
+        'label': label or os.path.basename(os.path.dirname(os.path.abspath(main.__file__))),
+        'updates': len(records),
+        'speed': speed,
+        'threads': threads,
+        'seconds': round(elapsed, 3),
+        'updates_per_second': round(len(records) / elapsed, 1) if elapsed else 0.0,
+        'errors': errors,
+        'latency_ms': {
+            'p50': round(_percentile(latencies, 0.50), 2),
+            'p95': round(_percentile(latencies, 0.95), 2),
+            'p99': round(_percentile(latencies, 0.99), 2),
+            'max': round(max(latencies, default=0.0), 2),
+        },
+        'service_ms': {
+            'p50': round(_percentile(service, 0.50), 2),
+            'p95': round(_percentile(service, 0.95), 2),
+            'p99': round(_percentile(service, 0.99), 2),
+        },
+        'bot_api_calls': dict(api.calls),
+        # کپی دیتابیس بعد از پخش برای بررسی وضعیت نهایی نگه داشته می‌شود
+        'workdir': workdir,
+    }
+
+def compare(before, after):
+    """تفاوت دو گزارش replay (after نسبت به before)"""
+    def change(a, b):
+        return f"{(b - a) / a * 100:+.1f}%" if a else 'n/a'
+
+    result = {
+        'before': before.get('label'),
+        'after': after.get('label'),
+        'updates': (before['updates'], after['updates']),
+        'updates_per_second': (before['updates_per_second'], after['updates_per_second'],
+                               change(before['updates_per_second'], after['updates_per_second'])),
+        'errors': (before['errors'], after['errors']),
+    }
+    for group in ('latency_ms', 'service_ms'):
+        for key, value in before[group].items():
+            result[f"{group}.{key}"] = (value, after[group][key], change(value, after[group][key]))
+    methods = sorted(set(before['bot_api_calls']) | set(after['bot_api_calls']))
+    result['bot_api_calls'] = {
+        method: (before['bot_api_calls'].get(method, 0), after['bot_api_calls'].get(method, 0))
+        for method in methods
+    }
+    return result
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Replay recorded webhook traffic and compare runs')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    replay_parser = commands.add_parser('replay', help='replay a capture against a copy of the database')
+    replay_parser.add_argument('captures', nargs='+', help='capture files (globs allowed)')
+    replay_parser.add_argument('--db', required=True, help='database to copy for the replay')
+    replay_parser.add_argument('--speed', type=float, default=1.0, help='1 = real time, 0 = as fast as possible')
+    replay_parser.add_argument('--threads', type=int, default=4, help='concurrent handlers, like WEB_THREADS')
+    replay_parser.add_argument('--latency-ms', type=float, default=0, help='fake Bot API latency')
+    replay_parser.add_argument('--label', default=None)
+    replay_parser.add_argument('--salt', default=os.getenv('TRAFFIC_RECORD_SALT', os.getenv('BOT_TOKEN', '')),
+                               help='anonymization salt used while recording (default: as in config)')
+    replay_parser.add_argument('--out', default=None, help='write the report to this JSON file')
+
+    compare_parser = commands.add_parser('compare', help='compare two replay reports')
+    compare_parser.add_argument('before')
+    compare_parser.add_argument('after')
+
+    audit_parser = commands.add_parser('audit', help='check that raw updates leave nothing personal after anonymization')
+    audit_parser.add_argument('updates', nargs='+', help='JSONL files of raw Telegram updates (e.g. from getUpdates)')
+    args = parser.parse_args()
+
+    if args.command == 'replay':
+        paths = sorted(path for pattern in args.captures for path in glob.glob(pattern))
+        db_path = os.path.abspath(args.db)
+        out = os.path.abspath(args.out) if args.out else None
+        report = replay(paths, db_path, args.salt, args.speed, args.threads, args.latency_ms, args.label)
+        text = json.dumps(report, indent=2, ensure_ascii=False)
+        if out:
+            with open(out, 'w', encoding='utf-8') as f:
+                f.write(text)
+        print(text)
+    elif args.command == 'audit':
+        anonymizer = Anonymizer('audit')
+        updates = 0
+        leaked = []
+        for path in args.updates:
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        update = json.loads(line)
+                        updates += 1
+                        leaked += [f"{update.get('update_id')}: {field}" for field in anonymizer.leaks(update)]
+        print(json.dumps({'updates': updates, 'leaks': leaked}, indent=2, ensure_ascii=False))
+        if leaked:
+            raise SystemExit(1)
+    else:
+        with open(args.before, encoding='utf-8') as f:
+            before = json.load(f)
+        with open(args.after, encoding='utf-8') as f:
+            after = json.load(f)
+        print(json.dumps(compare(before, after), indent=2, ensure_ascii=False))
@@ -0,0 +1,88 @@
+import logging
+from collections import deque
+from config import REGION_ADJACENCY, ATTACK_REACH
+
+logger = logging.getLogger(__name__)
+
+def normalize_adjacency(adjacency):
+    """مرزها به صورت جفت‌های مرتب و یکتا (جهت مرز مهم نیست)"""
+    return sorted({tuple(sorted(pair)) for pair in adjacency if pair[0] != pair[1]})
+
+def region_distances(adjacency):
+    """فاصله همه جفت مناطق با BFS از هر منطقه؛ جفت‌های بدون مسیر حذف می‌شوند"""
+    neighbours = {}
+    for a, b in adjacency:
+        neighbours.setdefault(a, set()).add(b)
+        neighbours.setdefault(b, set()).add(a)
+
+    distances = {}
+    for source in neighbours:
+        seen = {source: 0}
+        queue = deque([source])
+        while queue:
+            region = queue.popleft()
+            for nxt in neighbours[region]:
+                if nxt not in seen:
+                    seen[nxt] = seen[region] + 1
+                    queue.append(nxt)
+        for target, distance in seen.items():
+            distances[(source, target)] = distance
+    return distances
+
+def write_map(cursor, adjacency, regions=()):
+    """بازنویسی جدول مرزها و جدول فاصله‌ها (فقط هنگام تغییر نقشه)
+
+    regions: مناطقی که مرزی ندارند ولی باید با خودشان فاصله صفر داشته باشند
+    """
+    adjacency = normalize_adjacency(adjacency)
+    distances = region_distances(adjacency)
+    for region in regions:
+        if region is not None:
+            distances.setdefault((region, region), 0)
+
+    cursor.execute('DELETE FROM region_adjacency')
+    cursor.executemany('''
+    INSERT INTO region_adjacency (region_a, region_b) VALUES (?, ?)
+    ''', adjacency)
+    cursor.execute('DELETE FROM region_distance')
+    cursor.executemany('''
+    INSERT INTO region_distance (from_region, to_region, distance) VALUES (?, ?, ?)
+    ''', [(a, b, d) for (a, b), d in distances.items()])
+    return len(distances)
+
+class WorldMap:
+    """نقشه مناطق و جدول فاصله از پیش محاسبه‌شده برای فیلتر اهداف در دسترس"""
+
+    def __init__(self, db, adjacency=REGION_ADJACENCY, reach=ATTACK_REACH):
+        self.db = db
+        self.adjacency = adjacency
+        self.reach = reach
+
+    def sync(self):
+        """بازسازی جدول فاصله فقط اگر نقشه config با نقشه ذخیره‌شده فرق کند"""
+        stored = self.db.get_region_adjacency()
+        configured = normalize_adjacency(self.adjacency)
+        if stored == configured:
+            return False
+        # جهان ساخته‌شده با worldgen نقشه خودش را دارد که مناطقش در config نیستند
+        known = {region for pair in configured for region in pair}
+        if stored and not self.db.get_regions() <= known:
+            logger.info("World map kept: countries use regions outside the configured map")
+            return False
+        self.rebuild()
+        return True
+
+    def rebuild(self, adjacency=None):
+        if adjacency is not None:
+            self.adjacency = adjacency
+        pairs = self.db.replace_world_map(self.adjacency)
+        logger.info(f"World map rebuilt: {pairs} region pairs")
+        return pairs
+
+    def distance(self, country_id, target_id):
+        """فاصله منطقه‌ای دو کشور؛ None اگر مسیری نباشد"""
+        return self.db.get_region_distance(country_id, target_id)
+
+    def in_reach(self, country_id, target_id):
+        distance = self.distance(country_id, target_id)
+        return distance is not None and distance <= self.reach
@@ -0,0 +1,176 @@
+"""ساخت جهان رویه‌ای با تعداد دلخواه کشور و بارگذاری انبوه آن در SQLite
+
+ساخت دیتابیس جهان ۱۰۰ هزار کشوری (برای اجرای بازی یا تست کارایی):
+    python worldgen.py --countries 100000 --seed 7 --db ancient_war.db
+
+برای اینکه شروع فصل و ریست هم همین جهان را بازسازی کنند، همان دستور را با
+--db ancient_war_template.db هم اجرا کن.
+"""
+import math
+import time
+import random
+import sqlite3
+import logging
+import argparse
+from config import ANCIENT_COUNTRIES, INITIAL_RESOURCES, INITIAL_ARMY
+from migrations import migrate
+from counters import recount
+from world import write_map
+
+logger = logging.getLogger(__name__)
+
+# هجاهای ساخت نام کشور؛ ترکیب‌ها با شماره یکتا می‌شوند
+NAME_PREFIXES = ('پار', 'رو', 'ماد', 'سو', 'ایل', 'آش', 'کار', 'هیر', 'لید', 'فری',
+                 'سک', 'اور', 'گند', 'بلخ', 'خوار', 'سغد', 'تیس', 'آرا', 'کلد', 'نوم')
+NAME_SUFFIXES = ('س', 'م', 'ان', 'یا', 'تاژ', 'ستان', 'یه', 'ون', 'دیس', 'ار', 'ینه', 'وش')
+
+# تخصص‌ها و رنگ‌ها از کشورهای باستانی config
+SPECIALTIES = tuple(dict.fromkeys(c['specialty'] for c in ANCIENT_COUNTRIES))
+COLORS = tuple(dict.fromkeys(c['color'] for c in ANCIENT_COUNTRIES))
+
+# میانگین کشور در هر منطقه و سقف مناطق (جدول فاصله مربع تعداد مناطق است)
+COUNTRIES_PER_REGION = 50
+MAX_REGIONS = 400
+
+# جداولی که با جهان تازه خالی می‌شوند (به کشورها ارجاع دارند)
+DEPENDENT_TABLES = ('players', 'alliances', 'events', 'country_history')
+WORLD_TABLES = ('countries', 'resources', 'army')
+
+def country_name(index):
+    combos = len(NAME_PREFIXES) * len(NAME_SUFFIXES)
+    prefix, suffix = divmod(index % combos, len(NAME_SUFFIXES))
+    name = NAME_PREFIXES[prefix] + NAME_SUFFIXES[suffix]
+    if index >= combos:
+        name = f"{name} {index // combos + 1}"
+    return name
+
+def generate_map(region_count, rng):
+    """مناطق روی یک شبکه با مرز به همسایه راست و پایین و چند گذرگاه تصادفی"""
+    width = math.ceil(math.sqrt(region_count))
+    regions = [f"منطقه {i + 1}" for i in range(region_count)]
+    adjacency = []
+    for i in range(region_count):
+        if (i + 1) % width and i + 1 < region_count:
+            adjacency.append((regions[i], regions[i + 1]))
+        if i + width < region_count:
+            adjacency.append((regions[i], regions[i + width]))
+    for _ in range(region_count // 10):
+        a, b = rng.sample(regions, 2)
+        adjacency.append((a, b))
+    return regions, adjacency
+
+def generate_world(count, seed=0, countries_per_region=COUNTRIES_PER_REGION, max_regions=MAX_REGIONS):
+    """ساخت قطعی (بر اساس seed) کشورها، منابع، ارتش و نقشه مناطق
+
+    خروجی dict با کلیدهای countries، resources، army (لیست tupleها به ترتیب ستون‌های
+    درج)، regions و adjacency است.
+    """
+    rng = random.Random(seed)
+    region_count = max(1, min(max_regions, math.ceil(count / countries_per_region)))
+    regions, adjacency = generate_map(region_count, rng)
+
+    countries, resources, army = [], [], []
+    for i in range(count):
+        country_id = i + 1
+        countries.append((
+            country_id, country_name(i), rng.choice(SPECIALTIES), rng.choice(COLORS),
+            regions[rng.randrange(region_count)],
+        ))
+        resources.append((country_id,) + tuple(
+            int(INITIAL_RESOURCES[key] * rng.uniform(0.8, 1.2)) for key in ('gold', 'iron', 'stone', 'food')
+        ))
+        infantry, cavalry, archers = (
+            int(INITIAL_ARMY[key] * rng.uniform(0.8, 1.2)) for key in ('infantry', 'cavalry', 'archers')
+        )
+        army.append((
+            country_id, INITIAL_ARMY['level'], infantry, cavalry, archers,
+            INITIAL_ARMY['defense'], infantry + cavalry + archers,
+        ))
+
+    return {
+        'countries': countries,
+        'resources': resources,
+        'army': army,
+        'regions': regions,
+        'adjacency': adjacency,
+    }
+
+def seed_world(conn, world):
+    """جایگزینی جهان دیتابیس با جهان ساخته‌شده در یک تراکنش
+
+    ایندکس‌های جداول جهان قبل از درج حذف و بعد از آن دوباره ساخته می‌شوند تا درج انبوه
+    هزینه نگهداری ایندکس نداشته باشد. شمارنده‌ها و جدول فاصله هم در همین تراکنش به‌روز
+    می‌شوند. خروجی: مقادیر شمارنده‌ها (برای Counters.apply).
+    """
+    migrate(conn)
+    cursor = conn.cursor()
+    cursor.execute('BEGIN IMMEDIATE')
+    try:
+        # ایندکس‌های خودکار (UNIQUE و PRIMARY KEY) sql ندارند و حذف‌شدنی نیستند
+        indexes = cursor.execute(f'''
+        SELECT name, sql FROM sqlite_master
+        WHERE type = 'index' AND sql IS NOT NULL
+          AND tbl_name IN ({', '.join('?' * len(WORLD_TABLES))})
+        ''', WORLD_TABLES).fetchall()
+        for name, _ in indexes:
+            cursor.execute(f'DROP INDEX {name}')
+
+        for table in DEPENDENT_TABLES + WORLD_TABLES:
+            cursor.execute(f'DELETE FROM {table}')
+
+        cursor.executemany('''
+        INSERT INTO countries (id, name, specialty, color, region) VALUES (?, ?, ?, ?, ?)
+        ''', world['countries'])
+        cursor.executemany('''
+        INSERT INTO resources (country_id, gold, iron, stone, food) VALUES (?, ?, ?, ?, ?)
+        ''', world['resources'])
+        cursor.executemany('''
+        INSERT INTO army (country_id, level, infantry, cavalry, archers, defense, power)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', world['army'])
+
+        for _, sql in indexes:
+            cursor.execute(sql)
+        write_map(cursor, world['adjacency'], world['regions'])
+        values = recount(cursor)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    cursor.execute('ANALYZE')
+    return values
+
+def build(path, count, seed=0):
+    """ساخت و بارگذاری جهان در فایل دیتابیس؛ زمان هر مرحله برگردانده می‌شود"""
+    started = time.perf_counter()
+    world = generate_world(count, seed)
+    generated = time.perf_counter()
+
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute('PRAGMA journal_mode=WAL')
+        values = seed_world(conn, world)
+    finally:
+        conn.close()
+    loaded = time.perf_counter()
+
+    logger.info(f"Seeded {count} countries into {path} in {(loaded - started) * 1000:.0f} ms")
+    return {
+        'path': path,
+        'countries': count,
+        'regions': len(world['regions']),
+        'borders': len(world['adjacency']),
+        'generate_ms': round((generated - started) * 1000, 1),
+        'load_ms': round((loaded - generated) * 1000, 1),
+        'counters': values,
+    }
+
+if __name__ == '__main__':
+    import json
+
+    parser = argparse.ArgumentParser(description='Generate and bulk-load a procedural world')
+    parser.add_argument('--countries', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--db', required=True, help='database file to (re)seed')
+    args = parser.parse_args()
+    print(json.dumps(build(args.db, args.countries, args.seed), indent=2, ensure_ascii=False))